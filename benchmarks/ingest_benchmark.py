@@ -0,0 +1,225 @@
+# File: benchmarks/ingest_benchmark.py
+"""End-to-end ingestion benchmark.
+
+Drives simulated devices from ``virtual_devices`` against one ingestion
+path and prints a JSON result with throughput, latency percentiles, rows
+landed in PostgreSQL per second and error rate:
+
+    python -m benchmarks.ingest_benchmark --target http --devices 1000 --interval 1
+    python -m benchmarks.ingest_benchmark --target rabbitmq --duration 60
+    python -m benchmarks.ingest_benchmark --target direct --output results.json
+    python -m benchmarks.ingest_benchmark --target inprocess
+
+Targets:
+    http       POST /api/device-data on the device management service
+    rabbitmq   the RabbitMQ transport, publishing to the configured broker
+    inprocess  the in-process transport drained into the TelemetryWriter,
+               i.e. the queue-to-database pipeline without a broker
+    direct     the batched TelemetryWriter used by run.store_device_data
+
+Device ids are prefixed with a per-run tag so the DB row count only sees
+rows written by this run.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from config.config import Config
+from virtual_devices.device_simulator import VirtualDevice, create_session, percentile
+from virtual_devices.runtime import DeviceRuntime
+
+
+class LatencyRecorder:
+    """Thread-safe collection of per-send latencies and outcomes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.sent = 0
+        self.errors = 0
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.latencies.append(seconds)
+            if ok:
+                self.sent += 1
+            else:
+                self.errors += 1
+
+    def summary(self):
+        with self._lock:
+            values = sorted(self.latencies)
+        to_ms = 1000.0
+        return {
+            'p50': percentile(values, 50) * to_ms,
+            'p95': percentile(values, 95) * to_ms,
+            'p99': percentile(values, 99) * to_ms,
+            'max': (values[-1] if values else 0.0) * to_ms,
+            'mean': (sum(values) / len(values) if values else 0.0) * to_ms
+        }
+
+
+def http_target(args):
+    session = create_session(pool_maxsize=max(args.workers, 1))
+    url = f"{args.url}/api/device-data"
+
+    def send(payload):
+        response = session.post(url, json=payload, timeout=10)
+        return response.status_code == 200
+
+    return send, lambda: None
+
+
+def rabbitmq_target(args):
+    from utils.transport import RabbitMQTransport
+
+    # Workers share the transport's channel pool
+    transport = RabbitMQTransport(confirm=args.confirm)
+    return transport.publish, transport.close
+
+
+def inprocess_target(args):
+    from utils.telemetry_writer import TelemetryWriter
+    from utils.transport import InProcessTransport
+
+    writer = TelemetryWriter()
+    writer.start()
+    transport = InProcessTransport()
+
+    # Same handler as the monitoring service: commit before acking
+    consumer = transport.consumer(handlers=[writer.write])
+    consumer.start()
+
+    def close():
+        consumer.stop()
+        writer.stop()
+
+    return transport.publish, close
+
+
+def direct_target(args):
+    from utils.telemetry_writer import TelemetryWriter
+
+    writer = TelemetryWriter()
+    writer.start()
+
+    def send(payload):
+        return writer.submit(payload)
+
+    return send, writer.stop
+
+
+TARGETS = {
+    'http': http_target,
+    'rabbitmq': rabbitmq_target,
+    'inprocess': inprocess_target,
+    'direct': direct_target
+}
+
+
+def count_rows(prefix):
+    """Rows in device_telemetry written by devices of this run"""
+    from utils.db_pool import get_pool
+
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM device_telemetry WHERE device_id LIKE %s",
+                (f"{prefix}%",)
+            )
+            return cur.fetchone()[0]
+
+
+def run_benchmark(args):
+    prefix = f"BENCH_{uuid.uuid4().hex[:8]}_"
+    devices = [VirtualDevice(f"{prefix}{i:05d}") for i in range(args.devices)]
+    recorder = LatencyRecorder()
+    send, close = TARGETS[args.target](args)
+
+    def sink(device, payload):
+        started = time.perf_counter()
+        try:
+            ok = bool(send(payload))
+        except Exception:
+            ok = False
+        recorder.record(time.perf_counter() - started, ok)
+        return ok
+
+    runtime = DeviceRuntime(
+        devices, sink=sink, interval=args.interval,
+        jitter=args.jitter, workers=args.workers
+    )
+    started_at = datetime.utcnow()
+    started = time.monotonic()
+    runtime.start()
+    time.sleep(args.duration)
+    runtime.stop()
+    close()
+    elapsed = time.monotonic() - started
+
+    db_rows = None
+    if args.count_rows and args.target != 'rabbitmq':
+        # Give asynchronous writers a moment to land their last batch
+        time.sleep(args.settle)
+        try:
+            db_rows = count_rows(prefix)
+        except Exception as e:
+            print(f"[ERROR] Could not count rows: {e}", file=sys.stderr)
+
+    total = recorder.sent + recorder.errors
+    runtime_stats = runtime.get_stats()
+    return {
+        'target': args.target,
+        'started_at': started_at.isoformat(),
+        'devices': args.devices,
+        'interval': args.interval,
+        'workers': args.workers,
+        'duration_seconds': elapsed,
+        'offered_rate': args.devices / args.interval,
+        'sent': recorder.sent,
+        'errors': recorder.errors,
+        'overruns': runtime_stats['overruns'],
+        'error_rate': recorder.errors / total if total else 0.0,
+        'throughput_per_sec': recorder.sent / elapsed if elapsed else 0.0,
+        'latency_ms': recorder.summary(),
+        'db_rows': db_rows,
+        'db_rows_per_sec': db_rows / elapsed if db_rows is not None and elapsed else None,
+        'device_prefix': prefix
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="IoT ingestion benchmark")
+    parser.add_argument('--target', choices=sorted(TARGETS), default='http')
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help="seconds between readings per device")
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--confirm', action='store_true',
+                        help="rabbitmq: publish through the confirm-mode background publisher")
+    parser.add_argument('--url', default=f"http://127.0.0.1:{Config.DEVICE_SERVICE_PORT}")
+    parser.add_argument('--settle', type=float, default=3.0,
+                        help="seconds to wait before counting DB rows")
+    parser.add_argument('--no-count-rows', dest='count_rows', action='store_false')
+    parser.add_argument('--output', help="write the JSON result to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run_benchmark(args)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -30,6 +30,12 @@ class Config:
         'max_overflow': 5
     }
 
+    # Raw psycopg2 connection pool configuration
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '2'))
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '20'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30'))
+
     # RabbitMQ configuration
     RABBITMQ_HOST = os.getenv('RABBITMQ_HOST', '127.0.0.1')
     RABBITMQ_PORT = int(os.getenv('RABBITMQ_PORT', '5672'))
@@ -37,6 +43,97 @@ class Config:
     RABBITMQ_PASSWORD = os.getenv('RABBITMQ_PASSWORD', 'guest')
     RABBITMQ_VHOST = os.getenv('RABBITMQ_VHOST', '/')
     RABBITMQ_QUEUE = os.getenv('RABBITMQ_QUEUE', 'device_data')
+    # Number of device_data partition queues; readings are routed by device_id
+    RABBITMQ_PARTITIONS = int(os.getenv('RABBITMQ_PARTITIONS', '1'))
+    RABBITMQ_CHANNEL_POOL_SIZE = int(os.getenv('RABBITMQ_CHANNEL_POOL_SIZE', '8'))
+    RABBITMQ_PUBLISH_BUFFER = int(os.getenv('RABBITMQ_PUBLISH_BUFFER', '10000'))
+    RABBITMQ_MAX_UNCONFIRMED = int(os.getenv('RABBITMQ_MAX_UNCONFIRMED', '1000'))
+    RABBITMQ_PUBLISH_TIMEOUT = float(os.getenv('RABBITMQ_PUBLISH_TIMEOUT', '5.0'))
+    RABBITMQ_CONFIRM_PUBLISH = os.getenv('RABBITMQ_CONFIRM_PUBLISH', 'False').lower() == 'true'
+    # Encoding for published device_data messages: 'json' or 'binary'
+    MESSAGE_FORMAT = os.getenv('MESSAGE_FORMAT', 'json')
+    # Transport for device_data: 'rabbitmq' or 'inprocess' (single process only)
+    MESSAGE_TRANSPORT = os.getenv('MESSAGE_TRANSPORT', 'rabbitmq')
+    INPROCESS_QUEUE_SIZE = int(os.getenv('INPROCESS_QUEUE_SIZE', '100000'))
+
+    # Monitoring service queue consumers
+    MONITORING_CONSUMERS = int(os.getenv('MONITORING_CONSUMERS', '2'))
+    # Partitions consumed by this node, e.g. "0-3" or "0,2"; empty means all
+    MONITORING_OWNED_PARTITIONS = os.getenv('MONITORING_OWNED_PARTITIONS', '')
+    MONITORING_PREFETCH = int(os.getenv('MONITORING_PREFETCH', '200'))
+    MONITORING_ACK_BATCH = int(os.getenv('MONITORING_ACK_BATCH', '50'))
+    MONITORING_ACK_INTERVAL = float(os.getenv('MONITORING_ACK_INTERVAL', '1.0'))
+    MONITORING_PERSIST_QUEUE_DATA = os.getenv('MONITORING_PERSIST_QUEUE_DATA', 'True').lower() == 'true'
+    # Readings waiting for the Socket.IO emitter (oldest dropped beyond this)
+    MONITORING_BROADCAST_BUFFER = int(os.getenv('MONITORING_BROADCAST_BUFFER', '10000'))
+    MONITORING_BROADCAST_INTERVAL = float(os.getenv('MONITORING_BROADCAST_INTERVAL', '0.05'))
+    # Upper bound for downsampled history responses
+    MONITORING_MAX_POINTS = int(os.getenv('MONITORING_MAX_POINTS', '1000'))
+    # Monitoring endpoint response cache; TTL 0 disables it
+    RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '5.0'))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+    RESPONSE_CACHE_COALESCE_TIMEOUT = float(os.getenv('RESPONSE_CACHE_COALESCE_TIMEOUT', '10.0'))
+    # Raw history pagination and streaming
+    HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '1000'))
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', '10000'))
+    HISTORY_STREAM_BATCH_SIZE = int(os.getenv('HISTORY_STREAM_BATCH_SIZE', '1000'))
+
+    # Telemetry writer configuration
+    TELEMETRY_BATCH_SIZE = int(os.getenv('TELEMETRY_BATCH_SIZE', '500'))
+    TELEMETRY_FLUSH_INTERVAL = float(os.getenv('TELEMETRY_FLUSH_INTERVAL', '1.0'))
+    TELEMETRY_QUEUE_SIZE = int(os.getenv('TELEMETRY_QUEUE_SIZE', '50000'))
+    # Failed flushes are retried this often, waiting BACKOFF seconds doubling
+    TELEMETRY_FLUSH_RETRIES = int(os.getenv('TELEMETRY_FLUSH_RETRIES', '5'))
+    TELEMETRY_FLUSH_RETRY_BACKOFF = float(os.getenv('TELEMETRY_FLUSH_RETRY_BACKOFF', '0.5'))
+    KNOWN_DEVICE_CACHE_SIZE = int(os.getenv('KNOWN_DEVICE_CACHE_SIZE', '100000'))
+    LAST_ACTIVE_FLUSH_INTERVAL = float(os.getenv('LAST_ACTIVE_FLUSH_INTERVAL', '5.0'))
+    LATEST_READING_FLUSH_INTERVAL = float(os.getenv('LATEST_READING_FLUSH_INTERVAL', '5.0'))
+    # Devices without a reading for this long are reported offline
+    DEVICE_ONLINE_SECONDS = int(os.getenv('DEVICE_ONLINE_SECONDS', '60'))
+    DEVICE_DATA_BATCH_MAX = int(os.getenv('DEVICE_DATA_BATCH_MAX', '5000'))
+
+    # In-memory ring of the newest readings per device, fed by every ingestion
+    # path in the process. Off by default: only enable it where all telemetry
+    # of the served devices is ingested by this process (run.py turns it on
+    # for its single-process mode unless HOT_TIER_ENABLED=False)
+    HOT_TIER_ENABLED = os.getenv('HOT_TIER_ENABLED', 'False').lower() == 'true'
+    HOT_TIER_CAPACITY = int(os.getenv('HOT_TIER_CAPACITY', '720'))
+    HOT_TIER_MAX_DEVICES = int(os.getenv('HOT_TIER_MAX_DEVICES', '10000'))
+
+    # MongoDB raw-payload archive writer; overflow policy 'drop' or 'block'
+    MONGO_BATCH_SIZE = int(os.getenv('MONGO_BATCH_SIZE', '1000'))
+    MONGO_FLUSH_INTERVAL = float(os.getenv('MONGO_FLUSH_INTERVAL', '1.0'))
+    MONGO_QUEUE_SIZE = int(os.getenv('MONGO_QUEUE_SIZE', '100000'))
+    MONGO_OVERFLOW_POLICY = os.getenv('MONGO_OVERFLOW_POLICY', 'drop')
+    MONGO_TIME_SERIES = os.getenv('MONGO_TIME_SERIES', 'True').lower() == 'true'
+
+    # device_telemetry time partitions: 'day' or 'week'. Retention is opt-in:
+    # 0 keeps everything, N drops partitions older than N days
+    TELEMETRY_PARTITION_INTERVAL = os.getenv('TELEMETRY_PARTITION_INTERVAL', 'day')
+    TELEMETRY_PARTITIONS_AHEAD = int(os.getenv('TELEMETRY_PARTITIONS_AHEAD', '7'))
+    TELEMETRY_RETENTION_DAYS = int(os.getenv('TELEMETRY_RETENTION_DAYS', '0'))
+    TELEMETRY_PARTITION_MAINTENANCE_INTERVAL = float(
+        os.getenv('TELEMETRY_PARTITION_MAINTENANCE_INTERVAL', '3600')
+    )
+
+    # Minute/hour statistics rollups; retention 0 keeps rollups forever
+    TELEMETRY_ROLLUP_INTERVAL = float(os.getenv('TELEMETRY_ROLLUP_INTERVAL', '30'))
+    TELEMETRY_ROLLUP_LATENESS = float(os.getenv('TELEMETRY_ROLLUP_LATENESS', '60'))
+    TELEMETRY_ROLLUP_MINUTE_RETENTION_DAYS = int(os.getenv('TELEMETRY_ROLLUP_MINUTE_RETENTION_DAYS', '30'))
+    TELEMETRY_ROLLUP_HOUR_RETENTION_DAYS = int(os.getenv('TELEMETRY_ROLLUP_HOUR_RETENTION_DAYS', '0'))
+    STATS_MAX_HOURS = int(os.getenv('STATS_MAX_HOURS', str(24 * 366)))
+
+    # Compressed cold tier: readings older than AFTER_DAYS move from PostgreSQL
+    # into segment files; a non-zero TELEMETRY_RETENTION_DAYS must be larger
+    # for any data to reach it. Retention 0 keeps segments forever
+    COLD_STORAGE_ENABLED = os.getenv('COLD_STORAGE_ENABLED', 'False').lower() == 'true'
+    COLD_STORAGE_DIR = os.getenv('COLD_STORAGE_DIR', 'data/cold')
+    COLD_STORAGE_AFTER_DAYS = int(os.getenv('COLD_STORAGE_AFTER_DAYS', '7'))
+    COLD_STORAGE_INTERVAL = float(os.getenv('COLD_STORAGE_INTERVAL', '3600'))
+    COLD_STORAGE_RETENTION_DAYS = int(os.getenv('COLD_STORAGE_RETENTION_DAYS', '0'))
+
+    # Virtual device simulation
+    SYSTEM_METRICS_INTERVAL = float(os.getenv('SYSTEM_METRICS_INTERVAL', '1.0'))
     
     # Service ports with explicit types
     SIGNING_SERVICE_PORT = int(os.getenv('SIGNING_SERVICE_PORT', '5000'))
@@ -3,8 +3,63 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS  
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import insert
 from device_management.models import db, Device, DeviceTelemetry
+from device_management.utils import (
+    TELEMETRY_FIELDS, validate_telemetry_data, parse_ndjson,
+    parse_history_args, history_page, history_stream
+)
 from config.config import config
+from utils.device_registry import known_devices
+from utils.last_active import last_active_tracker
+from utils.hot_tier import HOT_METRICS, hot_tier
+from utils.latest_readings import latest_readings
+from utils.response_cache import response_cache
+
+def store_readings(readings):
+    """Store telemetry readings and create unknown devices in one transaction"""
+    now = datetime.utcnow()
+    new_devices = known_devices.unknown({r['device_id'] for r in readings})
+    try:
+        if new_devices:
+            db.session.execute(
+                insert(Device.__table__)
+                .values([
+                    {
+                        'device_id': device_id,
+                        'name': f"Virtual Device {device_id}",
+                        'owner_id': 1,
+                        'device_type': 'virtual'
+                    }
+                    for device_id in new_devices
+                ])
+                .on_conflict_do_nothing(index_elements=['device_id'])
+            )
+
+        db.session.execute(
+            DeviceTelemetry.__table__.insert(),
+            [
+                dict(
+                    {field: r.get(field) for field in TELEMETRY_FIELDS},
+                    device_id=r['device_id'],
+                    timestamp=now
+                )
+                for r in readings
+            ]
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # A device may have been deleted behind the registry's back
+        known_devices.discard_many({r['device_id'] for r in readings})
+        raise
+
+    known_devices.add_many(new_devices)
+    last_active_tracker.touch_many({r['device_id']: now for r in readings})
+    latest_readings.update_many({r['device_id']: (now, r) for r in readings})
+    response_cache.invalidate_devices({r['device_id'] for r in readings})
+    for r in readings:
+        hot_tier.append(r['device_id'], now, [r.get(metric) for metric in HOT_METRICS])
 
 def create_app(config_name='default'):
     """Device management service application factory"""
@@ -17,12 +72,12 @@ def create_app(config_name='default'):
 
     @app.route('/api/devices', methods=['GET'])
     def get_devices():
+        """All devices with their latest reading and online status"""
         try:
             with app.app_context():
-                devices = Device.query.all()
                 return jsonify({
                     'success': True,
-                    'devices': [device.to_dict() for device in devices]
+                    'devices': Device.list_with_latest()
                 })
         except Exception as e:
             print(f"[ERROR] Get devices failed: {e}")
@@ -31,9 +86,6 @@ def create_app(config_name='default'):
                 'error': str(e)
             }), 500
 
-    return app
-
-
     @app.route('/api/devices/<device_id>', methods=['GET'])
     def get_device(device_id):
         """Get specific device details"""
@@ -61,59 +113,97 @@ def create_app(config_name='default'):
         try:
             data = request.get_json()
             
-            if not data or 'device_id' not in data:
+            is_valid, message = validate_telemetry_data(data)
+            if not is_valid:
                 return jsonify({
                     'success': False, 
-                    'error': 'Invalid data format'
+                    'error': f'Invalid data format: {message}'
                 }), 400
 
-            # Find or create device
-            device = Device.query.filter_by(device_id=data['device_id']).first()
-            if not device:
-                device = Device(
-                    device_id=data['device_id'],
-                    name=f"Virtual Device {data['device_id']}",
-                    owner_id=1,
-                    device_type='virtual'
-                )
-                db.session.add(device)
-            
-            # Create telemetry
-            telemetry = DeviceTelemetry(
-                device_id=data['device_id'],
-                temperature=data.get('temperature'),
-                humidity=data.get('humidity'),
-                cpu_usage=data.get('cpu_usage'),
-                memory_usage=data.get('memory_usage')
-            )
-            
-            db.session.add(telemetry)
-            device.last_active = datetime.utcnow()
-            db.session.commit()
-            
+            store_readings([data])
             return jsonify({'success': True})
             
         except Exception as e:
-            db.session.rollback()
             print(f"[ERROR] Store telemetry failed: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
 
-    return app
+    @app.route('/api/device-data/batch', methods=['POST'])
+    def receive_data_batch():
+        """Store a batch of telemetry readings from any number of devices.
+
+        Accepts a JSON array (or an object with a ``readings`` array), or
+        NDJSON with one reading per line when sent as application/x-ndjson.
+        Valid readings are stored in a single transaction; the response
+        carries a status for every item in request order.
+        """
+        try:
+            if request.mimetype == 'application/x-ndjson':
+                items = parse_ndjson(request.get_data(as_text=True))
+            else:
+                items = request.get_json(silent=True)
+                if isinstance(items, dict):
+                    items = items.get('readings')
+
+            if not isinstance(items, list) or not items:
+                return jsonify({
+                    'success': False,
+                    'error': 'Expected a non-empty array of readings'
+                }), 400
+
+            max_size = app.config['DEVICE_DATA_BATCH_MAX']
+            if len(items) > max_size:
+                return jsonify({
+                    'success': False,
+                    'error': f'Batch exceeds {max_size} readings'
+                }), 413
+
+            results = []
+            readings = []
+            for index, item in enumerate(items):
+                is_valid, message = validate_telemetry_data(item)
+                if is_valid:
+                    readings.append(item)
+                    results.append({'index': index, 'status': 'ok'})
+                else:
+                    results.append({'index': index, 'status': 'error', 'error': message})
+
+            if readings:
+                store_readings(readings)
+
+            return jsonify({
+                'success': bool(readings),
+                'accepted': len(readings),
+                'rejected': len(items) - len(readings),
+                'results': results
+            }), 200 if readings else 400
+
+        except Exception as e:
+            print(f"[ERROR] Store telemetry batch failed: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
 
     @app.route('/api/device-data/<device_id>', methods=['GET'])
     def get_device_data(device_id):
-        """Get device telemetry history"""
+        """Get device telemetry history, newest first.
+
+        Pages of ``limit`` rows (default 100) are chained with the returned
+        ``next_cursor``; ``stream=json|ndjson`` streams every row instead.
+        """
         try:
-            telemetry = DeviceTelemetry.query\
-                .filter_by(device_id=device_id)\
-                .order_by(DeviceTelemetry.timestamp.desc())\
-                .limit(100)\
-                .all()
+            try:
+                limit, before, stream = parse_history_args(
+                    request.args, 100, app.config['HISTORY_MAX_PAGE_SIZE']
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
 
-            return jsonify({
-                'success': True,
-                'data': [t.to_dict() for t in telemetry]
-            })
+            if stream:
+                rows = DeviceTelemetry.iter_history(
+                    device_id, before=before,
+                    batch_size=app.config['HISTORY_STREAM_BATCH_SIZE']
+                )
+                return history_stream(rows, stream, DeviceTelemetry.history_row_to_dict)
+            rows = DeviceTelemetry.iter_history(device_id, before=before, limit=limit + 1)
+            return history_page(rows, limit, DeviceTelemetry.history_row_to_dict)
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -1,6 +1,19 @@
 # File: device_management/models.py
+import math
+from collections import namedtuple
 from datetime import datetime
+from itertools import islice
+from sqlalchemy import DDL, event
 from db import db
+from utils.cold_storage import from_micros, get_store, to_micros
+from utils.device_registry import known_devices
+from utils.last_active import last_active_tracker
+from utils.hot_tier import hot_tier
+from utils.latest_readings import LATEST_METRICS, is_online, latest_readings
+from utils.response_cache import response_cache
+from utils.telemetry_partitions import (
+    CREATE_DEFAULT_PARTITION, DEVICE_TIME_INDEX, INDEXED_METRICS
+)
 
 class Device(db.Model):
     """Device model for storing device information"""
@@ -23,8 +36,17 @@ class Device(db.Model):
         """Update device's last active timestamp"""
         self.last_active = datetime.utcnow()
 
+    @property
+    def current_last_active(self):
+        """last_active including activity not yet flushed to the database"""
+        pending = last_active_tracker.get(self.device_id)
+        if pending and (not self.last_active or pending > self.last_active):
+            return pending
+        return self.last_active
+
     def to_dict(self):
         """Convert device object to dictionary"""
+        last_active = self.current_last_active
         return {
             'id': self.id,
             'device_id': self.device_id,
@@ -32,18 +54,59 @@ class Device(db.Model):
             'status': self.status,
             'owner_id': self.owner_id,
             'created_at': self.created_at.isoformat(),
-            'last_active': self.last_active.isoformat() if self.last_active else None,
+            'last_active': last_active.isoformat() if last_active else None,
             'device_type': self.device_type,
             'device_info': self.device_info
         }
 
+    @classmethod
+    def list_with_latest(cls):
+        """to_dict() of every device plus its newest reading and online status.
+
+        Stored latest readings are joined in the same query; readings this
+        process has seen but not flushed yet take precedence when newer.
+        """
+        now = datetime.utcnow()
+        rows = db.session.query(cls, DeviceLatest)\
+            .outerjoin(DeviceLatest, DeviceLatest.device_id == cls.device_id)\
+            .all()
+        devices = []
+        for device, stored in rows:
+            latest = latest_readings.get(device.device_id)
+            if stored is not None and (latest is None or stored.timestamp > latest[0]):
+                latest = (stored.timestamp, tuple(getattr(stored, metric) for metric in LATEST_METRICS))
+            data = device.to_dict()
+            data['latest'] = None if latest is None else dict(
+                zip(LATEST_METRICS, latest[1]), timestamp=latest[0].isoformat()
+            )
+            data['online'] = is_online(latest[0] if latest else None, now)
+            devices.append(data)
+        return devices
+
 class DeviceTelemetry(db.Model):
-    """Model for storing device sensor data"""
+    """Model for storing device sensor data.
+
+    The table is range-partitioned by timestamp (see
+    utils/telemetry_partitions.py), so the partition key is part of the
+    primary key.
+    """
     __tablename__ = 'device_telemetry'
+    __table_args__ = (
+        db.Index(
+            DEVICE_TIME_INDEX,
+            'device_id',
+            db.text('timestamp DESC'),
+            postgresql_include=['id'] + list(INDEXED_METRICS)
+        ),
+        {'postgresql_partition_by': 'RANGE (timestamp)'}
+    )
+
+    # Columns returned by the history endpoints; all covered by DEVICE_TIME_INDEX
+    HISTORY_COLUMNS = ('id', 'device_id', 'timestamp') + INDEXED_METRICS
     
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     device_id = db.Column(db.String(80), db.ForeignKey('devices.device_id'), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    timestamp = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow, index=True)
     temperature = db.Column(db.Float)
     humidity = db.Column(db.Float)
     cpu_usage = db.Column(db.Float)
@@ -67,4 +130,109 @@ class DeviceTelemetry(db.Model):
             'battery_level': self.battery_level,
             'signal_strength': self.signal_strength,
             'raw_data': self.raw_data
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def history_query(cls, device_id, since=None, before=None):
+        """Newest-first readings of one device, limited to HISTORY_COLUMNS.
+
+        ``before`` is a (timestamp, id) keyset position; only rows after it
+        in (timestamp DESC, id DESC) order are returned.
+        """
+        query = cls.query\
+            .with_entities(*[getattr(cls, name) for name in cls.HISTORY_COLUMNS])\
+            .filter(cls.device_id == device_id)
+        if since is not None:
+            query = query.filter(cls.timestamp >= since)
+        if before is not None:
+            query = query.filter(db.tuple_(cls.timestamp, cls.id) < db.tuple_(*before))
+        return query.order_by(cls.timestamp.desc(), cls.id.desc())
+
+    @classmethod
+    def iter_history(cls, device_id, since=None, before=None, limit=None, batch_size=1000):
+        """Rows of history_query across the database and the cold tier.
+
+        Rows stream newest first from PostgreSQL ``batch_size`` at a time;
+        once those run out, readings older than the cold storage horizon
+        follow from the segment files one day at a time. ``limit`` caps the
+        total number of rows.
+        """
+        query = cls.history_query(device_id, since=since, before=before)
+        if limit is not None:
+            query = query.limit(limit)
+        emitted = 0
+        for row in query.yield_per(batch_size):
+            yield row
+            emitted += 1
+
+        horizon = get_store().horizon()
+        if horizon is None or (since is not None and since >= horizon):
+            return
+        if limit is not None:
+            if emitted >= limit:
+                return
+            limit -= emitted
+        cold = cls._iter_cold_history(device_id, since, horizon, before)
+        yield from (cold if limit is None else islice(cold, limit))
+
+    @classmethod
+    def _iter_cold_history(cls, device_id, since, horizon, before):
+        store = get_store()
+        metrics = cls.HISTORY_COLUMNS[3:]
+        for day in reversed(store.days_between(since, horizon)):
+            data = store.read_day(device_id, day, ('id',) + metrics, since, horizon)
+            if data is None or not len(data['timestamp']):
+                continue
+            micros, ids = data['timestamp'], data['id']
+            if before is not None:
+                before_micros = to_micros(before[0])
+                keep = (micros < before_micros) | ((micros == before_micros) & (ids < before[1]))
+                micros, ids = micros[keep], ids[keep]
+                columns = [data[metric][keep] for metric in metrics]
+            else:
+                columns = [data[metric] for metric in metrics]
+            columns = [column.tolist() for column in columns]
+            # Segments are stored oldest first
+            for index in range(len(micros) - 1, -1, -1):
+                yield ColdTelemetryRow(
+                    int(ids[index]), device_id, from_micros(int(micros[index])),
+                    *[None if math.isnan(column[index]) else column[index] for column in columns]
+                )
+
+    @staticmethod
+    def history_row_to_dict(row):
+        """Convert a history_query row to the to_dict layout (without raw_data)"""
+        data = row._asdict()
+        data['timestamp'] = row.timestamp.isoformat()
+        return data
+
+class DeviceLatest(db.Model):
+    """Newest reading per device, upserted by utils/latest_readings.py"""
+    __tablename__ = 'device_latest'
+
+    device_id = db.Column(
+        db.String(80), db.ForeignKey('devices.device_id', ondelete='CASCADE'), primary_key=True
+    )
+    timestamp = db.Column(db.DateTime, nullable=False)
+    temperature = db.Column(db.Float)
+    humidity = db.Column(db.Float)
+    cpu_usage = db.Column(db.Float)
+    memory_usage = db.Column(db.Float)
+    disk_usage = db.Column(db.Float)
+    battery_level = db.Column(db.Float)
+    signal_strength = db.Column(db.Float)
+
+# history_query row shape for readings served from the cold tier
+ColdTelemetryRow = namedtuple('ColdTelemetryRow', DeviceTelemetry.HISTORY_COLUMNS)
+
+# Rows need a partition to land in before the maintainer has run
+event.listen(DeviceTelemetry.__table__, 'after_create', DDL(CREATE_DEFAULT_PARTITION))
+
+@event.listens_for(Device, 'after_delete')
+def _forget_deleted_device(mapper, connection, target):
+    """Keep the in-process device caches in step with deleted devices"""
+    known_devices.discard(target.device_id)
+    last_active_tracker.forget(target.device_id)
+    hot_tier.forget(target.device_id)
+    latest_readings.forget(target.device_id)
+    response_cache.invalidate_devices([target.device_id])
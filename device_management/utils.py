@@ -1,32 +1,23 @@
 # File: device_management/utils.py
-import pika
 import json
+import base64
+from datetime import datetime
 from functools import wraps
-from flask import jsonify
+from itertools import islice
+from flask import Response, jsonify, stream_with_context
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from utils.transport import get_transport
 
-def setup_rabbitmq(host='localhost'):
-    """Setup RabbitMQ connection and channel"""
-    try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=host)
-        )
-        channel = connection.channel()
-        channel.queue_declare(queue='device_data')
-        return channel
-    except Exception as e:
-        print(f"RabbitMQ setup failed: {e}")
-        return None
+def publish_to_queue(data):
+    """Publish data through the configured message transport.
 
-def publish_to_queue(channel, data):
-    """Publish data to RabbitMQ queue"""
+    ``data`` may be one reading or a list of readings; a list is split by
+    partition queue and each part is sent as one message. Returns True
+    only if every reading was accepted.
+    """
+    readings = data if isinstance(data, list) else [data]
     try:
-        channel.basic_publish(
-            exchange='',
-            routing_key='device_data',
-            body=json.dumps(data)
-        )
-        return True
+        return get_transport().publish_batch(readings, pack=True) == len(readings)
     except Exception as e:
         print(f"Failed to publish to queue: {e}")
         return False
@@ -46,6 +37,107 @@ def validate_device_data(data):
 
     return True, None
 
+TELEMETRY_FIELDS = (
+    'temperature', 'humidity', 'cpu_usage', 'memory_usage',
+    'disk_usage', 'battery_level', 'signal_strength'
+)
+
+def validate_telemetry_data(data):
+    """Validate a single telemetry reading"""
+    if not isinstance(data, dict):
+        return False, "Reading must be an object"
+
+    device_id = data.get('device_id')
+    if not device_id or not isinstance(device_id, str):
+        return False, "Missing required field: device_id"
+    if len(device_id) > 80:
+        return False, "device_id must be at most 80 characters"
+
+    for field in TELEMETRY_FIELDS:
+        value = data.get(field)
+        if value is not None and (
+                isinstance(value, bool) or not isinstance(value, (int, float))):
+            return False, f"Field {field} must be a number"
+
+    return True, None
+
+def parse_ndjson(body):
+    """Parse newline-delimited JSON, yielding None for unparseable lines"""
+    items = []
+    for line in body.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError:
+            items.append(None)
+    return items
+
+STREAM_FORMATS = ('json', 'ndjson')
+
+def encode_cursor(timestamp, row_id):
+    """Opaque keyset cursor for the row after which the next page starts"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def parse_history_args(args, default_limit, max_limit):
+    """Read limit, cursor and stream from request args; raises ValueError"""
+    limit = args.get('limit', default=default_limit, type=int)
+    if limit is None or not 1 <= limit <= max_limit:
+        raise ValueError(f"limit must be between 1 and {max_limit}")
+    cursor = args.get('cursor')
+    before = decode_cursor(cursor) if cursor else None
+    stream = args.get('stream')
+    if stream and stream not in STREAM_FORMATS:
+        raise ValueError(f"stream must be one of {STREAM_FORMATS}")
+    return limit, before, stream
+
+def history_page(rows, limit, to_dict):
+    """One keyset page from an iterable of rows; returns the JSON response with next_cursor"""
+    rows = list(islice(rows, limit + 1))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return jsonify({
+        'success': True,
+        'data': [to_dict(row) for row in rows],
+        'next_cursor': next_cursor
+    })
+
+def history_stream(rows, stream, to_dict):
+    """Stream rows as a JSON document or NDJSON.
+
+    ``rows`` is consumed lazily (e.g. DeviceTelemetry.iter_history) and
+    written as rows arrive, so memory use does not depend on the number
+    of rows.
+    """
+    def generate_ndjson():
+        for row in rows:
+            yield json.dumps(to_dict(row)) + '\n'
+
+    def generate_json():
+        yield '{"success": true, "data": ['
+        separator = ''
+        for row in rows:
+            yield separator + json.dumps(to_dict(row))
+            separator = ','
+        yield ']}'
+
+    if stream == 'ndjson':
+        return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    return Response(stream_with_context(generate_json()), mimetype='application/json')
+
 def api_response(success=True, message=None, data=None, status_code=200):
     """Generate standardized API response"""
     response = {
@@ -3,16 +3,23 @@
 from flask import Flask, request, jsonify, send_from_directory
 from flask_socketio import SocketIO
 from flask_cors import CORS  
-from sqlalchemy import func
+from eventlet.green import threading as green_threading
+from collections import deque
 from datetime import datetime, timedelta
-import eventlet
-import pika
-import json
 
 # Import local modules
 from db import db
 from device_management.models import Device, DeviceTelemetry
+from device_management.utils import parse_history_args, history_page, history_stream
 from config.config import config
+from monitoring_service.downsampling import (
+    CHART_METRICS, MODES, bucket_seconds, bucketed_history, lttb_history
+)
+from utils.rollups import query_stats
+from utils.transport import get_transport
+from utils.telemetry_writer import get_writer
+from utils.hot_tier import hot_tier
+from utils.response_cache import response_cache
 
 def create_app(config_name='default'):
     """Create and configure monitoring service application"""
@@ -37,32 +44,14 @@ def create_app(config_name='default'):
         engineio_logger=True
     )
 
-    def setup_rabbitmq():
-        """Setup RabbitMQ connection with retries"""
-        MAX_RETRIES = 3
-        for attempt in range(MAX_RETRIES):
-            try:
-                params = pika.ConnectionParameters(
-                    host='127.0.0.1',
-                    port=5672,
-                    credentials=pika.PlainCredentials('guest', 'guest'),
-                    heartbeat=600,
-                    connection_attempts=3,
-                    retry_delay=2
-                )
-                connection = pika.BlockingConnection(params)
-                channel = connection.channel()
-                channel.queue_declare(queue='device_data', durable=True)
-                print("[OK] RabbitMQ connected")
-                return channel
-            except Exception as e:
-                print(f"[ERROR] RabbitMQ connection attempt {attempt + 1} failed: {e}")
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(2)
-        return None
+    # Drain device_data from the configured transport in background
+    # consumer threads; with partitioning enabled this node only consumes
+    # the partitions it owns
+    consumer = get_transport(config[config_name]).consumer()
+    app.extensions['device_data_consumer'] = consumer
 
-    # Initialize RabbitMQ
-    channel = setup_rabbitmq()
+    # Requests are greenlets; coalesced cache misses must wait cooperatively
+    response_cache.event_factory = green_threading.Event
 
     @app.route('/')
     def index():
@@ -71,11 +60,10 @@ def create_app(config_name='default'):
 
     @app.route('/api/devices')
     def get_devices():
-        """Get all devices"""
+        """Get all devices with their latest reading and online status"""
         try:
             with app.app_context():
-                devices = Device.query.all()
-                device_list = [d.to_dict() for d in devices]
+                device_list = Device.list_with_latest()
                 socketio.emit('devices_update', device_list)
                 return jsonify({
                     'success': True,
@@ -90,22 +78,75 @@ def create_app(config_name='default'):
 
     @app.route('/api/monitoring/data/<device_id>')
     def get_device_data(device_id):
-        """Get device telemetry data"""
+        """Get device telemetry data.
+
+        With ``points`` (or ``resolution`` in seconds) the history is
+        downsampled to at most MONITORING_MAX_POINTS points: ``mode=avg``
+        averages time buckets in the database, ``mode=lttb`` keeps the
+        readings that best preserve the shape of ``metric``. Downsampled
+        responses are cached per device, window and parameters. Otherwise
+        raw rows are returned in keyset pages (``limit``/``cursor``) or,
+        with ``stream=json|ndjson``, streamed in full.
+        """
         try:
             hours = request.args.get('hours', default=1, type=int)
-            start_time = datetime.utcnow() - timedelta(hours=hours)
+            points = request.args.get('points', type=int)
+            resolution = request.args.get('resolution', type=int)
+            mode = request.args.get('mode', default='avg')
+            metric = request.args.get('metric', default='temperature')
+            end_time = datetime.utcnow()
+            start_time = end_time - timedelta(hours=hours)
 
-            telemetry = DeviceTelemetry.query\
-                .filter(
-                    DeviceTelemetry.device_id == device_id,
-                    DeviceTelemetry.timestamp >= start_time
-                )\
-                .order_by(DeviceTelemetry.timestamp.desc())\
-                .all()
+            if mode not in MODES or metric not in CHART_METRICS:
+                return jsonify({
+                    'success': False,
+                    'error': f"mode must be one of {MODES} and metric one of {CHART_METRICS}"
+                }), 400
 
-            data = [t.to_dict() for t in telemetry]
-            socketio.emit(f'device_data_{device_id}', data)
-            return jsonify({'success': True, 'data': data})
+            max_points = app.config['MONITORING_MAX_POINTS']
+            if points is None and resolution is None:
+                try:
+                    limit, before, stream = parse_history_args(
+                        request.args,
+                        app.config['HISTORY_PAGE_SIZE'],
+                        app.config['HISTORY_MAX_PAGE_SIZE']
+                    )
+                except ValueError as e:
+                    return jsonify({'success': False, 'error': str(e)}), 400
+
+                if stream:
+                    rows = DeviceTelemetry.iter_history(
+                        device_id, since=start_time, before=before,
+                        batch_size=app.config['HISTORY_STREAM_BATCH_SIZE']
+                    )
+                    return history_stream(rows, stream, DeviceTelemetry.history_row_to_dict)
+                rows = DeviceTelemetry.iter_history(
+                    device_id, since=start_time, before=before, limit=limit + 1
+                )
+                return history_page(rows, limit, DeviceTelemetry.history_row_to_dict)
+            elif mode == 'lttb':
+                points = min(max(points or max_points, 3), max_points)
+                key = ('data', device_id, hours, mode, metric, points)
+
+                def compute():
+                    data = lttb_history(device_id, start_time, end_time, points, metric)
+                    return {'success': True, 'mode': mode, 'data': data}
+            else:
+                points = min(max(points or max_points, 1), max_points)
+                # Never return more buckets than the chart can draw
+                if resolution and resolution < bucket_seconds(start_time, end_time, max_points):
+                    resolution = None
+                key = ('data', device_id, hours, mode, points, resolution)
+
+                def compute():
+                    data, seconds = bucketed_history(
+                        device_id, start_time, end_time, points=points, resolution=resolution
+                    )
+                    return {'success': True, 'mode': mode, 'resolution': seconds, 'data': data}
+
+            response = response_cache.get_or_compute(key, compute, device_id=device_id)
+            socketio.emit(f'device_data_{device_id}', response['data'])
+            return jsonify(response)
             
         except Exception as e:
             print(f"[ERROR] Failed to get device data: {e}")
@@ -119,32 +160,33 @@ def create_app(config_name='default'):
         """Get device statistics"""
         try:
             hours = request.args.get('hours', default=24, type=int)
+            if hours < 1 or hours > app.config['STATS_MAX_HOURS']:
+                return jsonify({
+                    'success': False,
+                    'error': f"hours must be between 1 and {app.config['STATS_MAX_HOURS']}"
+                }), 400
             start_time = datetime.utcnow() - timedelta(hours=hours)
-            
-            stats = db.session.query(
-                func.avg(DeviceTelemetry.temperature).label('avg_temperature'),
-                func.avg(DeviceTelemetry.humidity).label('avg_humidity'),
-                func.avg(DeviceTelemetry.cpu_usage).label('avg_cpu'),
-                func.min(DeviceTelemetry.temperature).label('min_temperature'),
-                func.max(DeviceTelemetry.temperature).label('max_temperature'),
-                func.count(DeviceTelemetry.id).label('total_readings')
-            ).filter(
-                DeviceTelemetry.device_id == device_id,
-                DeviceTelemetry.timestamp >= start_time
-            ).first()
 
-            return jsonify({
-                'success': True,
-                'stats': {
-                    'avg_temperature': float(stats.avg_temperature or 0),
-                    'avg_humidity': float(stats.avg_humidity or 0),
-                    'avg_cpu': float(stats.avg_cpu or 0),
-                    'min_temperature': float(stats.min_temperature or 0),
-                    'max_temperature': float(stats.max_temperature or 0),
-                    'total_readings': stats.total_readings or 0,
-                    'time_range': f'Last {hours} hours'
+            def compute():
+                # Whole hours and minutes come from rollups, only the edges from raw rows
+                stats = query_stats(device_id, start_time)
+                temperature = stats['temperature']
+                return {
+                    'success': True,
+                    'stats': {
+                        'avg_temperature': float(temperature['avg'] or 0),
+                        'avg_humidity': float(stats['humidity']['avg'] or 0),
+                        'avg_cpu': float(stats['cpu_usage']['avg'] or 0),
+                        'min_temperature': float(temperature['min'] or 0),
+                        'max_temperature': float(temperature['max'] or 0),
+                        'total_readings': stats['readings'],
+                        'time_range': f'Last {hours} hours'
+                    }
                 }
-            })
+
+            return jsonify(response_cache.get_or_compute(
+                ('stats', device_id, hours), compute, device_id=device_id
+            ))
             
         except Exception as e:
             print(f"[ERROR] Failed to get device stats: {e}")
@@ -153,30 +195,60 @@ def create_app(config_name='default'):
                 'error': str(e)
             }), 500
 
-    def process_device_data(ch, method, properties, body):
-        """Process incoming device data from RabbitMQ"""
-        try:
-            data = json.loads(body)
-            socketio.emit(f'device_data_{data["device_id"]}', data)
-            print(f"[OK] Processed data for device: {data['device_id']}")
-        except Exception as e:
-            print(f"[ERROR] Failed to process device data: {e}")
+    @app.route('/api/monitoring/cache/stats')
+    def get_cache_stats():
+        """Response cache and hot tier counters"""
+        return jsonify({
+            'success': True,
+            'response_cache': response_cache.get_stats(),
+            'hot_tier': hot_tier.get_stats()
+        })
+
+    # Consumer workers are OS threads, which must not call socketio.emit
+    # under eventlet; they only queue readings for an emitter greenlet
+    broadcasts = deque(maxlen=app.config['MONITORING_BROADCAST_BUFFER'])
+    emitter = {'started': False}
 
-    # Setup RabbitMQ consumer if connection successful
-    if channel:
-        channel.basic_consume(
-            queue='device_data',
-            on_message_callback=process_device_data,
-            auto_ack=True
-        )
+    def broadcast_device_data(readings):
+        """Queue readings from the queue for Socket.IO clients"""
+        broadcasts.extend(readings)
+
+    def emit_broadcasts():
+        """Emit queued readings from the Socket.IO server's event loop"""
+        while True:
+            try:
+                while broadcasts:
+                    data = broadcasts.popleft()
+                    socketio.emit('device_data', data)
+                    socketio.emit(f'device_data_{data["device_id"]}', data)
+            except Exception as e:
+                print(f"[ERROR] Broadcast of device data failed: {e}")
+            socketio.sleep(app.config['MONITORING_BROADCAST_INTERVAL'])
+
+    def ensure_emitter():
+        # Started on the server's own hub; nobody listens before a connect
+        if not emitter['started']:
+            emitter['started'] = True
+            socketio.start_background_task(emit_broadcasts)
+
+    def persist_device_data(readings):
+        """Commit the group to PostgreSQL before the consumer acks it"""
+        get_writer().write(readings)
+
+    # Persist first: the group is acked only once it is committed, and one
+    # that cannot be stored is requeued before it is broadcast
+    if app.config['MONITORING_PERSIST_QUEUE_DATA']:
+        consumer.add_handler(persist_device_data)
+    consumer.add_handler(broadcast_device_data)
+    consumer.start()
 
     @socketio.on('connect')
     def handle_connect():
         """Handle new WebSocket connection"""
         try:
             print(f"[OK] Client connected: {request.sid}")
-            devices = Device.query.all()
-            socketio.emit('devices_list', [d.to_dict() for d in devices])
+            ensure_emitter()
+            socketio.emit('devices_list', Device.list_with_latest())
         except Exception as e:
             print(f"[ERROR] Socket connect failed: {e}")
 
@@ -190,7 +262,16 @@ def create_app(config_name='default'):
         """Handle device data subscription"""
         try:
             print(f"[OK] Client {request.sid} subscribed to device {device_id}")
-            get_device_data(device_id)
+            end_time = datetime.utcnow()
+            start_time = end_time - timedelta(hours=1)
+            limit = app.config['HISTORY_PAGE_SIZE']
+            if hot_tier.split(device_id, start_time, end_time) == start_time:
+                # The whole last hour is in memory; no database round trip
+                data = hot_tier.readings(device_id, start_time, end_time, limit=limit)
+            else:
+                rows = DeviceTelemetry.iter_history(device_id, since=start_time, limit=limit)
+                data = [DeviceTelemetry.history_row_to_dict(row) for row in rows]
+            socketio.emit(f'device_data_{device_id}', data)
         except Exception as e:
             print(f"[ERROR] Device subscription failed: {e}")
 
@@ -0,0 +1,165 @@
+# File: monitoring_service/consumer.py
+import time
+import threading
+import pika
+from utils import wire_format
+
+
+class DeviceDataConsumer:
+    """Pool of RabbitMQ consumers draining the device_data queue.
+
+    Each worker runs in its own OS thread with its own connection, so a
+    blocked socket never stalls the eventlet hub serving Socket.IO. Messages
+    are delivered with manual acks: a worker collects up to ``ack_batch``
+    messages (or whatever arrived within ``ack_interval`` seconds), passes
+    the decoded readings to every handler in registration order and then
+    acks the whole group with one ``multiple=True`` ack. If a handler fails
+    the later handlers are skipped and the group is nacked and requeued, so
+    a handler that stores readings must have committed them when it
+    returns. Lost connections are re-established with exponential backoff.
+
+    With a partitioned ``ring`` the consumer runs exactly one worker per
+    owned partition queue so every device's readings are handled in order;
+    ``workers`` only applies to the unpartitioned queue.
+    """
+
+    def __init__(self, parameters, ring, partitions=None, handlers=None, workers=2,
+                 prefetch=200, ack_batch=50, ack_interval=1.0, max_backoff=30):
+        self.parameters = parameters
+        self.ring = ring
+        if ring.partitions == 1:
+            self.queue_names = [ring.queue_name(0)] * workers
+        else:
+            owned = range(ring.partitions) if partitions is None else partitions
+            self.queue_names = [ring.queue_name(p) for p in owned]
+        self.handlers = list(handlers or [])
+        self.prefetch = prefetch
+        # A group larger than the prefetch window would never fill up
+        self.ack_batch = max(1, min(ack_batch, prefetch))
+        self.ack_interval = ack_interval
+        self.max_backoff = max_backoff
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'received': 0,
+            'acked': 0,
+            'requeued': 0,
+            'invalid': 0,
+            'reconnects': 0
+        }
+
+    def add_handler(self, handler):
+        """Register ``handler(readings)`` to receive each decoded group"""
+        self.handlers.append(handler)
+
+    def _incr(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['workers'] = len(self._threads)
+        stats['queues'] = sorted(set(self.queue_names))
+        return stats
+
+    def start(self):
+        self._stop.clear()
+        for index, queue_name in enumerate(self.queue_names):
+            thread = threading.Thread(
+                target=self._run,
+                args=(queue_name,),
+                name=f"device_data_consumer_{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self, queue_name):
+        backoff = 1
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = pika.BlockingConnection(self.parameters)
+                channel = connection.channel()
+                channel.queue_declare(
+                    queue=queue_name,
+                    durable=True,
+                    arguments=self.ring.queue_arguments(queue_name)
+                )
+                channel.basic_qos(prefetch_count=self.prefetch)
+                backoff = 1
+                self._consume(channel, queue_name)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                self._incr('reconnects')
+                print(f"[ERROR] Consumer connection lost: {e}; retrying in {backoff}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                if connection is not None and connection.is_open:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _consume(self, channel, queue_name):
+        pending = []
+        first_at = None
+        for method, properties, body in channel.consume(
+                queue_name, inactivity_timeout=self.ack_interval):
+            if method is not None:
+                if not pending:
+                    first_at = time.monotonic()
+                pending.append((method.delivery_tag, properties, body))
+
+            if pending and (
+                    len(pending) >= self.ack_batch
+                    or method is None
+                    or time.monotonic() - first_at >= self.ack_interval):
+                self._process(channel, pending)
+                pending = []
+
+            if self._stop.is_set():
+                break
+
+        if pending:
+            self._process(channel, pending)
+        channel.cancel()
+
+    def decode(self, properties, body):
+        """Decode one message body into a list of readings"""
+        return wire_format.decode(body, properties.content_type)
+
+    def _process(self, channel, pending):
+        readings = []
+        for _, properties, body in pending:
+            try:
+                readings.extend(self.decode(properties, body))
+            except Exception as e:
+                # Poison message: drop it rather than redeliver forever
+                self._incr('invalid')
+                print(f"[ERROR] Discarding undecodable message: {e}")
+        self._incr('received', len(pending))
+
+        last_tag = pending[-1][0]
+        try:
+            for handler in self.handlers:
+                handler(readings)
+        except Exception as e:
+            print(f"[ERROR] Failed to process device data: {e}")
+            channel.basic_nack(delivery_tag=last_tag, multiple=True, requeue=True)
+            self._incr('requeued', len(pending))
+            return
+
+        channel.basic_ack(delivery_tag=last_tag, multiple=True)
+        self._incr('acked', len(pending))
@@ -1,10 +1,47 @@
 # File: monitoring_service/database.py
-from pymongo import MongoClient
+import time
+import queue
+import threading
 from datetime import datetime
-import urllib.parse
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import BulkWriteError, CollectionInvalid
+from config.config import Config
+
+OVERFLOW_POLICIES = ('drop', 'block')
+
 
 class MongoDatabase:
-    def __init__(self, uri, database):
+    """Raw-payload archive in MongoDB.
+
+    ``store_device_data`` only queues the document; a background thread
+    writes queued documents with unordered ``insert_many`` whenever
+    ``batch_size`` are pending or ``flush_interval`` seconds have passed.
+    When the buffer is full the ``drop`` policy rejects new documents at
+    once, ``block`` waits up to ``block_timeout`` seconds for room.
+    """
+
+    def __init__(self, uri, database, collection='device_data', batch_size=None,
+                 flush_interval=None, max_queue_size=None, overflow=None,
+                 block_timeout=1.0, time_series=None):
+        self.batch_size = batch_size or Config.MONGO_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.MONGO_FLUSH_INTERVAL
+        self.overflow = overflow or Config.MONGO_OVERFLOW_POLICY
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=max_queue_size or Config.MONGO_QUEUE_SIZE)
+
+        self._thread = None
+        self._running = False
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'dropped': 0,
+            'written': 0,
+            'failed': 0,
+            'flushes': 0
+        }
+
         try:
             # Configure MongoDB client with timeout settings
             self.client = MongoClient(
@@ -16,29 +53,135 @@ class MongoDatabase:
                 retryReads=True
             )
             self.db = self.client[database]
-            self.device_data = self.db.device_data
-            
+
             # Quick connection test
             self.client.admin.command('ping')
-            print("MongoDB connection successful")
-            
+            self.device_data = self._setup_collection(
+                collection, Config.MONGO_TIME_SERIES if time_series is None else time_series
+            )
+            print("[OK] MongoDB connection successful")
+            self.start()
+
         except Exception as e:
-            print(f"MongoDB connection error: {e}")
+            print(f"[ERROR] MongoDB connection error: {e}")
             # Don't raise error - allow system to run without MongoDB
             self.client = None
             self.db = None
             self.device_data = None
 
+    def _setup_collection(self, name, time_series):
+        """Create the collection (time-series if supported) and its indexes"""
+        if time_series and name not in self.db.list_collection_names():
+            try:
+                self.db.create_collection(name, timeseries={
+                    'timeField': 'timestamp',
+                    'metaField': 'device_id',
+                    'granularity': 'seconds'
+                })
+            except CollectionInvalid:
+                pass  # Created concurrently
+            except Exception as e:
+                # Servers before 5.0 have no time-series collections
+                print(f"[INFO] Using a regular collection for {name}: {e}")
+        collection = self.db[name]
+        collection.create_index([('device_id', ASCENDING), ('timestamp', DESCENDING)])
+        return collection
+
+    def start(self):
+        """Start the background write thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run,
+            name="mongo_writer",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the write thread, writing out anything still queued"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        if self.client is not None:
+            self.client.close()
+
     def store_device_data(self, data):
-        """Store device data in MongoDB"""
-        if not self.device_data:
-            print("MongoDB not available - skipping data storage")
-            return None
-            
+        """Queue device data for MongoDB; returns False if it was not accepted"""
+        if self.device_data is None:
+            return False
+
+        document = dict(data)
+        timestamp = document.get('timestamp')
+        if isinstance(timestamp, str):
+            try:
+                document['timestamp'] = datetime.fromisoformat(timestamp)
+            except ValueError:
+                timestamp = None
+        elif isinstance(timestamp, (int, float)):
+            document['timestamp'] = datetime.utcfromtimestamp(timestamp)
+        if not timestamp:
+            document['timestamp'] = datetime.utcnow()
+        try:
+            if self.overflow == 'block':
+                self.queue.put(document, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(document)
+        except queue.Full:
+            self._incr('dropped')
+            return False
+        self._incr('submitted')
+        return True
+
+    def get_stats(self):
+        """Return a snapshot of writer counters"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self.queue.qsize()
+        stats['connected'] = self.device_data is not None
+        return stats
+
+    def _incr(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        while self._running or not self.queue.empty():
+            batch = self._collect_batch()
+            if batch:
+                self._flush(batch)
+
+    def _collect_batch(self):
+        """Block until a full batch is queued or the flush interval elapses"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
         try:
-            if 'timestamp' not in data:
-                data['timestamp'] = datetime.utcnow()
-            return str(self.device_data.insert_one(data).inserted_id)
+            # Unordered: one bad document does not stop the rest of the batch
+            result = self.device_data.insert_many(batch, ordered=False)
+            written = len(result.inserted_ids)
+        except BulkWriteError as e:
+            written = e.details.get('nInserted', 0)
+            print(f"[ERROR] MongoDB bulk write: {len(batch) - written} of {len(batch)} documents failed")
         except Exception as e:
-            print(f"Error storing device data: {e}")
-            return None
\ No newline at end of file
+            written = 0
+            print(f"[ERROR] MongoDB write of {len(batch)} documents failed: {e}")
+        with self._stats_lock:
+            self._stats['written'] += written
+            self._stats['failed'] += len(batch) - written
+            self._stats['flushes'] += 1
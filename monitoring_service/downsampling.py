@@ -0,0 +1,194 @@
+# File: monitoring_service/downsampling.py
+"""Downsampled telemetry history for charts.
+
+Two modes, both returning at most the requested number of points, newest
+first like the raw history endpoint:
+
+``avg``
+    Fixed-width time buckets aggregated in PostgreSQL; only one row per
+    bucket leaves the database. The newest part of the window is served
+    from the in-memory hot tier and buckets older than the cold storage
+    horizon are aggregated from the segment files.
+
+``lttb``
+    Largest-Triangle-Three-Buckets over the raw series of one metric,
+    computed with NumPy. Keeps real readings (peaks and dips survive) and
+    returns all chart metrics of the selected readings.
+"""
+import math
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func
+from device_management.models import DeviceTelemetry
+from utils.cold_storage import get_store
+from utils.hot_tier import hot_tier, to_micros
+
+MODES = ('avg', 'lttb')
+CHART_METRICS = ('temperature', 'humidity', 'cpu_usage', 'memory_usage')
+EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_seconds(start, end, points):
+    """Bucket width that splits [start, end) into at most ``points`` buckets"""
+    span = (end - start).total_seconds()
+    return max(1, int(math.ceil(span / max(points, 1))))
+
+
+def bucketed_history(device_id, start, end, points=None, resolution=None):
+    """Average each metric per time bucket; ``resolution`` overrides the width.
+
+    The recent part of the window held by the hot tier is bucketed in
+    memory, buckets before the cold storage horizon come from the segment
+    files and only the rest is aggregated in PostgreSQL; partial buckets
+    are merged by count and sum. Buckets are aligned to ``start``, so the
+    window never yields more than ``points`` of them.
+    """
+    seconds = resolution or bucket_seconds(start, end, points)
+    hot_start = hot_tier.split(device_id, start, end)
+    buckets = hot_tier.buckets(device_id, hot_start, end, seconds, CHART_METRICS, origin=start)
+    if start < hot_start:
+        _merge_buckets(buckets, _database_buckets(device_id, start, hot_start, seconds))
+        _merge_buckets(buckets, _cold_buckets(device_id, start, hot_start, seconds))
+
+    data = []
+    for key in sorted(buckets, reverse=True):
+        totals = buckets[key]
+        point = {
+            'device_id': device_id,
+            'timestamp': (start + timedelta(seconds=key * seconds)).isoformat(),
+            'readings': totals[0]
+        }
+        for metric, (count, total) in zip(CHART_METRICS, totals[1:]):
+            point[metric] = total / count if count else None
+        data.append(point)
+    return data, seconds
+
+
+def _merge_buckets(buckets, other):
+    """Add {bucket: [readings, (count, sum) per chart metric]} into ``buckets``"""
+    for key, totals in other.items():
+        if key not in buckets:
+            buckets[key] = totals
+            continue
+        merged = buckets[key]
+        merged[0] += totals[0]
+        for index in range(1, len(merged)):
+            merged[index] = (merged[index][0] + totals[index][0], merged[index][1] + totals[index][1])
+
+
+def _database_buckets(device_id, start, end, seconds):
+    """{bucket: [readings, (count, sum) per chart metric]} from PostgreSQL"""
+    offset = func.extract('epoch', DeviceTelemetry.timestamp) - (start - EPOCH).total_seconds()
+    bucket = func.floor(offset / seconds).label('bucket')
+    aggregates = []
+    for metric in CHART_METRICS:
+        column = getattr(DeviceTelemetry, metric)
+        aggregates += [
+            func.count(column).label(f'{metric}_count'),
+            func.sum(column).label(f'{metric}_sum')
+        ]
+    rows = DeviceTelemetry.query\
+        .with_entities(bucket, func.count().label('readings'), *aggregates)\
+        .filter(
+            DeviceTelemetry.device_id == device_id,
+            DeviceTelemetry.timestamp >= start,
+            DeviceTelemetry.timestamp < end
+        )\
+        .group_by(bucket)\
+        .all()
+    return {
+        int(row.bucket): [row.readings] + [
+            (getattr(row, f'{metric}_count'), float(getattr(row, f'{metric}_sum') or 0.0))
+            for metric in CHART_METRICS
+        ]
+        for row in rows
+    }
+
+
+def _cold_buckets(device_id, start, end, seconds):
+    """{bucket: [readings, (count, sum) per chart metric]} from cold storage"""
+    store = get_store()
+    horizon = store.horizon()
+    if horizon is None or start >= horizon:
+        return {}
+    buckets = {}
+    for day in store.days_between(start, min(end, horizon)):
+        data = store.read_day(device_id, day, CHART_METRICS, start, min(end, horizon))
+        if data is None or not len(data['timestamp']):
+            continue
+        keys = (data['timestamp'] - to_micros(start)) // (seconds * 1000000)
+        unique, index = np.unique(keys, return_inverse=True)
+        readings = np.bincount(index, minlength=len(unique))
+        sums = []
+        for metric in CHART_METRICS:
+            values = data[metric]
+            present = ~np.isnan(values)
+            sums.append((
+                np.bincount(index, weights=present, minlength=len(unique)),
+                np.bincount(index, weights=np.where(present, values, 0.0), minlength=len(unique))
+            ))
+        # A bucket may straddle midnight, so days are merged, not assigned
+        _merge_buckets(buckets, {
+            key: [int(readings[position])] + [
+                (int(counts[position]), float(totals[position])) for counts, totals in sums
+            ]
+            for position, key in enumerate(unique.tolist())
+        })
+    return buckets
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    ``x`` must be ascending. The first and last points are always kept and
+    every bucket in between contributes the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket b covers [edges[b], edges[b + 1]) of the interior points
+    edges = (np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)) + 1).astype(int)
+    edges[-1] = n - 1
+
+    # Next-bucket averages from prefix sums; the last bucket looks at the end point
+    x_sum = np.concatenate(([0.0], np.cumsum(x)))
+    y_sum = np.concatenate(([0.0], np.cumsum(y)))
+    next_start = edges[1:]
+    next_end = np.append(edges[2:], n)
+    counts = next_end - next_start
+    avg_x = (x_sum[next_end] - x_sum[next_start]) / counts
+    avg_y = (y_sum[next_end] - y_sum[next_start]) / counts
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        px, py = x[previous], y[previous]
+        areas = np.abs(
+            (px - avg_x[b]) * (y[lo:hi] - py) - (px - x[lo:hi]) * (avg_y[b] - py)
+        )
+        previous = lo + int(np.argmax(areas))
+        selected[b + 1] = previous
+    return selected
+
+
+def lttb_history(device_id, start, end, points, metric='temperature'):
+    """Readings selected by LTTB on ``metric``"""
+    rows = [
+        row for row in DeviceTelemetry.iter_history(device_id, since=start)
+        if row.timestamp < end
+    ]
+    rows.reverse()  # oldest first
+    if len(rows) <= points:
+        selected = rows
+    else:
+        x = np.array([(row.timestamp - EPOCH).total_seconds() for row in rows])
+        y = np.array([getattr(row, metric) for row in rows], dtype=float)
+        # Gaps in the metric must not win the area comparison
+        y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+        selected = [rows[i] for i in lttb_indices(x, y, points)]
+    return [DeviceTelemetry.history_row_to_dict(row) for row in reversed(selected)]
@@ -6,10 +6,8 @@ import os
 import sys
 import time
 import socket
-import psycopg2
 from threading import Thread
 from flask import Flask
-from datetime import datetime
 
 # Add project root to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -18,6 +16,17 @@ from signing_service.app import create_app as create_signing_app
 from device_management.app import create_app as create_device_app
 from monitoring_service.app import create_app as create_monitoring_app
 from virtual_devices.device_simulator import DeviceManager
+from virtual_devices.runtime import DeviceRuntime
+from utils.db_pool import init_pool
+from utils.telemetry_writer import get_writer
+from utils.last_active import last_active_tracker
+from utils.latest_readings import latest_readings
+from utils.telemetry_partitions import PartitionMaintainer
+from utils.rollups import RollupCompactor
+from utils.cold_storage import ColdStorageCompactor
+from utils.hot_tier import hot_tier
+from utils.transport import get_transport
+from config.config import Config
 
 # Database configuration
 DB_CONFIG = {
@@ -28,66 +37,26 @@ DB_CONFIG = {
     'port': '5432'
 }
 
-def get_db_connection():
-    """Create database connection"""
+def get_db_pool():
+    """Create the shared database connection pool"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        pool = init_pool(**DB_CONFIG)
         print("[OK] Database connected successfully")
-        return conn
+        return pool
     except Exception as e:
         print(f"[ERROR] Database connection failed: {e}")
         return None
 
-def store_device_data(conn, data):
-    """Store device data in PostgreSQL"""
-    try:
-        cur = conn.cursor()
-        
-        # Check if device exists
-        cur.execute(
-            "SELECT id FROM devices WHERE device_id = %s",
-            (data['device_id'],)
-        )
-        
-        if not cur.fetchone():
-            # Create device if not exists
-            cur.execute("""
-                INSERT INTO devices (device_id, name, owner_id, device_type)
-                VALUES (%s, %s, %s, %s)
-            """, (
-                data['device_id'],
-                f"Virtual Device {data['device_id']}",
-                1,
-                'virtual'
-            ))
-
-        # Store telemetry data
-        cur.execute("""
-            INSERT INTO device_telemetry 
-            (device_id, temperature, humidity, cpu_usage, memory_usage, timestamp)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (
-            data['device_id'],
-            data['temperature'],
-            data['humidity'],
-            data['cpu_usage'],
-            data['memory_usage'],
-            datetime.now()
-        ))
-
-        # Update device last_active
-        cur.execute("""
-            UPDATE devices 
-            SET last_active = NOW() 
-            WHERE device_id = %s
-        """, (data['device_id'],))
-
-        conn.commit()
-        print(f"[OK] Data stored for device {data['device_id']}")
-        
-    except Exception as e:
-        conn.rollback()
-        print(f"[ERROR] Error storing data: {e}")
+def store_device_data(writer, data):
+    """Queue device data for a batched write to PostgreSQL"""
+    if not writer.submit(data):
+        print(f"[ERROR] Telemetry queue full, dropped reading for {data['device_id']}")
+
+def publish_device_data(transport, data):
+    """Hand device data to the in-process transport; the monitoring
+    consumer stores and broadcasts it"""
+    if not transport.publish(data):
+        print(f"[ERROR] Transport queue full, dropped reading for {data['device_id']}")
 
 def init_database(app):
     """Initialize database tables within app context"""
@@ -102,47 +71,28 @@ def init_database(app):
         except Exception as e:
             print(f"[ERROR] Database error for {app.name}: {e}")
 
-def run_virtual_devices(device_manager, db_conn, interval=5):
-    """Run virtual devices simulation"""
+def run_virtual_devices(device_manager, writer, interval=5):
+    """Run virtual devices simulation on a single scheduler thread"""
     try:
         print("\nStarting virtual devices...")
-        threads = []
-        for device in device_manager.devices:
-            device_thread = Thread(
-                target=lambda d=device: device_loop(d, db_conn, interval),
-                name=f"device_{device.device_id}",
-                daemon=True
-            )
-            threads.append(device_thread)
-            device_thread.start()
-            print(f"[OK] Started {device.device_id}")
+        if Config.MESSAGE_TRANSPORT == 'inprocess':
+            # Single node: readings take the same path as queued ones
+            transport = get_transport()
+            sink = lambda device, data: publish_device_data(transport, data)
+        else:
+            sink = lambda device, data: store_device_data(writer, data)
+        runtime = DeviceRuntime(
+            device_manager.devices,
+            sink=sink,
+            interval=interval
+        )
+        device_manager.runtime = runtime
+        runtime.start()
+        print(f"[OK] Started {len(device_manager.devices)} devices")
+        return runtime
             
     except Exception as e:
         print(f"[ERROR] Virtual device error: {e}")
-        
-def device_loop(device, db_conn, interval):
-    """Device data generation loop"""
-    while True:
-        try:
-            sensor_data = device.sensor_generator.generate_data()
-            data = {
-                'device_id': device.device_id,
-                'temperature': sensor_data['temperature'],
-                'humidity': sensor_data['humidity'],
-                'cpu_usage': sensor_data['cpu_usage'],
-                'memory_usage': sensor_data['memory_usage'],
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            print(f"\nDevice data ({device.device_id}):")
-            print(data)
-            
-            store_device_data(db_conn, data)
-            time.sleep(interval)
-            
-        except Exception as e:
-            print(f"[ERROR] Device {device.device_id}: {e}")
-            time.sleep(interval)
 
 def start_services(signing_app, device_app, monitoring_app, socketio):
     """Start all microservices"""
@@ -182,12 +132,33 @@ def start_services(signing_app, device_app, monitoring_app, socketio):
 
 def main():
     try:
+        # Every reading is ingested by this process, so recent windows can
+        # be served from memory
+        if os.getenv('HOT_TIER_ENABLED', 'True').lower() == 'true':
+            hot_tier.enable()
+
         # Connect to database
-        db_conn = get_db_connection()
-        if not db_conn:
+        db_pool = get_db_pool()
+        if not db_pool:
             print("[ERROR] Cannot continue without database connection")
             return
 
+        # Keep upcoming telemetry partitions created and expired ones dropped
+        partition_maintainer = PartitionMaintainer(pool=db_pool)
+        partition_maintainer.start()
+
+        # Keep minute/hour statistics rollups current
+        rollup_compactor = RollupCompactor(pool=db_pool)
+        rollup_compactor.start()
+
+        # Move old telemetry into compressed segment files
+        if Config.COLD_STORAGE_ENABLED:
+            cold_storage_compactor = ColdStorageCompactor(pool=db_pool)
+            cold_storage_compactor.start()
+
+        # Start batched telemetry writer
+        telemetry_writer = get_writer()
+
         # Create Flask apps
         signing_app = create_signing_app()
         device_app = create_device_app()
@@ -214,20 +185,39 @@ def main():
         time.sleep(3)
         
         # Start virtual devices
-        run_virtual_devices(device_manager, db_conn)
+        run_virtual_devices(device_manager, telemetry_writer)
 
         print("\n[OK] System started successfully!")
         print("Dashboard: http://127.0.0.1:5002")
 
         # Monitor system
         while True:
-            cur = db_conn.cursor()
-            cur.execute("""
-                SELECT COUNT(*) FROM device_telemetry 
-                WHERE timestamp > NOW() - INTERVAL '1 minute'
-            """)
-            count = cur.fetchone()[0]
+            with db_pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT COUNT(*) FROM device_telemetry 
+                        WHERE timestamp > NOW() - INTERVAL '1 minute'
+                    """)
+                    count = cur.fetchone()[0]
             print(f"[INFO] Last minute: {count} records")
+            stats = telemetry_writer.get_stats()
+            print(
+                f"[INFO] Writer: {stats['written']} written, {stats['queued']} queued, "
+                f"{stats['dropped']} dropped, {stats['failed']} failed, "
+                f"{stats['flushes']} flushes (avg {stats['avg_flush_seconds'] * 1000:.1f} ms)"
+            )
+            hot_stats = hot_tier.get_stats()
+            print(
+                f"[INFO] Hot tier: {hot_stats['readings']} readings of {hot_stats['devices']} devices, "
+                f"{hot_stats['hits']} hits, {hot_stats['misses']} misses"
+            )
+            pool_stats = db_pool.get_stats()
+            print(
+                f"[INFO] Pool: {pool_stats['in_use']}/{pool_stats['max_size']} in use "
+                f"({pool_stats['utilization']:.0%}), avg wait "
+                f"{pool_stats['avg_wait_seconds'] * 1000:.1f} ms, "
+                f"{pool_stats['timeouts']} timeouts"
+            )
             time.sleep(10)
 
     except KeyboardInterrupt:
@@ -236,9 +226,20 @@ def main():
         print(f"\n[ERROR] Startup error: {e}")
         raise
     finally:
-        if 'db_conn' in locals() and db_conn:
-            db_conn.close()
-            print("[OK] Database connection closed")
+        if 'partition_maintainer' in locals():
+            partition_maintainer.stop()
+        if 'rollup_compactor' in locals():
+            rollup_compactor.stop()
+        if 'cold_storage_compactor' in locals():
+            cold_storage_compactor.stop()
+        if 'telemetry_writer' in locals():
+            telemetry_writer.stop()
+            last_active_tracker.stop()
+            latest_readings.stop()
+            print("[OK] Telemetry writer flushed")
+        if 'db_pool' in locals() and db_pool:
+            db_pool.closeall()
+            print("[OK] Database connections closed")
 
 if __name__ == "__main__":
     try:
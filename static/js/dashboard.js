@@ -1,5 +1,8 @@
 // File: static/js/dashboard.js
 
+// Points kept per chart; history is downsampled server-side to match
+const MAX_CHART_POINTS = 30;
+
 class IoTDashboard {
     constructor() {
         // Initialize socket connection
@@ -174,27 +177,35 @@ class IoTDashboard {
         div.className = 'device-item';
         div.setAttribute('data-device-id', device.device_id);
         
+        // Latest reading and online status come with the devices listing
+        const latest = device.latest || {};
+        const format = (value) => (value === null || value === undefined) ? '--' : value.toFixed(1);
+        const status = device.online === undefined ? (device.status || 'unknown')
+            : (device.online ? 'online' : 'offline');
+
         div.innerHTML = `
             <div class="device-header">
                 <h3>${device.name}</h3>
-                <span class="device-status ${device.status || 'unknown'}"></span>
+                <span class="device-status ${status}"></span>
             </div>
             <div class="device-metrics">
                 <div class="metric">
                     <span class="metric-label">Temperature</span>
-                    <span class="metric-value" id="temp-${device.device_id}">--°C</span>
+                    <span class="metric-value" id="temp-${device.device_id}">${format(latest.temperature)}°C</span>
                 </div>
                 <div class="metric">
                     <span class="metric-label">Humidity</span>
-                    <span class="metric-value" id="humid-${device.device_id}">--%</span>
+                    <span class="metric-value" id="humid-${device.device_id}">${format(latest.humidity)}%</span>
                 </div>
                 <div class="metric">
                     <span class="metric-label">CPU</span>
-                    <span class="metric-value" id="cpu-${device.device_id}">--%</span>
+                    <span class="metric-value" id="cpu-${device.device_id}">${format(latest.cpu_usage)}%</span>
                 </div>
             </div>
             <div class="device-footer">
-                <span class="last-updated" id="update-${device.device_id}">Never</span>
+                <span class="last-updated" id="update-${device.device_id}">${
+                    latest.timestamp ? new Date(latest.timestamp + 'Z').toLocaleTimeString() : 'Never'
+                }</span>
             </div>
         `;
         
@@ -252,7 +263,7 @@ class IoTDashboard {
     async loadDeviceHistory(deviceId) {
         try {
             const response = await fetch(
-                `http://127.0.0.1:5002/api/monitoring/data/${deviceId}?hours=1`
+                `http://127.0.0.1:5002/api/monitoring/data/${deviceId}?hours=1&points=${MAX_CHART_POINTS}`
             );
             const data = await response.json();
             
@@ -276,8 +287,8 @@ class IoTDashboard {
         chart.data.datasets[1].data.push(data.humidity);
         chart.data.datasets[2].data.push(data.cpu_usage);
 
-        // Keep last 30 data points
-        if (chart.data.labels.length > 30) {
+        // Keep last MAX_CHART_POINTS data points
+        if (chart.data.labels.length > MAX_CHART_POINTS) {
             chart.data.labels.shift();
             chart.data.datasets.forEach(dataset => dataset.data.shift());
         }
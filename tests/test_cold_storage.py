@@ -0,0 +1,156 @@
+# File: tests/test_cold_storage.py
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from device_management import models
+from device_management.models import ColdTelemetryRow, DeviceTelemetry
+from utils.cold_storage import (
+    COLUMNS, ENC_DECIMAL, ENC_DOD, ENC_GORILLA, ENC_JSON, ENC_NULL, FLOAT_COLUMNS,
+    Segment, SegmentStore, decode_gorilla, decode_ints, encode_gorilla, encode_ints,
+    from_micros, to_micros
+)
+
+DAY = date(2026, 10, 1)
+DAY_START = datetime(2026, 10, 1)
+
+
+def _columns(timestamps, ids=None, **metrics):
+    columns = {name: [] for name in COLUMNS}
+    columns['id'] = list(ids or range(1, len(timestamps) + 1))
+    columns['timestamp'] = [to_micros(timestamp) for timestamp in timestamps]
+    for metric in FLOAT_COLUMNS:
+        columns[metric] = list(metrics.get(metric, [np.nan] * len(timestamps)))
+    columns['raw_data'] = list(metrics.get('raw_data', [None] * len(timestamps)))
+    return columns
+
+
+@pytest.mark.parametrize('order', [1, 2])
+def test_ints_round_trip_every_bucket(order):
+    # Residuals hit zero, each width bucket and the 64-bit escape
+    values = [0, 0, 1, 50, -200, 1500, -70000, 2 ** 40, -(2 ** 62), 2 ** 62, 7, 7, 7]
+    decoded = decode_ints(encode_ints(values, order=order), len(values), order=order)
+    assert decoded.tolist() == values
+
+
+def test_ints_round_trip_regular_timestamps():
+    start = to_micros(DAY_START)
+    values = [start + 5000000 * i + (i % 3) for i in range(17280)]
+    data = encode_ints(values)
+    assert len(data) < len(values)
+    assert decode_ints(data, len(values)).tolist() == values
+
+
+def test_gorilla_round_trip():
+    rng = np.random.default_rng(7)
+    values = np.concatenate([rng.normal(40.0, 5.0, 500), [1.5] * 10, [-0.0, 1e300, 5e-324]])
+    decoded = decode_gorilla(encode_gorilla(values), len(values))
+    assert decoded.view(np.uint64).tolist() == values.view(np.uint64).tolist()
+
+
+def test_segment_round_trip_encodings_and_bitmaps(tmp_path):
+    rng = np.random.default_rng(3)
+    n = 300
+    timestamps = [DAY_START + timedelta(seconds=5 * i) for i in range(n)]
+    temperature = np.round(rng.normal(21.0, 2.0, n), 1)
+    humidity = rng.normal(45.0, 10.0, n)
+    cpu_usage = np.round(rng.uniform(0, 100, n), 2)
+    cpu_usage[::7] = np.nan
+    raw_data = [{'i': i} if i % 4 else None for i in range(n)]
+    columns = _columns(
+        timestamps, temperature=temperature, humidity=humidity,
+        cpu_usage=cpu_usage, raw_data=raw_data
+    )
+    path = SegmentStore(root=str(tmp_path)).write_segment('sensor/1', DAY, columns)
+
+    with Segment(path) as segment:
+        encodings = {name: entry[:2] for name, entry in segment.columns.items()}
+        assert encodings['timestamp'] == (ENC_DOD, 0)
+        assert encodings['temperature'] == (ENC_DECIMAL, 0)
+        assert encodings['humidity'] == (ENC_GORILLA, 0)
+        assert encodings['cpu_usage'] == (ENC_DECIMAL, 1)
+        assert encodings['memory_usage'] == (ENC_NULL, 0)
+        assert encodings['raw_data'] == (ENC_JSON, 1)
+
+        assert segment.read('id').tolist() == columns['id']
+        assert segment.read('timestamp').tolist() == columns['timestamp']
+        assert np.array_equal(segment.read('temperature'), temperature)
+        assert np.array_equal(segment.read('humidity'), humidity)
+        assert np.array_equal(segment.read('cpu_usage'), cpu_usage, equal_nan=True)
+        assert np.isnan(segment.read('memory_usage')).all()
+        assert segment.read('raw_data') == raw_data
+
+        count, total, low, high = segment.summary('cpu_usage')
+        present = cpu_usage[~np.isnan(cpu_usage)]
+        assert count == len(present)
+        assert total == pytest.approx(present.sum())
+        assert (low, high) == (present.min(), present.max())
+
+
+def test_read_day_limits_to_window(tmp_path):
+    store = SegmentStore(root=str(tmp_path))
+    timestamps = [DAY_START + timedelta(hours=hour) for hour in range(24)]
+    store.write_segment('sensor-1', DAY, _columns(timestamps, temperature=range(24)))
+
+    data = store.read_day(
+        'sensor-1', DAY, ('temperature',),
+        DAY_START + timedelta(hours=6), DAY_START + timedelta(hours=9)
+    )
+    assert [from_micros(micros).hour for micros in data['timestamp']] == [6, 7, 8]
+    assert data['temperature'].tolist() == [6.0, 7.0, 8.0]
+    assert store.read_day('missing', DAY) is None
+
+
+class _FakeHistoryQuery:
+    """Just enough of a SQLAlchemy query for iter_history"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def limit(self, limit):
+        return _FakeHistoryQuery(self.rows[:limit])
+
+    def yield_per(self, batch_size):
+        return iter(self.rows)
+
+
+def test_iter_history_keyset_continues_across_cold_boundary(tmp_path, monkeypatch):
+    store = SegmentStore(root=str(tmp_path))
+    # Two readings share a timestamp so the page break has to use the id
+    cold_times = [DAY_START + timedelta(hours=hour) for hour in (1, 2, 2, 3)]
+    store.write_segment('sensor-1', DAY, _columns(
+        cold_times, ids=[1, 2, 3, 4], temperature=[10.0, 20.0, 30.0, np.nan]
+    ))
+    store.mark_complete(DAY, 1, 4)
+    horizon = datetime(2026, 10, 2)
+    store.set_horizon(horizon)
+
+    database_rows = [
+        ColdTelemetryRow(6, 'sensor-1', horizon + timedelta(hours=2), 60.0, *[None] * 6),
+        ColdTelemetryRow(5, 'sensor-1', horizon + timedelta(hours=1), 50.0, *[None] * 6),
+    ]
+
+    def history_query(device_id, since=None, before=None):
+        return _FakeHistoryQuery([
+            row for row in database_rows
+            if before is None or (row.timestamp, row.id) < tuple(before)
+        ])
+
+    monkeypatch.setattr(models, 'get_store', lambda: store)
+    monkeypatch.setattr(DeviceTelemetry, 'history_query', history_query)
+
+    pages = []
+    before = None
+    while True:
+        page = list(DeviceTelemetry.iter_history('sensor-1', before=before, limit=4))
+        if not page:
+            break
+        pages.append([row.id for row in page])
+        before = (page[-1].timestamp, page[-1].id)
+
+    assert pages == [[6, 5, 4, 3], [2, 1]]
+    cold = list(DeviceTelemetry.iter_history('sensor-1', before=(cold_times[1], 3)))
+    assert [(row.id, row.timestamp, row.temperature) for row in cold] == [
+        (2, cold_times[1], 20.0), (1, cold_times[0], 10.0)
+    ]
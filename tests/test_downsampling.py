@@ -0,0 +1,42 @@
+# File: tests/test_downsampling.py
+from datetime import date, datetime
+
+import numpy as np
+
+from monitoring_service import downsampling
+from utils.cold_storage import COLUMNS, FLOAT_COLUMNS, SegmentStore, to_micros
+
+
+def _segment(timestamps, temperatures):
+    columns = {name: [] for name in COLUMNS}
+    for index, (timestamp, temperature) in enumerate(zip(timestamps, temperatures)):
+        columns['id'].append(index + 1)
+        columns['timestamp'].append(to_micros(timestamp))
+        for metric in FLOAT_COLUMNS:
+            columns[metric].append(temperature if metric == 'temperature' else np.nan)
+        columns['raw_data'].append(None)
+    return columns
+
+
+def test_cold_bucket_spanning_two_segment_days(tmp_path, monkeypatch):
+    store = SegmentStore(root=str(tmp_path))
+    store.write_segment('sensor-1', date(2026, 10, 1), _segment(
+        [datetime(2026, 10, 1, 23, 59, 0), datetime(2026, 10, 1, 23, 59, 30)], [1.0, 2.0]
+    ))
+    store.mark_complete(date(2026, 10, 1), 1, 2)
+    store.write_segment('sensor-1', date(2026, 10, 2), _segment(
+        [datetime(2026, 10, 2, 0, 0, 10), datetime(2026, 10, 2, 0, 0, 40)], [3.0, 4.0]
+    ))
+    store.mark_complete(date(2026, 10, 2), 1, 2)
+    store.set_horizon(datetime(2026, 10, 3))
+    monkeypatch.setattr(downsampling, 'get_store', lambda: store)
+
+    buckets = downsampling._cold_buckets(
+        'sensor-1', datetime(2026, 10, 1, 23, 58), datetime(2026, 10, 2, 0, 2), 240
+    )
+
+    assert list(buckets) == [0]
+    readings, temperature, humidity = buckets[0][:3]
+    assert readings == 4
+    assert temperature == (4, 10.0)
+    assert humidity == (0, 0.0)
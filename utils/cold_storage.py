@@ -0,0 +1,743 @@
+# File: utils/cold_storage.py
+"""Compressed columnar cold tier for old telemetry.
+
+Readings older than COLD_STORAGE_AFTER_DAYS are moved out of PostgreSQL
+into one segment file per device and day under COLD_STORAGE_DIR::
+
+    <root>/20261018/<url-quoted device_id>.seg
+    <root>/20261018/_complete.json      written once the whole day is stored
+    <root>/_state.json                  {"compacted_before": <timestamp>}
+
+Everything before ``compacted_before`` (the horizon) is read from segments,
+everything after it from PostgreSQL, so each reading lives in exactly one
+tier. Segment layout, integers big-endian::
+
+    header    magic b'TSEG' | version u8 | reserved u8 | rows u32 |
+              first/last timestamp i64 | columns u8
+    columns   columns x (name length u8 | name | encoding u8 | has bitmap u8 |
+                         offset u32 | length u32 | count u32 | sum/min/max f64)
+    data      per column: [presence bitmap] | encoded values
+
+Encodings:
+    DOD       delta-of-delta integers in variable bit widths (ids, timestamps
+              in microseconds)
+    DECIMAL   floats that are exact k-decimal numbers, stored as scaled
+              integers with delta encoding
+    GORILLA   XOR of consecutive float bit patterns with leading/trailing
+              zero windows
+    JSON      zlib-compressed JSON array (raw_data)
+
+Per-column count/sum/min/max let statistics over whole days skip decoding;
+files are memory-mapped so only the columns that are read are paged in.
+"""
+import os
+import json
+import mmap
+import shutil
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from urllib.parse import quote
+import numpy as np
+from config.config import Config
+from utils.db_pool import get_pool
+from utils.telemetry_partitions import INDEXED_METRICS, TABLE, is_partitioned, list_partitions
+
+MAGIC = b'TSEG'
+VERSION = 1
+
+ENC_NULL = 0
+ENC_DOD = 1
+ENC_DECIMAL = 2
+ENC_GORILLA = 3
+ENC_JSON = 4
+
+INT_COLUMNS = ('id', 'timestamp')
+FLOAT_COLUMNS = INDEXED_METRICS
+JSON_COLUMNS = ('raw_data',)
+COLUMNS = INT_COLUMNS + FLOAT_COLUMNS + JSON_COLUMNS
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+MAX_DECIMALS = 6
+COMPLETE_MARKER = '_complete.json'
+STATE_FILE = '_state.json'
+
+# pg_advisory_xact_lock key so only one compactor runs across processes
+LOCK_KEY = 0x636f6c64
+
+_HEADER = struct.Struct('!4sBBIqqB')
+_COLUMN = struct.Struct('!BBIIIddd')
+_NAME_LEN = struct.Struct('!B')
+_MASK64 = (1 << 64) - 1
+
+# (prefix bits, prefix length, value bits) for signed integers biased into range
+_INT_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12),
+    (0b11110, 5, 32)
+)
+_INT_ESCAPE = (0b11111, 5, 64)
+
+# Integer codes by number of leading one bits: zero residual, buckets, escape
+_INT_CODES = ((1, 0, 0),) + tuple(
+    (prefix_bits, value_bits, (1 << (value_bits - 1)) - 1)
+    for _, prefix_bits, value_bits in _INT_BUCKETS
+) + ((_INT_ESCAPE[1], _INT_ESCAPE[2], 0),)
+_CODE_PREFIX, _CODE_VALUE, _CODE_BIAS = (
+    np.array(column, dtype=np.int64) for column in zip(*_INT_CODES)
+)
+_CODE_BITS = [prefix_bits + value_bits for prefix_bits, value_bits, _ in _INT_CODES]
+# Code of the five bits at a code's start
+_CODE_BY_WINDOW = np.array([
+    next((ones for ones in range(5) if not window >> (4 - ones) & 1), 5) for window in range(32)
+])
+_CODE_BITS_BY_WINDOW = [_CODE_BITS[code] for code in _CODE_BY_WINDOW]
+
+
+def to_micros(timestamp):
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=int(micros))
+
+
+class BitWriter:
+    """Append-only bit stream"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value, nbits):
+        self._acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        self._bits += nbits
+        while self._bits >= 8:
+            self._bits -= 8
+            self.buffer.append((self._acc >> self._bits) & 0xFF)
+        self._acc &= (1 << self._bits) - 1
+
+    def getvalue(self):
+        if self._bits:
+            return bytes(self.buffer) + bytes([(self._acc << (8 - self._bits)) & 0xFF])
+        return bytes(self.buffer)
+
+
+def _byte_windows(data, width):
+    """Big-endian ``width``-byte integer starting at every byte of ``data``"""
+    padded = np.frombuffer(bytes(data) + bytes(width), dtype=np.uint8).astype(np.int64)
+    windows = np.zeros(len(data) + 1, dtype=np.int64)
+    for offset in range(width):
+        windows = (windows << 8) | padded[offset:offset + len(windows)]
+    return windows
+
+
+def _read_fields(data, positions, widths):
+    """Unsigned fields of ``widths`` (0-64) bits at bit ``positions`` of a
+    BitWriter stream, as a uint64 array"""
+    positions = np.asarray(positions, dtype=np.int64)
+    padded = np.frombuffer(bytes(data) + bytes(9), dtype=np.uint8)
+    first = positions >> 3
+    # The 64 bits at each position span at most nine bytes
+    words = padded[first[:, None] + np.arange(8)].view('>u8').ravel().astype(np.uint64)
+    spill = padded[first + 8].astype(np.uint64)
+    shift = (positions & 7).astype(np.uint64)
+    words = (words << shift) | (spill >> (np.uint64(8) - shift))
+    widths = np.asarray(widths, dtype=np.uint64)
+    return np.where(
+        widths > 0, words >> ((np.uint64(64) - widths) % np.uint64(64)), np.uint64(0)
+    )
+
+
+def encode_ints(values, order=2):
+    """Delta (order 1) or delta-of-delta (order 2) encode Python ints"""
+    writer = BitWriter()
+    if not values:
+        return b''
+    writer.write(values[0] & _MASK64, 64)
+    previous = values[0]
+    previous_delta = 0
+    for value in values[1:]:
+        delta = value - previous
+        residual = delta - previous_delta if order == 2 else delta
+        if residual == 0:
+            writer.write(0, 1)
+        else:
+            for prefix, prefix_bits, value_bits in _INT_BUCKETS:
+                bias = (1 << (value_bits - 1)) - 1
+                if -bias <= residual <= bias + 1:
+                    writer.write(prefix, prefix_bits)
+                    writer.write(residual + bias, value_bits)
+                    break
+            else:
+                prefix, prefix_bits, value_bits = _INT_ESCAPE
+                writer.write(prefix, prefix_bits)
+                writer.write(residual & _MASK64, value_bits)
+        previous = value
+        if order == 2:
+            previous_delta = delta
+    return writer.getvalue()
+
+
+def decode_ints(data, count, order=2):
+    if not count:
+        return np.empty(0, dtype=np.int64)
+    # Where a code starts depends on every code before it, so only that walk
+    # runs in Python; the values are then gathered and summed by numpy
+    windows = _byte_windows(data, 2)
+    lookup = memoryview(windows)
+    starts = []
+    position = 64
+    for _ in range(count - 1):
+        starts.append(position)
+        position += _CODE_BITS_BY_WINDOW[lookup[position >> 3] >> (11 - (position & 7)) & 0x1f]
+    starts = np.array(starts, dtype=np.int64)
+    codes = _CODE_BY_WINDOW[windows[starts >> 3] >> (11 - (starts & 7)) & 0x1f]
+    fields = _read_fields(data, starts + _CODE_PREFIX[codes], _CODE_VALUE[codes])
+    # Escaped residuals are two's complement; int64 sums wrap like the encoder
+    residuals = np.where(
+        codes == len(_INT_CODES) - 1,
+        fields.view(np.int64),
+        fields.astype(np.int64) - _CODE_BIAS[codes]
+    )
+    deltas = np.cumsum(residuals) if order == 2 else residuals
+    first = _read_fields(data, [0], [64]).view(np.int64)
+    return np.concatenate([first, first[0] + np.cumsum(deltas)])
+
+
+def encode_gorilla(values):
+    """XOR-compress float64 values (Gorilla)"""
+    patterns = np.asarray(values, dtype=np.float64).view(np.uint64).tolist()
+    writer = BitWriter()
+    previous = patterns[0]
+    writer.write(previous, 64)
+    window = None
+    for pattern in patterns[1:]:
+        xor = pattern ^ previous
+        if xor == 0:
+            writer.write(0, 1)
+        else:
+            leading = min(64 - xor.bit_length(), 31)
+            trailing = (xor & -xor).bit_length() - 1
+            if window and leading >= window[0] and trailing >= window[1]:
+                writer.write(0b10, 2)
+                writer.write(xor >> window[1], 64 - window[0] - window[1])
+            else:
+                significant = 64 - leading - trailing
+                writer.write(0b11, 2)
+                writer.write(leading, 5)
+                writer.write(significant - 1, 6)
+                writer.write(xor >> trailing, significant)
+                window = (leading, trailing)
+        previous = pattern
+    return writer.getvalue()
+
+
+def decode_gorilla(data, count):
+    windows = _byte_windows(data, 3)
+    lookup = memoryview(windows)
+    starts = []
+    position = 64
+    width = 0
+    for _ in range(count - 1):
+        starts.append(position)
+        # Control bits, then the 5-bit leading and 6-bit length fields
+        window = lookup[position >> 3] >> (11 - (position & 7)) & 0x1fff
+        if window < 0x1000:
+            position += 1
+        elif window < 0x1800:
+            position += 2 + width
+        else:
+            width = (window & 0x3f) + 1
+            position += 13 + width
+    starts = np.array(starts, dtype=np.int64)
+    window = windows[starts >> 3] >> (11 - (starts & 7)) & 0x1fff
+    control = window >> 11
+    changed = control == 0b11
+    # '10' codes reuse the leading/trailing window of the last '11' code
+    latest = np.maximum.accumulate(np.where(changed, np.arange(len(starts)), 0))
+    widths = np.where(control >= 0b10, (window & 0x3f)[latest] + 1, 0)
+    shifts = np.where(control >= 0b10, 64 - (window >> 6 & 0x1f)[latest] - widths, 0)
+    xors = _read_fields(data, starts + np.where(changed, 13, 2), widths) << shifts.astype(np.uint64)
+    patterns = np.bitwise_xor.accumulate(np.concatenate([_read_fields(data, [0], [64]), xors]))
+    return patterns.view(np.float64)
+
+
+def decimal_scale(values):
+    """Smallest k such that every value is an exact k-decimal number, or None"""
+    for k in range(MAX_DECIMALS + 1):
+        factor = 10.0 ** k
+        scaled = np.round(values * factor)
+        if np.abs(scaled).max() >= 2 ** 53:
+            return None
+        if np.array_equal(scaled / factor, values):
+            return k
+    return None
+
+
+def _encode_column(name, values):
+    """Returns (encoding, bitmap, payload, stats) for one column"""
+    if name in JSON_COLUMNS:
+        present = np.array([value is not None for value in values], dtype=bool)
+        payload = zlib.compress(json.dumps([v for v in values if v is not None]).encode('utf-8'))
+        return ENC_JSON, present, payload, (int(present.sum()), 0.0, 0.0, 0.0)
+
+    if name in INT_COLUMNS:
+        present = np.ones(len(values), dtype=bool)
+        return ENC_DOD, present, encode_ints([int(v) for v in values]), (len(values), 0.0, 0.0, 0.0)
+
+    array = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(array)
+    array = array[present]
+    if not len(array):
+        return ENC_NULL, present, b'', (0, 0.0, float('nan'), float('nan'))
+    stats = (len(array), float(array.sum()), float(array.min()), float(array.max()))
+
+    scale = decimal_scale(array)
+    if scale is not None:
+        scaled = np.round(array * 10.0 ** scale).astype(np.int64).tolist()
+        payload = bytes([scale]) + encode_ints(scaled, order=1)
+        return ENC_DECIMAL, present, payload, stats
+    return ENC_GORILLA, present, encode_gorilla(array), stats
+
+
+def encode_segment(columns):
+    """Encode {column: values} (ascending by timestamp) into segment bytes.
+
+    ``timestamp`` holds microseconds since the epoch, float columns use NaN
+    for missing values and ``raw_data`` holds JSON-compatible objects.
+    """
+    n_rows = len(columns['timestamp'])
+    entries = []
+    blobs = []
+    offset = _HEADER.size + sum(
+        _NAME_LEN.size + len(name) + _COLUMN.size for name in COLUMNS
+    )
+    for name in COLUMNS:
+        encoding, present, payload, stats = _encode_column(name, columns[name])
+        has_bitmap = int(0 < present.sum() < n_rows)
+        blob = (np.packbits(present).tobytes() if has_bitmap else b'') + payload
+        entries.append((name, encoding, has_bitmap, offset, len(blob), stats))
+        blobs.append(blob)
+        offset += len(blob)
+
+    parts = [_HEADER.pack(
+        MAGIC, VERSION, 0, n_rows,
+        int(columns['timestamp'][0]), int(columns['timestamp'][-1]), len(entries)
+    )]
+    for name, encoding, has_bitmap, blob_offset, length, (count, total, low, high) in entries:
+        encoded_name = name.encode('utf-8')
+        parts.append(_NAME_LEN.pack(len(encoded_name)) + encoded_name)
+        parts.append(_COLUMN.pack(
+            encoding, has_bitmap, blob_offset, length, count, total, low, high
+        ))
+    return b''.join(parts + blobs)
+
+
+class Segment:
+    """Read-only, memory-mapped segment file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, version, _, self.rows, self.first_micros, self.last_micros, n_columns = \
+            _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a telemetry segment")
+        if version != VERSION:
+            raise ValueError(f"unsupported segment version {version}")
+
+        self.columns = {}
+        offset = _HEADER.size
+        for _ in range(n_columns):
+            (length,) = _NAME_LEN.unpack_from(self._mmap, offset)
+            offset += _NAME_LEN.size
+            name = bytes(self._mmap[offset:offset + length]).decode('utf-8')
+            offset += length
+            self.columns[name] = _COLUMN.unpack_from(self._mmap, offset)
+            offset += _COLUMN.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def summary(self, name):
+        """(count, sum, min, max) of the non-null values of a column"""
+        return self.columns[name][4:]
+
+    def read(self, name):
+        encoding, has_bitmap, offset, length, count = self.columns[name][:5]
+        data = self._view[offset:offset + length]
+        if has_bitmap:
+            bitmap_bytes = (self.rows + 7) // 8
+            present = np.unpackbits(
+                np.frombuffer(data[:bitmap_bytes], dtype=np.uint8), count=self.rows
+            ).astype(bool)
+            data = data[bitmap_bytes:]
+        else:
+            present = None
+
+        if encoding == ENC_JSON:
+            values = json.loads(zlib.decompress(data)) if count else []
+            if present is None:
+                return values if count else [None] * self.rows
+            it = iter(values)
+            return [next(it) if flag else None for flag in present]
+        if encoding == ENC_DOD:
+            return decode_ints(data, count)
+        if encoding == ENC_NULL:
+            return np.full(self.rows, np.nan)
+        if encoding == ENC_DECIMAL:
+            values = decode_ints(data[1:], count, order=1) / 10.0 ** data[0]
+        else:
+            values = decode_gorilla(data, count)
+        if present is None:
+            return values
+        out = np.full(self.rows, np.nan)
+        out[present] = values
+        return out
+
+
+class SegmentStore:
+    """Directory of per-device, per-day segments"""
+
+    def __init__(self, root=None, horizon_ttl=5.0):
+        self.root = root or Config.COLD_STORAGE_DIR
+        self.horizon_ttl = horizon_ttl
+        self._horizon = None
+        self._horizon_read_at = 0.0
+
+    def day_dir(self, day):
+        return os.path.join(self.root, f"{day:%Y%m%d}")
+
+    def segment_path(self, device_id, day):
+        return os.path.join(self.day_dir(day), quote(device_id, safe='') + '.seg')
+
+    def write_segment(self, device_id, day, columns):
+        """Atomically write one device-day segment"""
+        path = self.segment_path(device_id, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(encode_segment(columns))
+        os.replace(tmp, path)
+        return path
+
+    def _write_json(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def mark_complete(self, day, devices, rows):
+        self._write_json(
+            os.path.join(self.day_dir(day), COMPLETE_MARKER),
+            {'devices': devices, 'rows': rows, 'written_at': datetime.utcnow().isoformat()}
+        )
+
+    def is_complete(self, day):
+        return os.path.exists(os.path.join(self.day_dir(day), COMPLETE_MARKER))
+
+    def days(self):
+        """Days whose segments are complete, ascending"""
+        if not os.path.isdir(self.root):
+            return []
+        days = []
+        for entry in os.listdir(self.root):
+            if len(entry) == 8 and entry.isdigit() and self.is_complete(
+                    datetime.strptime(entry, '%Y%m%d').date()):
+                days.append(datetime.strptime(entry, '%Y%m%d').date())
+        return sorted(days)
+
+    def horizon(self):
+        """Readings before this timestamp live in segments, or None"""
+        now = time.monotonic()
+        if now - self._horizon_read_at > self.horizon_ttl:
+            path = os.path.join(self.root, STATE_FILE)
+            try:
+                with open(path) as f:
+                    self._horizon = datetime.fromisoformat(json.load(f)['compacted_before'])
+            except (OSError, ValueError, KeyError):
+                self._horizon = None
+            self._horizon_read_at = now
+        return self._horizon
+
+    def set_horizon(self, timestamp):
+        current = self.horizon()
+        if current is None or timestamp > current:
+            self._write_json(
+                os.path.join(self.root, STATE_FILE),
+                {'compacted_before': timestamp.isoformat()}
+            )
+            self._horizon = timestamp
+            self._horizon_read_at = time.monotonic()
+
+    def read_day(self, device_id, day, columns=COLUMNS, start=None, end=None):
+        """Columns of one device-day limited to [start, end), or None"""
+        path = self.segment_path(device_id, day)
+        if not os.path.exists(path):
+            return None
+        with Segment(path) as segment:
+            data = {name: segment.read(name) for name in set(columns) | {'timestamp'}}
+        if start is not None or end is not None:
+            micros = data['timestamp']
+            mask = np.ones(len(micros), dtype=bool)
+            if start is not None:
+                mask &= micros >= to_micros(start)
+            if end is not None:
+                mask &= micros < to_micros(end)
+            if not mask.all():
+                data = {
+                    name: (values[mask] if isinstance(values, np.ndarray)
+                           else [v for v, keep in zip(values, mask) if keep])
+                    for name, values in data.items()
+                }
+        return data
+
+    def days_between(self, start=None, end=None):
+        """Complete days overlapping [start, end)"""
+        return [
+            day for day in self.days()
+            if (start is None or day >= start.date())
+            and (end is None or datetime.combine(day, datetime.min.time()) < end)
+        ]
+
+    def aggregate(self, device_id, start, end, metrics):
+        """Rollup-layout totals over [start, end): readings, <metric>_count/sum/min/max"""
+        totals = {'readings': 0}
+        for metric in metrics:
+            totals.update({
+                f'{metric}_count': 0, f'{metric}_sum': None,
+                f'{metric}_min': None, f'{metric}_max': None
+            })
+
+        def merge(metric, count, total, low, high):
+            if not count:
+                return
+            totals[f'{metric}_count'] += count
+            totals[f'{metric}_sum'] = (totals[f'{metric}_sum'] or 0.0) + total
+            current_min, current_max = totals[f'{metric}_min'], totals[f'{metric}_max']
+            totals[f'{metric}_min'] = low if current_min is None else min(current_min, low)
+            totals[f'{metric}_max'] = high if current_max is None else max(current_max, high)
+
+        for day in self.days_between(start, end):
+            day_start = datetime.combine(day, datetime.min.time())
+            path = self.segment_path(device_id, day)
+            if not os.path.exists(path):
+                continue
+            if start <= day_start and day_start + timedelta(days=1) <= end:
+                # Whole day inside the window: the column summaries suffice
+                with Segment(path) as segment:
+                    totals['readings'] += segment.rows
+                    for metric in metrics:
+                        merge(metric, *segment.summary(metric))
+                continue
+            data = self.read_day(device_id, day, metrics, start, end)
+            totals['readings'] += len(data['timestamp'])
+            for metric in metrics:
+                values = data[metric][~np.isnan(data[metric])]
+                if len(values):
+                    merge(metric, len(values), float(values.sum()),
+                          float(values.min()), float(values.max()))
+        return totals
+
+    def drop_before(self, day):
+        """Delete whole days of segments older than ``day``"""
+        dropped = []
+        for old_day in self.days():
+            if old_day < day:
+                shutil.rmtree(self.day_dir(old_day), ignore_errors=True)
+                dropped.append(old_day)
+        return dropped
+
+
+class ColdStorageCompactor:
+    """Moves telemetry older than COLD_STORAGE_AFTER_DAYS into segments.
+
+    With a partitioned table whole partitions are compacted day by day and
+    then dropped; an unpartitioned table is compacted and DELETEd a day at a
+    time. Each partition or day is moved in one transaction holding an
+    advisory lock, so concurrent compactors never interleave. Days with a
+    completion marker are skipped, so an interrupted run simply resumes. The
+    horizon only moves once the rows are gone from PostgreSQL, so readers
+    never see a reading twice.
+    """
+
+    def __init__(self, store=None, pool=None, after_days=None, interval=None,
+                 retention_days=None, fetch_size=10000):
+        self.store = store or get_store()
+        self._pool = pool
+        self.after_days = Config.COLD_STORAGE_AFTER_DAYS if after_days is None else after_days
+        self.interval = interval or Config.COLD_STORAGE_INTERVAL
+        self.retention_days = (
+            Config.COLD_STORAGE_RETENTION_DAYS if retention_days is None else retention_days
+        )
+        self.fetch_size = fetch_size
+        self._stop = threading.Event()
+        self._thread = None
+        self.rows_compacted = 0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = get_pool()
+        return self._pool
+
+    def _oldest(self, conn, table):
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT MIN(timestamp) FROM {table}")
+            return cur.fetchone()[0]
+
+    def _try_lock(self, conn):
+        """Start a transaction holding the compactor lock, or roll back"""
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (LOCK_KEY,))
+            if cur.fetchone()[0]:
+                return True
+        conn.rollback()
+        print("[INFO] Cold storage compaction already running elsewhere")
+        return False
+
+    def compact_day(self, conn, table, day):
+        """Write every device's readings of ``day`` to segments.
+
+        Runs inside the caller's transaction, which commits once the rows
+        are removed from PostgreSQL.
+        """
+        day_start = datetime.combine(day, datetime.min.time())
+        columns = ', '.join(('id', 'device_id', 'timestamp') + FLOAT_COLUMNS + JSON_COLUMNS)
+        devices = 0
+        rows = 0
+        current = None
+        batch = None
+
+        def flush():
+            self.store.write_segment(current, day, batch)
+
+        with conn.cursor(name=f"cold_storage_{day:%Y%m%d}") as cur:
+            cur.itersize = self.fetch_size
+            cur.execute(f"""
+                SELECT {columns} FROM {table}
+                WHERE timestamp >= %s AND timestamp < %s
+                ORDER BY device_id, timestamp, id
+            """, (day_start, day_start + timedelta(days=1)))
+            for row in cur:
+                if row[1] != current:
+                    if current is not None:
+                        flush()
+                    current = row[1]
+                    batch = {name: [] for name in COLUMNS}
+                    devices += 1
+                batch['id'].append(row[0])
+                batch['timestamp'].append(to_micros(row[2]))
+                for index, metric in enumerate(FLOAT_COLUMNS, start=3):
+                    value = row[index]
+                    batch[metric].append(np.nan if value is None else value)
+                batch['raw_data'].append(row[-1])
+                rows += 1
+            if current is not None:
+                flush()
+        self.store.mark_complete(day, devices, rows)
+        self.rows_compacted += rows
+        return rows
+
+    def _compact_range(self, conn, table, first, end):
+        day = first.date()
+        while datetime.combine(day, datetime.min.time()) < end:
+            if not self.store.is_complete(day):
+                self.compact_day(conn, table, day)
+            day += timedelta(days=1)
+
+    def run_once(self, now=None):
+        now = now or datetime.utcnow()
+        cutoff = datetime.combine(now.date() - timedelta(days=self.after_days), datetime.min.time())
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                partitioned = is_partitioned(cur)
+                partitions = list_partitions(cur) if partitioned else []
+            conn.commit()
+
+            if partitioned:
+                for name, start, end in partitions:
+                    if end > cutoff:
+                        break
+                    if not self._try_lock(conn):
+                        return
+                    first = start if start != datetime.min else self._oldest(conn, name)
+                    if first is not None:
+                        self._compact_range(conn, name, first, end)
+                    with conn.cursor() as cur:
+                        cur.execute(f"DROP TABLE IF EXISTS {name}")
+                    conn.commit()
+                    self.store.set_horizon(end)
+                    print(f"[OK] Moved partition {name} to cold storage")
+            else:
+                oldest = self._oldest(conn, TABLE)
+                day = oldest.date() if oldest else cutoff.date()
+                while datetime.combine(day, datetime.min.time()) < cutoff:
+                    day_start = datetime.combine(day, datetime.min.time())
+                    day_end = day_start + timedelta(days=1)
+                    if not self._try_lock(conn):
+                        return
+                    if not self.store.is_complete(day):
+                        self.compact_day(conn, TABLE, day)
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            f"DELETE FROM {TABLE} WHERE timestamp >= %s AND timestamp < %s",
+                            (day_start, day_end)
+                        )
+                    conn.commit()
+                    self.store.set_horizon(day_end)
+                    day += timedelta(days=1)
+
+        if self.retention_days > 0:
+            self.store.drop_before(now.date() - timedelta(days=self.retention_days))
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[ERROR] Cold storage compaction failed: {e}")
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="cold_storage_compactor",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+
+
+_store = None
+
+
+def get_store():
+    """Segment store shared by the process"""
+    global _store
+    if _store is None:
+        _store = SegmentStore()
+    return _store
@@ -1,53 +1,53 @@
 # File: utils/database.py
 
-import psycopg2
-from config.config import Config
+from utils.db_pool import get_pool
+from utils.latest_readings import CREATE_TABLE as CREATE_LATEST_TABLE
+from utils.rollups import CREATE_TABLES as CREATE_ROLLUP_TABLES
+from utils.telemetry_partitions import (
+    CREATE_INDEXES, CREATE_TABLE, ensure_partitions, is_partitioned
+)
 
 def init_db():
     """Initialize database tables"""
     try:
-        conn = psycopg2.connect(
-            dbname=Config.POSTGRES_DB,
-            user=Config.POSTGRES_USER,
-            password=Config.POSTGRES_PASSWORD,
-            host=Config.POSTGRES_HOST,
-            port=Config.POSTGRES_PORT
-        )
-        
-        with conn.cursor() as cur:
-            # Create devices table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS devices (
-                    id SERIAL PRIMARY KEY,
-                    device_id VARCHAR(80) UNIQUE NOT NULL,
-                    name VARCHAR(120),
-                    status VARCHAR(20) DEFAULT 'active',
-                    owner_id INTEGER NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_active TIMESTAMP,
-                    device_type VARCHAR(50)
-                )
-            """)
-            
-            # Create telemetry table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS device_telemetry (
-                    id SERIAL PRIMARY KEY,
-                    device_id VARCHAR(80) REFERENCES devices(device_id),
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    temperature FLOAT,
-                    humidity FLOAT,
-                    cpu_usage FLOAT,
-                    memory_usage FLOAT
-                )
-            """)
-            
-        conn.commit()
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                # Create devices table
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS devices (
+                        id SERIAL PRIMARY KEY,
+                        device_id VARCHAR(80) UNIQUE NOT NULL,
+                        name VARCHAR(120),
+                        status VARCHAR(20) DEFAULT 'active',
+                        owner_id INTEGER NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        last_active TIMESTAMP,
+                        device_type VARCHAR(50)
+                    )
+                """)
+                
+                # Create latest-reading table, one row per device
+                cur.execute(CREATE_LATEST_TABLE)
+
+                # Create telemetry table, range-partitioned by timestamp
+                cur.execute(CREATE_TABLE)
+                partitioned = is_partitioned(cur)
+                if partitioned:
+                    for statement in CREATE_INDEXES:
+                        cur.execute(statement)
+
+                # Create statistics rollup tables
+                for statement in CREATE_ROLLUP_TABLES:
+                    cur.execute(statement)
+
+            conn.commit()
+            if partitioned:
+                ensure_partitions(conn)
+            else:
+                print("[ERROR] device_telemetry is not partitioned; run "
+                      "'python -m utils.telemetry_partitions migrate'")
         print("[OK] Database initialized successfully")
         
     except Exception as e:
         print(f"[ERROR] Database initialization failed: {e}")
         raise
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
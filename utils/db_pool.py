@@ -0,0 +1,236 @@
+# File: utils/db_pool.py
+
+import time
+import threading
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+from config.config import Config
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool.
+
+    Connections are checked out per thread: nested ``connection()`` blocks in
+    the same thread reuse the connection already held instead of taking a
+    second one. Idle connections are validated with ``SELECT 1`` before being
+    handed out again once ``health_check_interval`` seconds have passed.
+    """
+
+    def __init__(self, minconn=None, maxconn=None, timeout=None,
+                 health_check_interval=None, **connect_kwargs):
+        self.minconn = Config.DB_POOL_MIN if minconn is None else minconn
+        self.maxconn = Config.DB_POOL_MAX if maxconn is None else maxconn
+        self.timeout = Config.DB_POOL_TIMEOUT if timeout is None else timeout
+        self.health_check_interval = (
+            Config.DB_POOL_HEALTH_CHECK_INTERVAL
+            if health_check_interval is None else health_check_interval
+        )
+        self.connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = []          # list of (connection, last_used)
+        self._in_use = set()
+        self._pending = 0        # slots reserved while a new connection is opened
+        self._local = threading.local()
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0
+        }
+
+        for _ in range(self.minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def _size(self):
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to ``timeout`` seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("connection pool is closed")
+                if self._idle or self._size() < self.maxconn:
+                    conn, last_used = self._idle.pop() if self._idle else (None, None)
+                    # Hold the slot while the connection is opened or checked
+                    self._pending += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"no connection available after {timeout:.1f}s "
+                        f"({self.maxconn} in use)"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+        try:
+            if conn is None or not self._is_healthy(conn, last_used):
+                if conn is not None:
+                    self._discard(conn)
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify()
+            raise
+
+        wait = time.monotonic() - started
+        with self._cond:
+            self._pending -= 1
+            self._in_use.add(conn)
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+            self._stats['total_wait_seconds'] += wait
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], wait)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, resetting any open transaction"""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use.discard(conn)
+            if discard or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        with self._cond:
+            self._stats['discarded'] += 1
+        try:
+            if not conn.closed:
+                conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Check out a connection for the current thread.
+
+        Nested use in the same thread yields the same connection; it is only
+        returned to the pool when the outermost block exits.
+        """
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.getconn(timeout)
+        self._local.conn = conn
+        self._local.depth = 1
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self.putconn(conn, discard=broken)
+
+    def get_stats(self):
+        """Return pool size, utilization and wait-time counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            in_use = len(self._in_use)
+            idle = len(self._idle)
+        stats.update({
+            'min_size': self.minconn,
+            'max_size': self.maxconn,
+            'in_use': in_use,
+            'idle': idle,
+            'utilization': in_use / self.maxconn if self.maxconn else 0.0,
+            'avg_wait_seconds': (
+                stats['total_wait_seconds'] / stats['checkouts'] if stats['checkouts'] else 0.0
+            )
+        })
+        return stats
+
+    def closeall(self):
+        """Close idle connections and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                self._discard(conn)
+            self._idle = []
+            self._cond.notify_all()
+
+
+def default_connect_kwargs():
+    """Connection parameters taken from the global configuration"""
+    return {
+        'dbname': Config.POSTGRES_DB,
+        'user': Config.POSTGRES_USER,
+        'password': Config.POSTGRES_PASSWORD,
+        'host': Config.POSTGRES_HOST,
+        'port': Config.POSTGRES_PORT
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(**connect_kwargs):
+    """Create the process-wide pool with explicit connection parameters"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(**(connect_kwargs or default_connect_kwargs()))
+        return _pool
+
+
+def get_pool():
+    """Return the process-wide pool, creating it from Config on first use"""
+    if _pool is None:
+        return init_pool()
+    return _pool
@@ -0,0 +1,67 @@
+# File: utils/device_registry.py
+
+import threading
+from collections import OrderedDict
+from config.config import Config
+
+
+class KnownDeviceRegistry:
+    """Bounded, thread-safe set of device_ids known to exist in ``devices``.
+
+    Ingestion paths consult it before writing telemetry so that, once a
+    device has been seen, no query is needed to decide whether to create it.
+    Entries are evicted least-recently-used when ``max_size`` is reached and
+    must be discarded when a device row is deleted.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or Config.KNOWN_DEVICE_CACHE_SIZE
+        self._devices = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, device_id):
+        with self._lock:
+            if device_id in self._devices:
+                self._devices.move_to_end(device_id)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def __len__(self):
+        return len(self._devices)
+
+    def unknown(self, device_ids):
+        """Return the subset of device_ids not yet known"""
+        return {device_id for device_id in device_ids if device_id not in self}
+
+    def add(self, device_id):
+        """Mark a device as existing"""
+        with self._lock:
+            self._devices[device_id] = True
+            self._devices.move_to_end(device_id)
+            while len(self._devices) > self.max_size:
+                self._devices.popitem(last=False)
+
+    def add_many(self, device_ids):
+        for device_id in device_ids:
+            self.add(device_id)
+
+    def discard(self, device_id):
+        """Forget a device, e.g. after it was deleted"""
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+    def discard_many(self, device_ids):
+        for device_id in device_ids:
+            self.discard(device_id)
+
+    def clear(self):
+        with self._lock:
+            self._devices.clear()
+
+
+# Shared by every ingestion path in the process
+known_devices = KnownDeviceRegistry()
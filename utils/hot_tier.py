@@ -0,0 +1,236 @@
+# File: utils/hot_tier.py
+
+import math
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from config.config import Config
+
+HOT_METRICS = ('temperature', 'humidity', 'cpu_usage', 'memory_usage')
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+NAN = float('nan')
+
+
+def to_micros(timestamp):
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+class DeviceRing:
+    """Fixed-capacity ring of one device's newest readings.
+
+    Timestamps (microseconds) and metrics live in parallel typed arrays
+    that grow up to ``capacity`` and are then overwritten oldest first;
+    missing metrics are stored as NaN. Every reading of the device from
+    ``floor`` (microseconds) on is held.
+    """
+
+    __slots__ = ('capacity', 'head', 'floor', 'timestamps', 'values')
+
+    def __init__(self, capacity, floor):
+        self.capacity = capacity
+        self.head = 0  # physical position of the oldest reading
+        self.floor = floor
+        self.timestamps = array('q')
+        self.values = tuple(array('d') for _ in HOT_METRICS)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, index):
+        """Timestamp of the index-th oldest reading (lets bisect search the ring)"""
+        return self.timestamps[(self.head + index) % len(self.timestamps)]
+
+    def append(self, micros, values):
+        size = len(self.timestamps)
+        if size < self.capacity:
+            self.timestamps.append(micros)
+            for column, value in zip(self.values, values):
+                column.append(value)
+        else:
+            position = self.head
+            self.floor = max(self.floor, self.timestamps[position] + 1)
+            self.head = (position + 1) % size
+            self.timestamps[position] = micros
+            for column, value in zip(self.values, values):
+                column[position] = value
+
+        # Writers on other threads may be a few microseconds behind; keep order
+        size = len(self.timestamps)
+        index = size - 1
+        while index > 0:
+            current = (self.head + index) % size
+            previous = (self.head + index - 1) % size
+            if self.timestamps[previous] <= self.timestamps[current]:
+                break
+            for column in (self.timestamps,) + self.values:
+                column[previous], column[current] = column[current], column[previous]
+            index -= 1
+        if index == 0 and self.timestamps[self.head] < self.floor:
+            # Older than what the ring has already given up; not held
+            self.floor = self.timestamps[self.head] + 1
+
+    def window(self, start, end):
+        """(timestamps, metric columns) in [start, end) micros as arrays, oldest first"""
+        lower = bisect_left(self, start)
+        upper = bisect_left(self, end)
+        size = len(self.timestamps)
+        if lower >= upper:
+            return array('q'), [array('d') for _ in self.values]
+        first = (self.head + lower) % size
+        last = first + (upper - lower)
+        if last <= size:
+            return self.timestamps[first:last], [column[first:last] for column in self.values]
+        last -= size
+        return (
+            self.timestamps[first:] + self.timestamps[:last],
+            [column[first:] + column[:last] for column in self.values]
+        )
+
+
+class HotTier:
+    """Newest readings per device, kept in memory for recent-window reads.
+
+    Ingestion paths call ``append`` with the timestamp they store in
+    PostgreSQL. ``covered_since`` tells readers from when on a device's
+    readings are all held, so a window can be split into an in-memory part
+    and an older part read from the database. Up to ``max_devices`` rings
+    are kept; the least recently written is dropped beyond that.
+    """
+
+    def __init__(self, capacity=None, max_devices=None):
+        self.capacity = capacity or Config.HOT_TIER_CAPACITY
+        self.max_devices = max_devices or Config.HOT_TIER_MAX_DEVICES
+        self.enabled = Config.HOT_TIER_ENABLED
+        self.started_at = to_micros(datetime.utcnow())
+        self._rings = OrderedDict()
+        self._lock = threading.Lock()
+        self.appended = 0
+        self.evicted = 0
+        self.hits = 0
+        self.misses = 0
+
+    def enable(self):
+        """Start holding readings; nothing older than this call is held"""
+        with self._lock:
+            self.started_at = to_micros(datetime.utcnow())
+            self.enabled = True
+
+    def append(self, device_id, timestamp, values):
+        """Record one reading; ``values`` follow HOT_METRICS, None for missing"""
+        if not self.enabled:
+            return
+        micros = to_micros(timestamp)
+        values = [NAN if value is None else float(value) for value in values]
+        with self._lock:
+            ring = self._rings.get(device_id)
+            if ring is None:
+                # Without evictions nothing of this device arrived since startup
+                floor = self.started_at if not self.evicted else micros
+                ring = self._rings[device_id] = DeviceRing(self.capacity, floor)
+                if len(self._rings) > self.max_devices:
+                    self._rings.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._rings.move_to_end(device_id)
+            ring.append(micros, values)
+            self.appended += 1
+
+    def forget(self, device_id):
+        with self._lock:
+            self._rings.pop(device_id, None)
+
+    def covered_since(self, device_id):
+        """Time from which all readings of the device are held, or None"""
+        ring = self._rings.get(device_id)
+        if ring is None:
+            return None
+        return from_micros(ring.floor)
+
+    def split(self, device_id, start, end):
+        """Boundary of [start, end) from which the hot tier can answer.
+
+        Returns ``end`` when nothing can be served from memory and
+        ``start`` when everything can.
+        """
+        covered = self.covered_since(device_id)
+        if covered is None or covered >= end:
+            self.misses += 1
+            return end
+        self.hits += 1
+        return max(start, covered)
+
+    def window(self, device_id, start, end):
+        """(timestamps, {metric: values}) in [start, end) as arrays, oldest first"""
+        with self._lock:
+            ring = self._rings.get(device_id)
+            if ring is None:
+                return array('q'), {metric: array('d') for metric in HOT_METRICS}
+            timestamps, columns = ring.window(to_micros(start), to_micros(end))
+        return timestamps, dict(zip(HOT_METRICS, columns))
+
+    def readings(self, device_id, start, end, limit=None):
+        """Readings in [start, end) newest first, as history dicts without ids"""
+        timestamps, columns = self.window(device_id, start, end)
+        data = []
+        for index in range(len(timestamps) - 1, -1, -1):
+            if limit is not None and len(data) >= limit:
+                break
+            reading = {
+                'device_id': device_id,
+                'timestamp': from_micros(timestamps[index]).isoformat()
+            }
+            for metric in HOT_METRICS:
+                value = columns[metric][index]
+                reading[metric] = None if math.isnan(value) else value
+            data.append(reading)
+        return data
+
+    def buckets(self, device_id, start, end, seconds, metrics=HOT_METRICS, origin=None):
+        """{bucket: [readings, (count, sum) per metric]} over [start, end).
+
+        Bucket ``k`` covers ``seconds`` from ``origin`` (default ``start``)
+        plus ``k`` widths.
+        """
+        timestamps, columns = self.window(device_id, start, end)
+        columns = [columns[metric] for metric in metrics]
+        width = seconds * 1000000
+        origin = to_micros(start if origin is None else origin)
+        buckets = {}
+        lower = 0
+        while lower < len(timestamps):
+            key = (timestamps[lower] - origin) // width
+            # Timestamps are ordered, so each bucket is one contiguous slice
+            upper = bisect_left(timestamps, origin + (key + 1) * width, lower)
+            totals = [upper - lower]
+            for column in columns:
+                values = [value for value in column[lower:upper] if value == value]  # drop NaN
+                totals.append((len(values), math.fsum(values)))
+            buckets[key] = totals
+            lower = upper
+        return buckets
+
+    def get_stats(self):
+        with self._lock:
+            devices = len(self._rings)
+            readings = sum(len(ring) for ring in self._rings.values())
+        return {
+            'enabled': self.enabled,
+            'devices': devices,
+            'readings': readings,
+            'capacity': self.capacity,
+            'appended': self.appended,
+            'evicted': self.evicted,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+# Shared by every ingestion path and reader in the process
+hot_tier = HotTier()
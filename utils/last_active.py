@@ -0,0 +1,112 @@
+# File: utils/last_active.py
+
+import threading
+from config.config import Config
+from utils.db_pool import get_pool
+
+
+class LastActiveTracker:
+    """Write-behind store for ``devices.last_active``.
+
+    Ingestion paths call ``touch`` instead of updating the devices table per
+    reading. The newest timestamp per device is kept in memory, served to
+    readers through ``get``, and written in one bulk UPDATE every
+    ``flush_interval`` seconds by a background thread started on first use.
+    """
+
+    def __init__(self, pool=None, flush_interval=None):
+        self._pool = pool
+        self.flush_interval = flush_interval or Config.LAST_ACTIVE_FLUSH_INTERVAL
+        self._latest = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = get_pool()
+        return self._pool
+
+    def touch(self, device_id, timestamp):
+        """Record activity for a device"""
+        self.touch_many({device_id: timestamp})
+
+    def touch_many(self, timestamps):
+        """Record activity for several devices from a {device_id: timestamp} map"""
+        with self._lock:
+            for device_id, timestamp in timestamps.items():
+                current = self._latest.get(device_id)
+                if current is None or timestamp > current:
+                    self._latest[device_id] = timestamp
+                    self._dirty.add(device_id)
+        self._ensure_started()
+
+    def get(self, device_id):
+        """Newest activity seen in this process, or None"""
+        return self._latest.get(device_id)
+
+    def forget(self, device_id):
+        with self._lock:
+            self._latest.pop(device_id, None)
+            self._dirty.discard(device_id)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run,
+                        name="last_active_flusher",
+                        daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Stop the background thread and write out pending timestamps"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.flush_interval + 5)
+        self.flush()
+
+    def flush(self):
+        """Write all pending timestamps in one UPDATE"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            pending = {device_id: self._latest[device_id] for device_id in self._dirty}
+            self._dirty = set()
+
+        device_ids = sorted(pending)
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        UPDATE devices AS d
+                        SET last_active = v.last_active
+                        FROM unnest(%s::varchar[], %s::timestamp[]) AS v(device_id, last_active)
+                        WHERE d.device_id = v.device_id
+                          AND (d.last_active IS NULL OR d.last_active < v.last_active)
+                    """, (device_ids, [pending[device_id] for device_id in device_ids]))
+                conn.commit()
+        except Exception as e:
+            # Put the timestamps back so the next flush retries them
+            with self._lock:
+                self._dirty.update(pending)
+            print(f"[ERROR] last_active flush of {len(pending)} devices failed: {e}")
+            return 0
+
+        self.flushes += 1
+        self.rows_written += len(pending)
+        return len(pending)
+
+
+# Shared by every ingestion path in the process
+last_active_tracker = LastActiveTracker()
@@ -0,0 +1,142 @@
+# File: utils/latest_readings.py
+
+import threading
+from datetime import datetime, timedelta
+from psycopg2.extras import execute_values
+from config.config import Config
+from utils.db_pool import get_pool
+from utils.telemetry_partitions import INDEXED_METRICS
+
+LATEST_TABLE = 'device_latest'
+LATEST_METRICS = INDEXED_METRICS
+
+CREATE_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {LATEST_TABLE} (
+        device_id VARCHAR(80) PRIMARY KEY
+            REFERENCES devices(device_id) ON DELETE CASCADE,
+        timestamp TIMESTAMP NOT NULL,
+        {', '.join(f'{metric} FLOAT' for metric in LATEST_METRICS)}
+    )
+"""
+
+
+class LatestReadingTracker:
+    """Newest reading per device, kept in memory and in ``device_latest``.
+
+    Ingestion paths call ``update_many`` after their telemetry is committed.
+    Readers get the in-memory value through ``get``; changed devices are
+    upserted in one statement every ``flush_interval`` seconds by a
+    background thread started on first use, and an upsert never replaces a
+    newer row. Readings of devices deleted in the meantime are skipped.
+    """
+
+    def __init__(self, pool=None, flush_interval=None):
+        self._pool = pool
+        self.flush_interval = flush_interval or Config.LATEST_READING_FLUSH_INTERVAL
+        self._latest = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = get_pool()
+        return self._pool
+
+    def update_many(self, readings):
+        """Record readings from a {device_id: (timestamp, {metric: value})} map"""
+        with self._lock:
+            for device_id, (timestamp, values) in readings.items():
+                current = self._latest.get(device_id)
+                if current is None or timestamp > current[0]:
+                    self._latest[device_id] = (
+                        timestamp, tuple(values.get(metric) for metric in LATEST_METRICS)
+                    )
+                    self._dirty.add(device_id)
+        self._ensure_started()
+
+    def get(self, device_id):
+        """(timestamp, values in LATEST_METRICS order) seen in this process, or None"""
+        return self._latest.get(device_id)
+
+    def forget(self, device_id):
+        with self._lock:
+            self._latest.pop(device_id, None)
+            self._dirty.discard(device_id)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run,
+                        name="latest_reading_flusher",
+                        daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Stop the background thread and write out pending readings"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.flush_interval + 5)
+        self.flush()
+
+    def flush(self):
+        """Upsert all pending readings in one statement"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            pending = {device_id: self._latest[device_id] for device_id in self._dirty}
+            self._dirty = set()
+
+        columns = ('device_id', 'timestamp') + LATEST_METRICS
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    # Rows of deleted devices would fail the whole statement
+                    # on the foreign key, and every retry with it
+                    execute_values(cur, f"""
+                        INSERT INTO {LATEST_TABLE} ({', '.join(columns)})
+                        SELECT * FROM (VALUES %s) AS v ({', '.join(columns)})
+                        WHERE EXISTS (
+                            SELECT 1 FROM devices d WHERE d.device_id = v.device_id
+                        )
+                        ON CONFLICT (device_id) DO UPDATE SET
+                            {', '.join(f'{c} = EXCLUDED.{c}' for c in columns[1:])}
+                        WHERE {LATEST_TABLE}.timestamp < EXCLUDED.timestamp
+                    """, [
+                        (device_id, timestamp) + values
+                        for device_id, (timestamp, values) in sorted(pending.items())
+                    ], template='(%s, %s::timestamp' + ', %s::float' * len(LATEST_METRICS) + ')')
+                conn.commit()
+        except Exception as e:
+            # Put the readings back so the next flush retries them
+            with self._lock:
+                self._dirty.update(pending)
+            print(f"[ERROR] Latest reading flush of {len(pending)} devices failed: {e}")
+            return 0
+
+        self.flushes += 1
+        self.rows_written += len(pending)
+        return len(pending)
+
+
+def is_online(timestamp, now=None):
+    """Whether a device whose newest reading is ``timestamp`` counts as online"""
+    if timestamp is None:
+        return False
+    now = now or datetime.utcnow()
+    return now - timestamp <= timedelta(seconds=Config.DEVICE_ONLINE_SECONDS)
+
+
+# Shared by every ingestion path in the process
+latest_readings = LatestReadingTracker()
@@ -1,56 +1,444 @@
 # File: utils/message_handler.py
 import pika
-import json
+import time
+import queue
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from config.config import config
+from utils import wire_format
+from utils.partitioning import get_ring
+
+
+def connection_parameters(cfg):
+    """Build pika connection parameters from a config class"""
+    credentials = pika.PlainCredentials(
+        username=cfg.RABBITMQ_USER,
+        password=cfg.RABBITMQ_PASSWORD
+    )
+    return pika.ConnectionParameters(
+        host=cfg.RABBITMQ_HOST,
+        port=cfg.RABBITMQ_PORT,
+        virtual_host=cfg.RABBITMQ_VHOST,
+        credentials=credentials
+    )
+
+
+class ChannelPool:
+    """Pool of blocking channels that threads check out for publishing.
+
+    pika connections must not be shared between threads, so each pooled
+    channel owns its connection. Channels are opened lazily up to
+    ``max_size``; a channel that fails while checked out is closed instead
+    of being returned.
+    """
+
+    def __init__(self, parameters, ring, max_size=8):
+        self.parameters = parameters
+        self.ring = ring
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        connection = pika.BlockingConnection(self.parameters)
+        channel = connection.channel()
+        for queue_name in self.ring.queue_names:
+            channel.queue_declare(
+                queue=queue_name,
+                durable=True,
+                arguments=self.ring.queue_arguments(queue_name)
+            )
+        return channel
+
+    def _checkout(self, timeout):
+        while True:
+            try:
+                channel = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._created < self.max_size
+                    if can_open:
+                        self._created += 1
+                if can_open:
+                    try:
+                        return self._open()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                channel = self._idle.get(timeout=timeout)
+            if channel.is_open and channel.connection.is_open:
+                return channel
+            self._discard(channel)
+
+    def _discard(self, channel):
+        with self._lock:
+            self._created -= 1
+        try:
+            if channel.connection.is_open:
+                channel.connection.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def channel(self, timeout=None):
+        channel = self._checkout(timeout)
+        try:
+            yield channel
+        except Exception:
+            self._discard(channel)
+            raise
+        else:
+            self._idle.put(channel)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+class BackgroundPublisher:
+    """Publishes buffered messages with asynchronous publisher confirms.
+
+    Producers only enqueue into a bounded buffer; a dedicated thread runs a
+    pika SelectConnection that drains the buffer in groups, keeps at most
+    ``max_unconfirmed`` messages in flight and retires them as the broker
+    acks. Messages still unconfirmed when the connection drops are published
+    again after reconnecting, and nacked messages after a delay that doubles
+    with every consecutive nack (up to ``max_nack_backoff`` seconds), so
+    delivery is at-least-once. When the broker falls behind the buffer fills and
+    ``publish`` blocks for up to ``block_timeout`` seconds before rejecting.
+    """
+
+    def __init__(self, parameters, ring, max_buffer=None, max_unconfirmed=None,
+                 block_timeout=None, batch_size=500, poll_interval=0.01,
+                 nack_backoff=0.1, max_nack_backoff=30, cfg=config['default']):
+        self.parameters = parameters
+        self.ring = ring
+        self.max_unconfirmed = max_unconfirmed or cfg.RABBITMQ_MAX_UNCONFIRMED
+        self.block_timeout = (
+            cfg.RABBITMQ_PUBLISH_TIMEOUT if block_timeout is None else block_timeout
+        )
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.min_nack_backoff = nack_backoff
+        self.max_nack_backoff = max_nack_backoff
+        self._buffer = queue.Queue(maxsize=max_buffer or cfg.RABBITMQ_PUBLISH_BUFFER)
+
+        # Only touched from the publisher thread
+        self._connection = None
+        self._channel = None
+        self._retry = deque()
+        self._delayed = deque()  # (ready_at, message) of nacked messages
+        self._nack_backoff = nack_backoff
+        self._unconfirmed = OrderedDict()
+        self._delivery_tag = 0
+        self._backoff = 1
+
+        self._stopping = False
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'published': 0,
+            'confirmed': 0,
+            'nacked': 0,
+            'rejected': 0,
+            'reconnects': 0
+        }
+
+    def _incr(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    # Producer side
+
+    def publish(self, routing_key, body, properties=None):
+        """Buffer one message; returns False if the buffer stayed full"""
+        message = (routing_key, body, properties)
+        try:
+            self._buffer.put(message, timeout=self.block_timeout)
+            return True
+        except queue.Full:
+            self._incr('rejected')
+            return False
+
+    def publish_many(self, messages, properties=None):
+        """Buffer several (routing_key, body) pairs; returns how many were accepted"""
+        accepted = 0
+        for routing_key, body in messages:
+            if not self.publish(routing_key, body, properties):
+                break
+            accepted += 1
+        if accepted < len(messages):
+            self._incr('rejected', len(messages) - accepted - 1)
+        return accepted
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['buffered'] = self._buffer.qsize()
+        stats['unconfirmed'] = len(self._unconfirmed)
+        stats['delayed'] = len(self._delayed)
+        return stats
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run,
+                name="rabbitmq_publisher",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Wait for buffered messages to be confirmed, then disconnect"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and (
+                not self._buffer.empty() or self._unconfirmed or self._retry
+                or self._delayed):
+            time.sleep(0.05)
+        self._stopping = True
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.ioloop.add_callback_threadsafe(self._close)
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # Publisher thread
+
+    def _run(self):
+        self._backoff = 1
+        while not self._stopping:
+            self._connection = pika.SelectConnection(
+                self.parameters,
+                on_open_callback=self._on_connection_open,
+                on_open_error_callback=self._on_connection_error,
+                on_close_callback=self._on_connection_closed
+            )
+            self._connection.ioloop.start()
+
+            # Anything not acked on the old channel must be sent again
+            self._retry.extendleft(reversed(list(self._unconfirmed.values())))
+            self._unconfirmed.clear()
+            self._channel = None
+            if self._stopping:
+                break
+            self._incr('reconnects')
+            time.sleep(self._backoff)
+            self._backoff = min(self._backoff * 2, 30)
+        self._connection = None
+
+    def _close(self):
+        if self._connection and self._connection.is_open:
+            self._connection.close()
+        elif self._connection:
+            self._connection.ioloop.stop()
+
+    def _on_connection_open(self, connection):
+        # Connected again: the next drop starts over with a short wait
+        self._backoff = 1
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_error(self, connection, error):
+        print(f"[ERROR] RabbitMQ publisher connection failed: {error}")
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        if not self._stopping:
+            print(f"[ERROR] RabbitMQ publisher connection closed: {reason}")
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        channel.add_on_close_callback(self._on_channel_closed)
+        self._declare_queues(channel, list(self.ring.queue_names))
+
+    def _declare_queues(self, channel, remaining):
+        """Declare partition queues one after another, then enable confirms"""
+        if not remaining:
+            channel.confirm_delivery(
+                self._on_delivery_confirmation,
+                callback=lambda _frame: self._on_ready(channel)
+            )
+            return
+        queue_name = remaining.pop(0)
+        channel.queue_declare(
+            queue=queue_name,
+            durable=True,
+            arguments=self.ring.queue_arguments(queue_name),
+            callback=lambda _frame: self._declare_queues(channel, remaining)
+        )
+
+    def _on_channel_closed(self, channel, reason):
+        self._channel = None
+        if self._connection and self._connection.is_open:
+            self._connection.close()
+
+    def _on_ready(self, channel):
+        self._channel = channel
+        self._delivery_tag = 0
+        self._drain()
+
+    def _on_delivery_confirmation(self, frame):
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            tags = [tag for tag in self._unconfirmed if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag]
+        ready_at = time.monotonic() + self._nack_backoff
+        for tag in tags:
+            message = self._unconfirmed.pop(tag, None)
+            if message is None:
+                continue
+            if acked:
+                self._incr('confirmed')
+            else:
+                self._incr('nacked')
+                self._delayed.append((ready_at, message))
+        if acked:
+            self._nack_backoff = self.min_nack_backoff
+        elif tags:
+            # Back off while the broker keeps refusing messages
+            self._nack_backoff = min(self._nack_backoff * 2, self.max_nack_backoff)
+
+    def _next_message(self):
+        if self._retry:
+            return self._retry.popleft()
+        if self._delayed and self._delayed[0][0] <= time.monotonic():
+            return self._delayed.popleft()[1]
+        return self._buffer.get_nowait()
+
+    def _drain(self):
+        """Publish a group of messages, then reschedule on the I/O loop"""
+        channel = self._channel
+        if channel is None or not channel.is_open:
+            return
+
+        sent = 0
+        while sent < self.batch_size and len(self._unconfirmed) < self.max_unconfirmed:
+            try:
+                routing_key, body, properties = message = self._next_message()
+            except queue.Empty:
+                break
+            channel.basic_publish(
+                exchange='',
+                routing_key=routing_key,
+                body=body,
+                properties=properties or pika.BasicProperties(delivery_mode=2)
+            )
+            self._delivery_tag += 1
+            self._unconfirmed[self._delivery_tag] = message
+            sent += 1
+
+        if sent:
+            self._incr('published', sent)
+        delay = 0 if sent == self.batch_size else self.poll_interval
+        self._connection.ioloop.call_later(delay, self._drain)
+
 
 class RabbitMQHandler:
-    def __init__(self, config_name='default'):
-        self.config = config[config_name]
+    def __init__(self, config_name='default', cfg=None):
+        self.config = cfg or config[config_name]
         self.connection = None
         self.channel = None
+        self.ring = get_ring(self.config)
+        self.channels = ChannelPool(
+            connection_parameters(self.config),
+            self.ring,
+            max_size=self.config.RABBITMQ_CHANNEL_POOL_SIZE
+        )
+        self.publisher = None
 
     def connect(self):
         """Establish connection to RabbitMQ"""
         try:
-            credentials = pika.PlainCredentials(
-                username=self.config.RABBITMQ_USER,
-                password=self.config.RABBITMQ_PASSWORD
-            )
-            
-            parameters = pika.ConnectionParameters(
-                host=self.config.RABBITMQ_HOST,
-                port=self.config.RABBITMQ_PORT,
-                virtual_host=self.config.RABBITMQ_VHOST,
-                credentials=credentials
-            )
-            
-            self.connection = pika.BlockingConnection(parameters)
+            self.connection = pika.BlockingConnection(connection_parameters(self.config))
             self.channel = self.connection.channel()
-            self.channel.queue_declare(queue=self.config.RABBITMQ_QUEUE)
+            for queue_name in self.ring.queue_names:
+                self.channel.queue_declare(
+                    queue=queue_name,
+                    durable=True,
+                    arguments=self.ring.queue_arguments(queue_name)
+                )
             return True
-            
+
         except Exception as e:
             print(f"RabbitMQ connection error: {e}")
             return False
 
+    def start_publisher(self, **kwargs):
+        """Route publishes through a confirm-mode background publisher"""
+        if self.publisher is None:
+            self.publisher = BackgroundPublisher(
+                connection_parameters(self.config),
+                self.ring,
+                cfg=self.config,
+                **kwargs
+            )
+            self.publisher.start()
+        return self.publisher
+
     def publish_message(self, message):
         """Publish message to queue"""
-        if not self.connection or self.connection.is_closed:
-            if not self.connect():
-                return False
-                
-        try:
-            self.channel.basic_publish(
-                exchange='',
-                routing_key=self.config.RABBITMQ_QUEUE,
-                body=json.dumps(message)
+        return self.publish_batch([message]) == 1
+
+    def publish_batch(self, messages, pack=False):
+        """Publish several messages; returns how many were accepted.
+
+        Messages are encoded in the configured MESSAGE_FORMAT and routed
+        to the partition queue of their device_id. With ``pack`` the
+        readings for each partition travel as one broker message (a JSON
+        array or a packed binary batch). With the background publisher
+        running the messages are only buffered and confirmed
+        asynchronously; otherwise they are sent on a pooled channel.
+        """
+        fmt = self.config.MESSAGE_FORMAT
+        content_type = wire_format.FORMATS[fmt]
+        outgoing = []   # (routing_key, body, number of readings)
+        for queue_name, group in self.ring.group_by_queue(messages).items():
+            if pack:
+                body, content_type = wire_format.encode(group, fmt)
+                outgoing.append((queue_name, body, len(group)))
+            else:
+                for message in group:
+                    body, content_type = wire_format.encode(message, fmt)
+                    outgoing.append((queue_name, body, 1))
+        properties = pika.BasicProperties(content_type=content_type, delivery_mode=2)
+
+        if self.publisher:
+            accepted = self.publisher.publish_many(
+                [(routing_key, body) for routing_key, body, _ in outgoing], properties
             )
-            return True
+            return sum(count for _, _, count in outgoing[:accepted])
+
+        try:
+            with self.channels.channel(timeout=self.config.RABBITMQ_PUBLISH_TIMEOUT) as channel:
+                for routing_key, body, _ in outgoing:
+                    channel.basic_publish(
+                        exchange='',
+                        routing_key=routing_key,
+                        body=body,
+                        properties=properties
+                    )
+            return len(messages)
         except Exception as e:
             print(f"Failed to publish message: {e}")
-            return False
+            return 0
 
     def close(self):
         """Close RabbitMQ connection"""
+        if self.publisher:
+            self.publisher.stop()
+            self.publisher = None
+        self.channels.close()
         if self.connection and not self.connection.is_closed:
-            self.connection.close()
\ No newline at end of file
+            self.connection.close()
@@ -0,0 +1,97 @@
+# File: utils/partitioning.py
+
+import bisect
+import hashlib
+from config.config import config
+
+
+def _hash(key):
+    """Stable 64-bit hash; Python's hash() differs between processes"""
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class PartitionRing:
+    """Consistent-hash mapping of device_ids onto partition queues.
+
+    Each partition owns ``vnodes`` points on a hash ring and a device goes to
+    the first point at or after its own hash. Adding a partition therefore
+    moves only about 1/N of the devices, and a device always maps to the same
+    queue, which keeps its readings in order behind a single consumer.
+
+    With a single partition the base queue name is used unchanged, so
+    unpartitioned deployments keep their existing ``device_data`` queue.
+    """
+
+    def __init__(self, base_queue, partitions=1, vnodes=64):
+        self.base_queue = base_queue
+        self.partitions = max(1, partitions)
+        self._points = []
+        self._owners = []
+        ring = sorted(
+            (_hash(f"{base_queue}.{partition}#{vnode}"), partition)
+            for partition in range(self.partitions)
+            for vnode in range(vnodes)
+        )
+        for point, partition in ring:
+            self._points.append(point)
+            self._owners.append(partition)
+
+    def partition_for(self, device_id):
+        index = bisect.bisect_left(self._points, _hash(device_id))
+        return self._owners[index % len(self._owners)]
+
+    def queue_name(self, partition):
+        if self.partitions == 1:
+            return self.base_queue
+        return f"{self.base_queue}.{partition}"
+
+    def queue_for(self, device_id):
+        """Queue that readings of ``device_id`` are routed to"""
+        if self.partitions == 1:
+            return self.base_queue
+        return self.queue_name(self.partition_for(device_id))
+
+    @property
+    def queue_names(self):
+        return [self.queue_name(partition) for partition in range(self.partitions)]
+
+    def group_by_queue(self, readings):
+        """Split readings into {queue_name: [readings]} keeping their order"""
+        groups = {}
+        for reading in readings:
+            groups.setdefault(self.queue_for(reading['device_id']), []).append(reading)
+        return groups
+
+    def queue_arguments(self, queue_name):
+        """Declaration arguments; identical for every producer and consumer.
+
+        Partition queues allow a single active consumer so several monitoring
+        nodes can subscribe to the same partition for failover without
+        breaking per-device ordering.
+        """
+        if self.partitions == 1:
+            return None
+        return {'x-single-active-consumer': True}
+
+
+def parse_partitions(spec, partitions):
+    """Parse an ownership spec such as "0,2,4-7"; empty means all partitions"""
+    if not spec or not spec.strip():
+        return list(range(partitions))
+    owned = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            owned.update(range(int(start), int(end) + 1))
+        else:
+            owned.add(int(part))
+    return sorted(p for p in owned if 0 <= p < partitions)
+
+
+def get_ring(cfg=None):
+    """Partition ring for the configured queue and partition count"""
+    cfg = cfg or config['default']
+    return PartitionRing(cfg.RABBITMQ_QUEUE, cfg.RABBITMQ_PARTITIONS)
@@ -3,26 +3,24 @@ import pika
 import json
 import time
 import socket  
+from config.config import config
+from utils.message_handler import connection_parameters
 
 def test_rabbitmq_connection(max_retries=3, retry_delay=2):
     """Test RabbitMQ connection with retries"""
     for attempt in range(max_retries):
         try:
             # Create connection parameters
-            parameters = pika.ConnectionParameters(
-                host='127.0.0.1',  # Use IP instead of localhost
-                port=5672,
-                credentials=pika.PlainCredentials('guest', 'guest'),
-                connection_attempts=3,
-                retry_delay=1,
-                socket_timeout=5,
-                heartbeat=600
-            )
+            parameters = connection_parameters(config['default'])
+            parameters.connection_attempts = 3
+            parameters.retry_delay = 1
+            parameters.socket_timeout = 5
+            parameters.heartbeat = 600
             
             print(f"Attempt {attempt + 1}/{max_retries} - Connecting to RabbitMQ...")
             connection = pika.BlockingConnection(parameters)
             channel = connection.channel()
-            channel.queue_declare(queue='device_data')
+            channel.queue_declare(queue=config['default'].RABBITMQ_QUEUE, durable=True)
             connection.close()
             print("RabbitMQ connection successful")
             return True
@@ -0,0 +1,156 @@
+# File: utils/response_cache.py
+
+import time
+import threading
+from collections import OrderedDict
+from config.config import Config
+
+
+class _Entry:
+    __slots__ = ('value', 'expires', 'device_id', 'generation')
+
+    def __init__(self, value, expires, device_id, generation):
+        self.value = value
+        self.expires = expires
+        self.device_id = device_id
+        self.generation = generation
+
+
+class _Flight:
+    """A computation in progress that identical misses wait for"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self, done):
+        self.done = done
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """TTL + LRU cache of computed endpoint responses.
+
+    ``get_or_compute`` returns a cached value younger than ``ttl`` seconds
+    or calls ``compute``; concurrent misses on the same key wait for the
+    first caller's result instead of running the query again (for at most
+    ``coalesce_timeout`` seconds, after which they compute themselves).
+    Ingestion paths call ``invalidate_devices`` once readings are
+    committed; entries tied to those devices are then treated as misses.
+    At most ``max_entries`` are kept, least recently used dropped first.
+
+    Waiting callers block on ``event_factory()`` events; servers running
+    on green threads must set a green-aware factory so a waiter yields to
+    the computing caller instead of blocking its hub.
+    """
+
+    def __init__(self, ttl=None, max_entries=None, coalesce_timeout=None,
+                 event_factory=None):
+        self.ttl = Config.RESPONSE_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or Config.RESPONSE_CACHE_MAX_ENTRIES
+        self.coalesce_timeout = (
+            Config.RESPONSE_CACHE_COALESCE_TIMEOUT if coalesce_timeout is None else coalesce_timeout
+        )
+        self.event_factory = event_factory or threading.Event
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0
+        }
+
+    def _valid(self, entry, now):
+        if entry.expires <= now:
+            self._stats['expirations'] += 1
+            return False
+        if entry.device_id is not None and \
+                entry.generation != self._generations.get(entry.device_id, 0):
+            self._stats['invalidations'] += 1
+            return False
+        return True
+
+    def get_or_compute(self, key, compute, device_id=None):
+        """Cached value for ``key`` or the result of ``compute()``.
+
+        Entries with a ``device_id`` are invalidated by writes for it.
+        """
+        if self.ttl <= 0:
+            return compute()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._valid(entry, time.monotonic()):
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry.value
+                del self._entries[key]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(self.event_factory())
+                generation = self._generations.get(device_id, 0)
+                self._stats['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            if flight.done.wait(self.coalesce_timeout):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+            return compute()
+
+        try:
+            value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            flight.value = value
+            with self._lock:
+                # A write during compute may already have made the value stale
+                if generation == self._generations.get(device_id, 0):
+                    self._entries[key] = _Entry(
+                        value, time.monotonic() + self.ttl, device_id, generation
+                    )
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._stats['evictions'] += 1
+            return value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def invalidate_devices(self, device_ids):
+        """Mark every entry of these devices stale"""
+        with self._lock:
+            for device_id in device_ids:
+                self._generations[device_id] = self._generations.get(device_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Return a snapshot of cache counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['in_flight'] = len(self._flights)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_ratio'] = (stats['hits'] + stats['coalesced']) / lookups if lookups else 0.0
+        stats['ttl'] = self.ttl
+        stats['max_entries'] = self.max_entries
+        return stats
+
+
+# Shared by the monitoring endpoints and every ingestion path in the process
+response_cache = ResponseCache()
@@ -0,0 +1,377 @@
+# File: utils/rollups.py
+"""Minute and hour rollups of ``device_telemetry``.
+
+A background compactor aggregates raw rows into per-device minute buckets
+and minute buckets into hour buckets. Each level has a watermark: every
+bucket before it is complete. Raw rows are considered final once they are
+TELEMETRY_ROLLUP_LATENESS seconds old, which comfortably covers the write
+path: the batched writer timestamps rows only when it writes them, so a
+row commits within one COPY of its timestamp however long it was queued.
+
+``query_stats`` splits a time window into whole hours served from the
+hour rollups, partial hours from the minute rollups and sub-minute edges
+plus the not yet compacted tail from raw rows, so the cost stays roughly
+constant whatever the window length and the result equals a full scan.
+"""
+import threading
+from datetime import datetime, timedelta
+from config.config import Config
+from utils.cold_storage import get_store
+from utils.db_pool import get_pool
+
+METRICS = ('temperature', 'humidity', 'cpu_usage', 'memory_usage')
+
+MINUTE_TABLE = 'device_telemetry_rollup_minute'
+HOUR_TABLE = 'device_telemetry_rollup_hour'
+STATE_TABLE = 'device_telemetry_rollup_state'
+
+# pg_advisory_xact_lock key so only one compactor runs across processes
+LOCK_KEY = 0x726f6c6c
+
+MINUTE = timedelta(minutes=1)
+HOUR = timedelta(hours=1)
+
+_ROLLUP_COLUMNS = ['readings'] + [
+    f"{metric}_{agg}" for metric in METRICS for agg in ('count', 'sum', 'min', 'max')
+]
+
+
+def _rollup_table_ddl(table):
+    metric_columns = ",\n".join(
+        f"{metric}_count INTEGER NOT NULL, {metric}_sum DOUBLE PRECISION, "
+        f"{metric}_min DOUBLE PRECISION, {metric}_max DOUBLE PRECISION"
+        for metric in METRICS
+    )
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            device_id VARCHAR(80) NOT NULL,
+            bucket TIMESTAMP NOT NULL,
+            readings INTEGER NOT NULL,
+            {metric_columns},
+            PRIMARY KEY (device_id, bucket)
+        )
+    """
+
+
+CREATE_TABLES = [
+    _rollup_table_ddl(MINUTE_TABLE),
+    _rollup_table_ddl(HOUR_TABLE),
+    f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            level VARCHAR(10) PRIMARY KEY,
+            watermark TIMESTAMP NOT NULL
+        )
+    """
+]
+
+
+def floor_to(ts, step):
+    if step == HOUR:
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(second=0, microsecond=0)
+
+
+def ceil_to(ts, step):
+    floored = floor_to(ts, step)
+    return floored if floored == ts else floored + step
+
+
+def _raw_aggregates():
+    """Select list aggregating raw rows into the rollup column layout"""
+    parts = ["COUNT(*)"]
+    for metric in METRICS:
+        parts += [f"COUNT({metric})", f"SUM({metric})", f"MIN({metric})", f"MAX({metric})"]
+    return ", ".join(parts)
+
+
+def _merge_aggregates():
+    """Select list combining rows that already have the rollup layout"""
+    parts = ["SUM(readings)"]
+    for metric in METRICS:
+        parts += [
+            f"SUM({metric}_count)", f"SUM({metric}_sum)",
+            f"MIN({metric}_min)", f"MAX({metric}_max)"
+        ]
+    return ", ".join(parts)
+
+
+def _upsert_suffix():
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in _ROLLUP_COLUMNS)
+    return f"ON CONFLICT (device_id, bucket) DO UPDATE SET {updates}"
+
+
+def get_watermarks(cur):
+    cur.execute(f"SELECT level, watermark FROM {STATE_TABLE}")
+    return dict(cur.fetchall())
+
+
+class RollupCompactor:
+    """Advances the minute and hour rollups behind the raw data.
+
+    Each pass compacts at most ``chunk`` of raw data per transaction, so a
+    long backlog (e.g. after enabling rollups on an existing table) is
+    worked off in bounded steps. Minute rollups older than
+    TELEMETRY_ROLLUP_MINUTE_RETENTION_DAYS and hour rollups older than
+    TELEMETRY_ROLLUP_HOUR_RETENTION_DAYS are deleted; 0 keeps them forever.
+    """
+
+    def __init__(self, pool=None, interval=None, lateness=None, chunk=HOUR):
+        self._pool = pool
+        self.interval = interval or Config.TELEMETRY_ROLLUP_INTERVAL
+        self.lateness = timedelta(
+            seconds=Config.TELEMETRY_ROLLUP_LATENESS if lateness is None else lateness
+        )
+        self.chunk = chunk
+        self._tables_ready = False
+        self._stop = threading.Event()
+        self._thread = None
+        self.minutes_compacted = 0
+        self.hours_compacted = 0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = get_pool()
+        return self._pool
+
+    def ensure_tables(self, conn):
+        with conn.cursor() as cur:
+            for statement in CREATE_TABLES:
+                cur.execute(statement)
+        conn.commit()
+        self._tables_ready = True
+
+    def _initial_watermark(self, cur, now):
+        cur.execute("SELECT MIN(timestamp) FROM device_telemetry")
+        oldest = cur.fetchone()[0]
+        # Hour-aligned so the first hour rollup is built from complete minutes
+        return floor_to(oldest or now - self.lateness, HOUR)
+
+    def _step(self, conn, now):
+        """Compact one chunk; returns False when there is nothing to do"""
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return False
+
+            watermarks = get_watermarks(cur)
+            minute_wm = watermarks.get('minute')
+            if minute_wm is None:
+                minute_wm = self._initial_watermark(cur, now)
+            hour_wm = watermarks.get('hour') or floor_to(minute_wm, HOUR)
+
+            target = min(floor_to(now - self.lateness, MINUTE), minute_wm + self.chunk)
+            if target > minute_wm:
+                cur.execute(f"""
+                    INSERT INTO {MINUTE_TABLE} (device_id, bucket, {', '.join(_ROLLUP_COLUMNS)})
+                    SELECT device_id, date_trunc('minute', timestamp), {_raw_aggregates()}
+                    FROM device_telemetry
+                    WHERE timestamp >= %s AND timestamp < %s
+                    GROUP BY 1, 2
+                    {_upsert_suffix()}
+                """, (minute_wm, target))
+                self.minutes_compacted += int((target - minute_wm) / MINUTE)
+                minute_wm = target
+
+            hour_target = floor_to(minute_wm, HOUR)
+            if hour_target > hour_wm:
+                cur.execute(f"""
+                    INSERT INTO {HOUR_TABLE} (device_id, bucket, {', '.join(_ROLLUP_COLUMNS)})
+                    SELECT device_id, date_trunc('hour', bucket), {_merge_aggregates()}
+                    FROM {MINUTE_TABLE}
+                    WHERE bucket >= %s AND bucket < %s
+                    GROUP BY 1, 2
+                    {_upsert_suffix()}
+                """, (hour_wm, hour_target))
+                self.hours_compacted += int((hour_target - hour_wm) / HOUR)
+                hour_wm = hour_target
+
+            cur.execute(f"""
+                INSERT INTO {STATE_TABLE} (level, watermark)
+                VALUES ('minute', %s), ('hour', %s)
+                ON CONFLICT (level) DO UPDATE SET watermark = EXCLUDED.watermark
+            """, (minute_wm, hour_wm))
+        conn.commit()
+        return minute_wm < floor_to(now - self.lateness, MINUTE)
+
+    def _prune(self, conn, now):
+        retention = (
+            (MINUTE_TABLE, Config.TELEMETRY_ROLLUP_MINUTE_RETENTION_DAYS),
+            (HOUR_TABLE, Config.TELEMETRY_ROLLUP_HOUR_RETENTION_DAYS)
+        )
+        with conn.cursor() as cur:
+            for table, days in retention:
+                if days > 0:
+                    cur.execute(
+                        f"DELETE FROM {table} WHERE bucket < %s",
+                        (now - timedelta(days=days),)
+                    )
+        conn.commit()
+
+    def run_once(self, now=None):
+        """Compact until caught up with the lateness horizon"""
+        now = now or datetime.utcnow()
+        with self.pool.connection() as conn:
+            if not self._tables_ready:
+                self.ensure_tables(conn)
+            while self._step(conn, now):
+                if self._stop.is_set():
+                    break
+            self._prune(conn, now)
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[ERROR] Rollup compaction failed: {e}")
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="telemetry_rollup_compactor",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+
+
+def plan_segments(start, end, minute_wm, hour_wm, cold_horizon=None):
+    """Split [start, end) into {'raw', 'cold', 'minute', 'hour': [ranges]}.
+
+    Raw ranges before ``cold_horizon`` are served from cold storage.
+    """
+    plan = {'raw': [], 'cold': [], 'minute': [], 'hour': []}
+
+    def add(level, lower, upper):
+        if level == 'raw' and cold_horizon is not None and lower < cold_horizon:
+            add('cold', lower, min(upper, cold_horizon))
+            lower = max(lower, cold_horizon)
+        if lower < upper:
+            plan[level].append((lower, upper))
+
+    def split_minutes(lower, upper):
+        m0 = ceil_to(lower, MINUTE)
+        m1 = floor_to(upper, MINUTE)
+        if minute_wm is not None:
+            m1 = min(m1, minute_wm)
+        if minute_wm is None or m0 >= m1:
+            add('raw', lower, upper)
+            return
+        add('raw', lower, m0)
+        add('minute', m0, m1)
+        add('raw', m1, upper)
+
+    h0 = ceil_to(start, HOUR)
+    h1 = floor_to(end, HOUR)
+    if hour_wm is not None:
+        h1 = min(h1, hour_wm)
+    if hour_wm is None or h0 >= h1:
+        split_minutes(start, end)
+    else:
+        split_minutes(start, h0)
+        add('hour', h0, h1)
+        split_minutes(h1, end)
+    return plan
+
+
+def merge_totals(left, right):
+    """Combine two rollup-layout dicts; None means no values"""
+    def pick(a, b, combine):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return combine(a, b)
+
+    merged = {'readings': (left['readings'] or 0) + (right['readings'] or 0)}
+    for metric in METRICS:
+        merged[f'{metric}_count'] = (left[f'{metric}_count'] or 0) + (right[f'{metric}_count'] or 0)
+        for agg, combine in (('sum', lambda a, b: a + b), ('min', min), ('max', max)):
+            key = f'{metric}_{agg}'
+            merged[key] = pick(left[key], right[key], combine)
+    return merged
+
+
+def _range_filter(column, ranges):
+    clause = " OR ".join(f"({column} >= %s AND {column} < %s)" for _ in ranges)
+    params = [bound for pair in ranges for bound in pair]
+    return f"({clause})", params
+
+
+def query_stats(device_id, start, end=None, pool=None):
+    """Exact per-device aggregates over [start, end) from rollups and raw rows.
+
+    Returns {'readings': n, '<metric>': {'avg', 'min', 'max', 'count'}}.
+    Windows starting before the minute rollup retention miss the readings
+    of their partial first hour, just as raw rows past retention are gone.
+    Raw edges older than the cold storage horizon are read from segments.
+    """
+    end = end or datetime.utcnow()
+    pool = pool or get_pool()
+    if start >= end:
+        start = end
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            try:
+                watermarks = get_watermarks(cur)
+            except Exception:
+                # Rollup tables not created yet; everything comes from raw rows
+                conn.rollback()
+                watermarks = {}
+            store = get_store()
+            plan = plan_segments(
+                start, end, watermarks.get('minute'), watermarks.get('hour'), store.horizon()
+            )
+
+            selects = []
+            params = []
+            sources = (
+                ('raw', 'device_telemetry', 'timestamp', _raw_aggregates()),
+                ('minute', MINUTE_TABLE, 'bucket', _merge_aggregates()),
+                ('hour', HOUR_TABLE, 'bucket', _merge_aggregates())
+            )
+            for level, table, column, aggregates in sources:
+                if not plan[level]:
+                    continue
+                where, range_params = _range_filter(column, plan[level])
+                selects.append(
+                    f"SELECT {aggregates} FROM {table} WHERE device_id = %s AND {where}"
+                )
+                params += [device_id] + range_params
+
+            if not selects:
+                selects.append(f"SELECT {_raw_aggregates()} FROM device_telemetry WHERE false")
+            aliases = ", ".join(_ROLLUP_COLUMNS)
+            cur.execute(f"""
+                SELECT {_merge_aggregates()}
+                FROM ({' UNION ALL '.join(selects)}) AS parts({aliases})
+            """, params)
+            row = cur.fetchone()
+        conn.commit()
+
+    totals = dict(zip(_ROLLUP_COLUMNS, row))
+    for lower, upper in plan['cold']:
+        totals = merge_totals(totals, store.aggregate(device_id, lower, upper, METRICS))
+
+    stats = {'readings': int(totals['readings'] or 0)}
+    for metric in METRICS:
+        count = int(totals[f'{metric}_count'] or 0)
+        total = totals[f'{metric}_sum']
+        stats[metric] = {
+            'count': count,
+            'avg': total / count if count else None,
+            'min': totals[f'{metric}_min'],
+            'max': totals[f'{metric}_max']
+        }
+    return stats
@@ -0,0 +1,301 @@
+# File: utils/telemetry_partitions.py
+"""Time partitions of ``device_telemetry``.
+
+The table is range-partitioned on ``timestamp`` into daily or weekly
+partitions named after their first day (``device_telemetry_p20261018``),
+plus a DEFAULT partition that catches rows outside every range. The
+maintainer keeps TELEMETRY_PARTITIONS_AHEAD partitions created in advance
+and drops whole partitions once they are older than
+TELEMETRY_RETENTION_DAYS, so retention never runs a bulk DELETE.
+
+    python -m utils.telemetry_partitions maintain
+    python -m utils.telemetry_partitions migrate
+"""
+import re
+import sys
+import threading
+from datetime import datetime, timedelta
+from config.config import Config
+from utils.db_pool import get_pool
+
+TABLE = 'device_telemetry'
+DEFAULT_PARTITION = f'{TABLE}_default'
+INTERVALS = ('day', 'week')
+
+_BOUND = re.compile(r"FROM \((?:'([^']+)'|MINVALUE)\) TO \('([^']+)'\)")
+
+# Columns of the partitioned table; must match DeviceTelemetry
+CREATE_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        id SERIAL,
+        device_id VARCHAR(80) NOT NULL REFERENCES devices(device_id),
+        timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        temperature FLOAT,
+        humidity FLOAT,
+        cpu_usage FLOAT,
+        memory_usage FLOAT,
+        disk_usage FLOAT,
+        battery_level FLOAT,
+        signal_strength FLOAT,
+        raw_data JSON,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp)
+"""
+
+# Metrics carried in the per-device history index so history and stats
+# queries that select only these columns can run as index-only scans
+INDEXED_METRICS = (
+    'temperature', 'humidity', 'cpu_usage', 'memory_usage',
+    'disk_usage', 'battery_level', 'signal_strength'
+)
+DEVICE_TIME_INDEX = f'ix_{TABLE}_device_id_timestamp'
+
+CREATE_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_timestamp ON {TABLE} (timestamp)",
+    f"CREATE INDEX IF NOT EXISTS {DEVICE_TIME_INDEX} ON {TABLE} "
+    f"(device_id, timestamp DESC) INCLUDE (id, {', '.join(INDEXED_METRICS)})"
+]
+
+CREATE_DEFAULT_PARTITION = (
+    f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"
+)
+
+
+def period_start(day, interval='day'):
+    """First day of the partition containing ``day``; weeks start on Monday"""
+    if isinstance(day, datetime):
+        day = day.date()
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def period_end(start, interval='day'):
+    return start + timedelta(days=7 if interval == 'week' else 1)
+
+
+def partition_name(start):
+    return f"{TABLE}_p{start:%Y%m%d}"
+
+
+def is_partitioned(cur):
+    cur.execute("""
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+    """, (TABLE,))
+    return cur.fetchone() is not None
+
+
+def list_partitions(cur):
+    """Range partitions as [(name, start, end)] ordered by start"""
+    cur.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s AND pg_table_is_visible(p.oid)
+    """, (TABLE,))
+    partitions = []
+    for name, bound in cur.fetchall():
+        match = _BOUND.search(bound or '')
+        if not match:
+            continue  # DEFAULT partition
+        start, end = match.groups()
+        start = datetime.fromisoformat(start) if start else datetime.min
+        partitions.append((name, start, datetime.fromisoformat(end)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def ensure_partitions(conn, now=None, ahead=None, interval=None):
+    """Create the current and upcoming partitions; returns the names created.
+
+    Periods overlapping an existing partition are skipped, so changing the
+    interval takes effect once the old partitions run out.
+    """
+    interval = interval or Config.TELEMETRY_PARTITION_INTERVAL
+    if interval not in INTERVALS:
+        raise ValueError(f"unknown partition interval {interval!r}")
+    ahead = Config.TELEMETRY_PARTITIONS_AHEAD if ahead is None else ahead
+    start = period_start(now or datetime.utcnow(), interval)
+
+    with conn.cursor() as cur:
+        cur.execute(CREATE_DEFAULT_PARTITION)
+        existing = [(s, e) for _, s, e in list_partitions(cur)]
+    conn.commit()
+
+    created = []
+    for _ in range(ahead + 1):
+        end = period_end(start, interval)
+        lower = datetime.combine(start, datetime.min.time())
+        upper = datetime.combine(end, datetime.min.time())
+        if not any(s < upper and lower < e for s, e in existing):
+            name = partition_name(start)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+                        f"FOR VALUES FROM ('{lower:%Y-%m-%d %H:%M:%S}') "
+                        f"TO ('{upper:%Y-%m-%d %H:%M:%S}')"
+                    )
+                conn.commit()
+                created.append(name)
+            except Exception as e:
+                # Typically rows for this range already sit in the default partition
+                conn.rollback()
+                print(f"[ERROR] Could not create partition {name}: {e}")
+        start = end
+    return created
+
+
+def drop_expired_partitions(conn, retention_days=None, now=None):
+    """Drop partitions whose whole range is older than the retention window"""
+    retention_days = Config.TELEMETRY_RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days <= 0:
+        return []
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+
+    with conn.cursor() as cur:
+        expired = [name for name, _, end in list_partitions(cur) if end <= cutoff]
+    dropped = []
+    for name in expired:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {name}")
+        conn.commit()
+        dropped.append(name)
+    return dropped
+
+
+def migrate_legacy_table(conn, interval=None):
+    """Turn an unpartitioned device_telemetry into the partitioned layout.
+
+    The old table is renamed and attached as one partition covering every
+    timestamp up to the end of the current period, so no rows are copied.
+    Validating the range scans the old table and attaching builds the (id,
+    timestamp) key on it, so run this in a maintenance window. Retention
+    drops the old table as a whole once its newest period has expired.
+    Returns False if the table is already partitioned.
+    """
+    interval = interval or Config.TELEMETRY_PARTITION_INTERVAL
+    legacy = f"{TABLE}_legacy"
+    current = period_start(datetime.utcnow(), interval)
+    cutoff = datetime.combine(period_end(current, interval), datetime.min.time())
+
+    with conn.cursor() as cur:
+        if is_partitioned(cur):
+            return False
+        cur.execute(f"ALTER TABLE {TABLE} RENAME TO {legacy}")
+        cur.execute(f"ALTER SEQUENCE IF EXISTS {TABLE}_id_seq RENAME TO {legacy}_id_seq")
+        for column in ('disk_usage', 'battery_level', 'signal_strength'):
+            cur.execute(f"ALTER TABLE {legacy} ADD COLUMN IF NOT EXISTS {column} FLOAT")
+        cur.execute(f"ALTER TABLE {legacy} ADD COLUMN IF NOT EXISTS raw_data JSON")
+        cur.execute(f"DELETE FROM {legacy} WHERE timestamp IS NULL")
+        cur.execute(f"ALTER TABLE {legacy} ALTER COLUMN timestamp SET NOT NULL")
+        cur.execute(f"ALTER TABLE {legacy} ALTER COLUMN device_id SET NOT NULL")
+        cur.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT IF EXISTS {TABLE}_pkey")
+        cur.execute(f"ALTER INDEX IF EXISTS ix_{TABLE}_timestamp RENAME TO ix_{legacy}_timestamp")
+        # Skip the validation scan at ATTACH time by proving the range up front
+        cur.execute(
+            f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_range "
+            f"CHECK (timestamp < %s) NOT VALID",
+            (cutoff,)
+        )
+        cur.execute(f"ALTER TABLE {legacy} VALIDATE CONSTRAINT {legacy}_range")
+        cur.execute(CREATE_TABLE)
+        for statement in CREATE_INDEXES:
+            cur.execute(statement)
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {legacy}), 0) + 1, false)",
+            (TABLE,)
+        )
+        cur.execute(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {legacy} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{cutoff:%Y-%m-%d %H:%M:%S}')"
+        )
+    conn.commit()
+    return True
+
+
+class PartitionMaintainer:
+    """Background thread that creates upcoming and drops expired partitions"""
+
+    def __init__(self, pool=None, interval=None):
+        self._pool = pool
+        self.interval = interval or Config.TELEMETRY_PARTITION_MAINTENANCE_INTERVAL
+        self._stop = threading.Event()
+        self._thread = None
+        self.created = []
+        self.dropped = []
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = get_pool()
+        return self._pool
+
+    def run_once(self):
+        """One maintenance pass; returns (created, dropped) partition names"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                partitioned = is_partitioned(cur)
+            conn.commit()
+            if not partitioned:
+                print(f"[ERROR] {TABLE} is not partitioned; run "
+                      f"'python -m utils.telemetry_partitions migrate'")
+                return [], []
+            created = ensure_partitions(conn)
+            dropped = drop_expired_partitions(conn)
+        self.created.extend(created)
+        self.dropped.extend(dropped)
+        if created or dropped:
+            print(f"[OK] Telemetry partitions: {len(created)} created, {len(dropped)} dropped")
+        return created, dropped
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[ERROR] Partition maintenance failed: {e}")
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="telemetry_partition_maintainer",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else 'maintain'
+    if command == 'migrate':
+        with get_pool().connection() as conn:
+            if migrate_legacy_table(conn):
+                print(f"[OK] {TABLE} converted to a partitioned table")
+            else:
+                print(f"[INFO] {TABLE} is already partitioned")
+        command = 'maintain'
+    if command == 'maintain':
+        created, dropped = PartitionMaintainer().run_once()
+        print(f"[INFO] Created: {', '.join(created) or 'none'}")
+        print(f"[INFO] Dropped: {', '.join(dropped) or 'none'}")
+    else:
+        print(f"[ERROR] Unknown command {command!r}; use 'maintain' or 'migrate'")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
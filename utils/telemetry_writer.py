@@ -0,0 +1,290 @@
+# File: utils/telemetry_writer.py
+
+import io
+import csv
+import time
+import queue
+import threading
+from datetime import datetime
+import psycopg2
+from psycopg2 import errors
+from psycopg2.extras import execute_values
+from config.config import Config
+from utils.db_pool import get_pool
+from utils.device_registry import known_devices
+from utils.hot_tier import hot_tier
+from utils.last_active import last_active_tracker
+from utils.latest_readings import latest_readings
+from utils.response_cache import response_cache
+
+TELEMETRY_COLUMNS = (
+    'device_id', 'timestamp', 'temperature', 'humidity',
+    'cpu_usage', 'memory_usage'
+)
+
+
+class TelemetryWriter:
+    """Buffers telemetry readings and writes them to PostgreSQL in bulk.
+
+    Readings are queued by ``submit`` from any thread and flushed by a single
+    background thread whenever ``batch_size`` readings are pending or
+    ``flush_interval`` seconds have passed, whichever comes first; ``write``
+    commits readings in the calling thread instead. Each flush creates devices
+    not yet in the known-device registry and COPYs the telemetry rows in one
+    transaction; once the rows are committed they are added to the hot tier
+    and ``last_active`` is handed to the write-behind tracker. A failed flush
+    is retried up to ``max_retries`` times with doubling backoff; a batch
+    PostgreSQL rejects outright is written in halves so only the offending
+    rows are dropped. If a device was deleted behind the registry's back, the
+    batch's devices are created again and the batch is retried at once.
+    """
+
+    def __init__(self, pool=None, batch_size=None, flush_interval=None,
+                 max_queue_size=None, max_retries=None, retry_backoff=None):
+        self.pool = pool or get_pool()
+        self.batch_size = batch_size or Config.TELEMETRY_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.TELEMETRY_FLUSH_INTERVAL
+        self.max_retries = Config.TELEMETRY_FLUSH_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = retry_backoff or Config.TELEMETRY_FLUSH_RETRY_BACKOFF
+        self.queue = queue.Queue(maxsize=max_queue_size or Config.TELEMETRY_QUEUE_SIZE)
+
+        self._thread = None
+        self._running = False
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'dropped': 0,
+            'written': 0,
+            'failed': 0,
+            'retries': 0,
+            'flushes': 0,
+            'last_flush_size': 0,
+            'last_flush_seconds': 0.0,
+            'total_flush_seconds': 0.0
+        }
+
+    def start(self):
+        """Start the background flush thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run,
+            name="telemetry_writer",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the flush thread, writing out anything still queued"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @staticmethod
+    def _row(data):
+        # The timestamp is set when the row is written, see _write
+        return (
+            data['device_id'],
+            None,
+            data.get('temperature'),
+            data.get('humidity'),
+            data.get('cpu_usage'),
+            data.get('memory_usage')
+        )
+
+    def submit(self, data, timeout=1.0):
+        """Queue a reading for writing; returns False if the queue stayed full"""
+        row = self._row(data)
+        try:
+            self.queue.put(row, timeout=timeout)
+        except queue.Full:
+            self._incr('dropped')
+            return False
+        self._incr('submitted')
+        return True
+
+    def write(self, readings):
+        """Write readings in the calling thread, returning once they are committed.
+
+        For callers that may only acknowledge durable data, such as queue
+        consumers. Failures are retried like a flush; the last error is
+        raised once the retries are used up.
+        """
+        rows = [self._row(data) for data in readings]
+        self._incr('submitted', len(rows))
+        return self._write_with_retry(rows) if rows else 0
+
+    def get_stats(self):
+        """Return a snapshot of writer counters"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self.queue.qsize()
+        stats['avg_flush_seconds'] = (
+            stats['total_flush_seconds'] / stats['flushes'] if stats['flushes'] else 0.0
+        )
+        return stats
+
+    def _incr(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        while self._running or not self.queue.empty():
+            batch = self._collect_batch()
+            if batch:
+                self._flush(batch)
+
+    def _collect_batch(self):
+        """Block until a full batch is queued or the flush interval elapses"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        try:
+            self._write_with_retry(batch)
+        except Exception as e:
+            print(f"[ERROR] Telemetry flush of {len(batch)} rows failed "
+                  f"after {self.max_retries} retries: {e}")
+
+    def _write_with_retry(self, batch):
+        """Write a batch, retrying failures; returns the number of rows written"""
+        backoff = self.retry_backoff
+        attempt = 0
+        recreated = False
+        while True:
+            started = time.monotonic()
+            try:
+                written = self._write(batch)
+            except errors.ForeignKeyViolation as e:
+                error = e
+                # A device was deleted behind the registry's back; forgetting
+                # the batch's devices makes the next attempt create them
+                known_devices.discard_many({row[0] for row in batch})
+                if not recreated:
+                    recreated = True
+                    continue
+            except psycopg2.DataError as e:
+                # Retrying cannot help a malformed value; write around it
+                error = e
+                break
+            except Exception as e:
+                error = e
+            else:
+                self._committed(written, time.monotonic() - started)
+                return len(batch)
+
+            if attempt >= self.max_retries:
+                self._incr('failed', len(batch))
+                raise error
+            attempt += 1
+            self._incr('retries')
+            print(f"[ERROR] Telemetry flush of {len(batch)} rows failed: {error}; "
+                  f"retrying in {backoff}s")
+            time.sleep(backoff)
+            backoff *= 2
+
+        if len(batch) == 1:
+            self._incr('failed')
+            print(f"[ERROR] Dropped telemetry row of {batch[0][0]}: {error}")
+            return 0
+        middle = len(batch) // 2
+        return self._write_with_retry(batch[:middle]) + self._write_with_retry(batch[middle:])
+
+    def _write(self, batch):
+        """Write a batch in one transaction; returns the rows as written.
+
+        Rows are timestamped only once a connection is held, so they commit
+        well within TELEMETRY_ROLLUP_LATENESS of their timestamp however
+        long they waited in the queue or for retries.
+        """
+        new_devices = known_devices.unknown({row[0] for row in batch})
+        with self.pool.connection() as conn:
+            now = datetime.utcnow()
+            rows = [(row[0], now) + row[2:] for row in batch]
+            with conn.cursor() as cur:
+                self._ensure_devices(cur, new_devices)
+                self._copy_rows(cur, rows)
+            conn.commit()
+        known_devices.add_many(new_devices)
+        return rows
+
+    def _committed(self, batch, elapsed):
+        """Hand committed rows to the in-memory tiers and trackers"""
+        device_ids = {row[0] for row in batch}
+        # Only committed rows become readable from memory
+        for row in batch:
+            hot_tier.append(row[0], row[1], row[2:])
+        latest = self._latest_rows(batch)
+        last_active_tracker.touch_many({device_id: row[1] for device_id, row in latest.items()})
+        latest_readings.update_many({
+            device_id: (row[1], dict(zip(TELEMETRY_COLUMNS[2:], row[2:])))
+            for device_id, row in latest.items()
+        })
+        response_cache.invalidate_devices(device_ids)
+
+        with self._stats_lock:
+            self._stats['written'] += len(batch)
+            self._stats['flushes'] += 1
+            self._stats['last_flush_size'] = len(batch)
+            self._stats['last_flush_seconds'] = elapsed
+            self._stats['total_flush_seconds'] += elapsed
+
+    def _ensure_devices(self, cur, device_ids):
+        """Create devices that may not exist yet, ignoring ones that do"""
+        if not device_ids:
+            return
+        execute_values(cur, """
+            INSERT INTO devices (device_id, name, owner_id, device_type)
+            VALUES %s
+            ON CONFLICT (device_id) DO NOTHING
+        """, [
+            (device_id, f"Virtual Device {device_id}", 1, 'virtual')
+            for device_id in device_ids
+        ])
+
+    def _copy_rows(self, cur, batch):
+        """Stream the batch into device_telemetry with COPY"""
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in batch:
+            writer.writerow(['' if value is None else value for value in row])
+        buf.seek(0)
+        cur.copy_expert(
+            f"COPY device_telemetry ({', '.join(TELEMETRY_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buf
+        )
+
+    @staticmethod
+    def _latest_rows(batch):
+        """Newest row per device in the batch"""
+        latest = {}
+        for row in batch:
+            if row[0] not in latest or row[1] > latest[row[0]][1]:
+                latest[row[0]] = row
+        return latest
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the process-wide telemetry writer, creating it on first use"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = TelemetryWriter()
+            _writer.start()
+        return _writer
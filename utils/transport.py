@@ -0,0 +1,308 @@
+# File: utils/transport.py
+"""Message transports for device_data readings.
+
+Producers call ``publish``/``publish_batch`` and consumers are created
+with ``consumer()``; both sides use the same transport object, picked by
+``MESSAGE_TRANSPORT``:
+
+``rabbitmq``
+    Readings go through the broker (partition queues, wire format and
+    publisher confirms as configured). Works across processes and hosts.
+
+``inprocess``
+    Readings are handed over through bounded in-memory queues, one per
+    partition, without encoding or a broker hop. Producers and consumers
+    must live in the same process, e.g. the single-node ``run.py``
+    deployment or a benchmark.
+"""
+import abc
+import queue
+import threading
+import time
+from config.config import config
+from utils.partitioning import get_ring, parse_partitions
+
+
+class Transport(abc.ABC):
+    """Interface shared by all transports"""
+
+    name = None
+
+    def __init__(self, cfg=None):
+        self.config = cfg or config['default']
+        self.ring = get_ring(self.config)
+
+    def publish(self, reading):
+        """Publish one reading; returns True if it was accepted"""
+        return self.publish_batch([reading]) == 1
+
+    @abc.abstractmethod
+    def publish_batch(self, readings, pack=False):
+        """Publish several readings; returns how many were accepted"""
+
+    @abc.abstractmethod
+    def consumer(self, handlers=None, partitions=None, **options):
+        """Create a consumer calling ``handler(readings)`` for each group.
+
+        ``partitions`` defaults to MONITORING_OWNED_PARTITIONS; ``options``
+        override the MONITORING_* consumer settings. The consumer is
+        returned unstarted.
+        """
+
+    def _consumer_options(self, partitions, options):
+        if partitions is None:
+            partitions = parse_partitions(
+                self.config.MONITORING_OWNED_PARTITIONS, self.ring.partitions
+            )
+        settings = {
+            'workers': self.config.MONITORING_CONSUMERS,
+            'ack_batch': self.config.MONITORING_ACK_BATCH,
+            'ack_interval': self.config.MONITORING_ACK_INTERVAL
+        }
+        settings.update(options)
+        return partitions, settings
+
+    def get_stats(self):
+        return {'transport': self.name}
+
+    def close(self):
+        pass
+
+
+class RabbitMQTransport(Transport):
+    """Transport backed by the RabbitMQ device_data queues"""
+
+    name = 'rabbitmq'
+
+    def __init__(self, cfg=None, confirm=None):
+        super().__init__(cfg)
+        self.confirm = self.config.RABBITMQ_CONFIRM_PUBLISH if confirm is None else confirm
+        self._handler = None
+        self._lock = threading.Lock()
+
+    @property
+    def handler(self):
+        with self._lock:
+            if self._handler is None:
+                from utils.message_handler import RabbitMQHandler
+                handler = RabbitMQHandler(cfg=self.config)
+                if self.confirm:
+                    handler.start_publisher()
+                self._handler = handler
+            return self._handler
+
+    def publish_batch(self, readings, pack=False):
+        return self.handler.publish_batch(readings, pack=pack)
+
+    def consumer(self, handlers=None, partitions=None, **options):
+        from utils.message_handler import connection_parameters
+        from monitoring_service.consumer import DeviceDataConsumer
+
+        partitions, settings = self._consumer_options(partitions, options)
+        settings.setdefault('prefetch', self.config.MONITORING_PREFETCH)
+        return DeviceDataConsumer(
+            connection_parameters(self.config),
+            self.ring,
+            partitions=partitions,
+            handlers=handlers,
+            **settings
+        )
+
+    def get_stats(self):
+        stats = super().get_stats()
+        if self._handler is not None and self._handler.publisher is not None:
+            stats['publisher'] = self._handler.publisher.get_stats()
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._handler is not None:
+                self._handler.close()
+                self._handler = None
+
+
+class InProcessTransport(Transport):
+    """Transport handing readings to consumers through in-memory queues.
+
+    Readings are routed with the same partition ring as the broker, so a
+    device's readings stay in order behind one consumer worker. Reading
+    dicts are passed by reference and must not be modified afterwards.
+    When a queue is full ``publish_batch`` waits up to ``block_timeout``
+    seconds and then rejects the rest of the batch.
+    """
+
+    name = 'inprocess'
+
+    def __init__(self, cfg=None, max_size=None, block_timeout=None):
+        super().__init__(cfg)
+        max_size = max_size or self.config.INPROCESS_QUEUE_SIZE
+        self.block_timeout = (
+            self.config.RABBITMQ_PUBLISH_TIMEOUT if block_timeout is None else block_timeout
+        )
+        self.queues = {
+            queue_name: queue.Queue(maxsize=max_size)
+            for queue_name in self.ring.queue_names
+        }
+        self._stats_lock = threading.Lock()
+        self._stats = {'published': 0, 'rejected': 0}
+
+    def publish_batch(self, readings, pack=False):
+        accepted = 0
+        for reading in readings:
+            target = self.queues[self.ring.queue_for(reading['device_id'])]
+            try:
+                target.put(reading, timeout=self.block_timeout)
+            except queue.Full:
+                break
+            accepted += 1
+        with self._stats_lock:
+            self._stats['published'] += accepted
+            self._stats['rejected'] += len(readings) - accepted
+        return accepted
+
+    def consumer(self, handlers=None, partitions=None, **options):
+        partitions, settings = self._consumer_options(partitions, options)
+        settings.pop('prefetch', None)
+        return InProcessConsumer(self, partitions=partitions, handlers=handlers, **settings)
+
+    def get_stats(self):
+        stats = super().get_stats()
+        with self._stats_lock:
+            stats.update(self._stats)
+        stats['queued'] = {name: q.qsize() for name, q in self.queues.items()}
+        return stats
+
+
+class InProcessConsumer:
+    """Worker threads draining an InProcessTransport.
+
+    Mirrors DeviceDataConsumer: one worker per owned partition (or
+    ``workers`` threads on an unpartitioned queue), groups of up to
+    ``ack_batch`` readings or whatever arrived within ``ack_interval``
+    seconds. A group whose handler fails is retried with backoff, the
+    in-memory equivalent of a requeue.
+    """
+
+    def __init__(self, transport, partitions=None, handlers=None, workers=2,
+                 ack_batch=50, ack_interval=1.0, max_backoff=30):
+        self.transport = transport
+        ring = transport.ring
+        if ring.partitions == 1:
+            self.queue_names = [ring.queue_name(0)] * workers
+        else:
+            owned = range(ring.partitions) if partitions is None else partitions
+            self.queue_names = [ring.queue_name(p) for p in owned]
+        self.handlers = list(handlers or [])
+        self.ack_batch = max(1, ack_batch)
+        self.ack_interval = ack_interval
+        self.max_backoff = max_backoff
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'received': 0,
+            'acked': 0,
+            'requeued': 0,
+            'dropped': 0
+        }
+
+    def add_handler(self, handler):
+        """Register ``handler(readings)`` to receive each group"""
+        self.handlers.append(handler)
+
+    def _incr(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['workers'] = len(self._threads)
+        stats['queues'] = sorted(set(self.queue_names))
+        return stats
+
+    def start(self):
+        self._stop.clear()
+        for index, queue_name in enumerate(self.queue_names):
+            thread = threading.Thread(
+                target=self._run,
+                args=(self.transport.queues[queue_name],),
+                name=f"device_data_consumer_{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _next_group(self, source):
+        try:
+            group = [source.get(timeout=self.ack_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.ack_interval
+        while len(group) < self.ack_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                group.append(source.get(timeout=min(remaining, 0.05)))
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self, source):
+        while not self._stop.is_set():
+            group = self._next_group(source)
+            if group:
+                self._incr('received', len(group))
+                self._process(group)
+
+    def _process(self, group):
+        backoff = 0.1
+        while True:
+            try:
+                for handler in self.handlers:
+                    handler(group)
+                self._incr('acked', len(group))
+                return
+            except Exception as e:
+                print(f"[ERROR] Failed to process device data: {e}")
+                if self._stop.is_set():
+                    self._incr('dropped', len(group))
+                    return
+                self._incr('requeued', len(group))
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+
+TRANSPORTS = {
+    RabbitMQTransport.name: RabbitMQTransport,
+    InProcessTransport.name: InProcessTransport
+}
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def create_transport(name=None, cfg=None, **kwargs):
+    """Build a new transport; ``name`` defaults to MESSAGE_TRANSPORT"""
+    cfg = cfg or config['default']
+    name = name or cfg.MESSAGE_TRANSPORT
+    if name not in TRANSPORTS:
+        raise ValueError(f"unknown message transport {name!r}")
+    return TRANSPORTS[name](cfg, **kwargs)
+
+
+def get_transport(cfg=None):
+    """Process-wide transport shared by producers and consumers"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = create_transport(cfg=cfg)
+        return _transport
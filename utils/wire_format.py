@@ -0,0 +1,172 @@
+# File: utils/wire_format.py
+"""Encodings for device_data messages.
+
+Two formats are understood, told apart by the AMQP ``content_type``:
+
+``application/json``
+    The original format: one reading object (or a list of them) as JSON.
+    Messages without a content type are treated as JSON.
+
+``application/vnd.iot.readings.v1``
+    Compact binary layout, all integers big-endian::
+
+        header   magic b'IR' | version u8 | reserved u8 | n_devices u16 | n_readings u32
+        devices  n_devices x (length u8 | utf-8 device_id)
+        readings n_readings x (device index u16 | field mask u16 |
+                               [epoch millis i64] | one f64 per set metric bit)
+
+    Bit 15 of the field mask marks a timestamp; bits 0..14 index METRICS.
+    Version 2 is identical except that device_id lengths are u16; it is
+    only written when some device_id is longer than 255 bytes in UTF-8, so
+    version 1 consumers keep working for everything else.
+    Keys outside METRICS are not carried. A message may hold one reading
+    or a packed batch from many devices.
+"""
+import json
+import struct
+import calendar
+from datetime import datetime, timedelta
+
+JSON_CONTENT_TYPE = 'application/json'
+BINARY_CONTENT_TYPE = 'application/vnd.iot.readings.v1'
+
+FORMATS = {
+    'json': JSON_CONTENT_TYPE,
+    'binary': BINARY_CONTENT_TYPE
+}
+
+# Metric ids are positions in this tuple; append only, never reorder
+METRICS = (
+    'temperature', 'humidity', 'cpu_usage', 'memory_usage', 'disk_usage',
+    'battery_level', 'signal_strength', 'pressure', 'wind_speed',
+    'wind_direction', 'wind_gust', 'rain_rate', 'uv_index'
+)
+
+EPOCH = datetime(1970, 1, 1)
+MAGIC = b'IR'
+VERSION = 1
+LONG_IDS_VERSION = 2
+TIMESTAMP_BIT = 1 << 15
+
+_HEADER = struct.Struct('!2sBBHI')
+_READING = struct.Struct('!HH')
+_MILLIS = struct.Struct('!q')
+_DEVICE_LEN = {
+    VERSION: struct.Struct('!B'),
+    LONG_IDS_VERSION: struct.Struct('!H')
+}
+
+
+def _to_millis(timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is not None:
+        return int(timestamp.timestamp() * 1000)
+    # Naive timestamps round-trip unchanged: encode as if UTC
+    return calendar.timegm(timestamp.timetuple()) * 1000 + timestamp.microsecond // 1000
+
+
+def _from_millis(millis):
+    return (EPOCH + timedelta(milliseconds=millis)).isoformat()
+
+
+def encode_readings(readings):
+    """Pack one or more readings into the v1 binary layout"""
+    device_index = {}
+    body = []
+    for reading in readings:
+        device_id = reading['device_id']
+        if device_id not in device_index:
+            device_index[device_id] = len(device_index)
+
+        mask = 0
+        values = []
+        for metric_id, name in enumerate(METRICS):
+            value = reading.get(name)
+            if value is not None:
+                mask |= 1 << metric_id
+                values.append(float(value))
+
+        timestamp = reading.get('timestamp')
+        if timestamp is not None:
+            mask |= TIMESTAMP_BIT
+
+        body.append(_READING.pack(device_index[device_id], mask))
+        if timestamp is not None:
+            body.append(_MILLIS.pack(_to_millis(timestamp)))
+        if values:
+            body.append(struct.pack(f'!{len(values)}d', *values))
+
+    encoded_ids = [device_id.encode('utf-8') for device_id in device_index]
+    version = VERSION if all(len(encoded) <= 0xFF for encoded in encoded_ids) else LONG_IDS_VERSION
+    if any(len(encoded) > 0xFFFF for encoded in encoded_ids):
+        raise ValueError("device_id longer than 65535 bytes")
+    devices = []
+    for encoded in encoded_ids:
+        devices.append(_DEVICE_LEN[version].pack(len(encoded)))
+        devices.append(encoded)
+
+    header = _HEADER.pack(MAGIC, version, 0, len(device_index), len(readings))
+    return b''.join([header] + devices + body)
+
+
+def decode_readings(body):
+    """Unpack a v1 binary message into a list of reading dicts"""
+    magic, version, _, n_devices, n_readings = _HEADER.unpack_from(body, 0)
+    if magic != MAGIC:
+        raise ValueError("not a device readings message")
+    if version not in _DEVICE_LEN:
+        raise ValueError(f"unsupported readings format version {version}")
+
+    device_len = _DEVICE_LEN[version]
+    offset = _HEADER.size
+    device_ids = []
+    for _ in range(n_devices):
+        (length,) = device_len.unpack_from(body, offset)
+        offset += device_len.size
+        device_ids.append(bytes(body[offset:offset + length]).decode('utf-8'))
+        offset += length
+
+    readings = []
+    for _ in range(n_readings):
+        index, mask = _READING.unpack_from(body, offset)
+        offset += _READING.size
+        reading = {'device_id': device_ids[index]}
+
+        if mask & TIMESTAMP_BIT:
+            (millis,) = _MILLIS.unpack_from(body, offset)
+            offset += _MILLIS.size
+            reading['timestamp'] = _from_millis(millis)
+
+        metric_ids = [i for i in range(len(METRICS)) if mask & (1 << i)]
+        if metric_ids:
+            values = struct.unpack_from(f'!{len(metric_ids)}d', body, offset)
+            offset += 8 * len(metric_ids)
+            for metric_id, value in zip(metric_ids, values):
+                reading[METRICS[metric_id]] = value
+
+        readings.append(reading)
+    return readings
+
+
+def encode(readings, wire_format='json'):
+    """Encode readings for publishing; returns (body, content_type).
+
+    A single reading is sent as a JSON object for compatibility with
+    existing consumers; lists are sent as JSON arrays or packed batches.
+    """
+    content_type = FORMATS[wire_format]
+    if content_type == BINARY_CONTENT_TYPE:
+        batch = readings if isinstance(readings, list) else [readings]
+        return encode_readings(batch), content_type
+    return json.dumps(readings), content_type
+
+
+def decode(body, content_type=None):
+    """Decode a message body into a list of readings based on its content type"""
+    if content_type == BINARY_CONTENT_TYPE:
+        return decode_readings(body)
+    if content_type not in (None, '', JSON_CONTENT_TYPE):
+        raise ValueError(f"unsupported content type {content_type}")
+    data = json.loads(body)
+    return data if isinstance(data, list) else [data]
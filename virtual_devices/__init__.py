@@ -1,12 +1,17 @@
 # File: virtual_devices/__init__.py
 from .device_simulator import VirtualDevice, DeviceManager
 from .sensor_generators import SensorDataGenerator, WeatherSensorGenerator
+from .runtime import DeviceRuntime, run_sharded
+from .fleet_generator import FleetSensorGenerator
 
 __all__ = [
     'VirtualDevice',
     'DeviceManager',
     'SensorDataGenerator',
-    'WeatherSensorGenerator'
+    'WeatherSensorGenerator',
+    'FleetSensorGenerator',
+    'DeviceRuntime',
+    'run_sharded'
 ]
 
 __version__ = '1.0.0'
\ No newline at end of file
@@ -1,27 +1,180 @@
 # File: virtual_devices/device_simulator.py
 import time
 import json
+import threading
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from virtual_devices.sensor_generators import SensorDataGenerator
+from virtual_devices.runtime import DeviceRuntime
+
+DEFAULT_SERVER_URL = "http://127.0.0.1:5001"
+DEFAULT_AUTH_URL = "http://127.0.0.1:5000"
+
+
+def create_session(pool_maxsize: int = 10) -> requests.Session:
+    """Create a keep-alive HTTP session that can be shared between devices"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class SendStats:
+    """Rolling send latency and outcome counters"""
+
+    def __init__(self, window: int = 1000):
+        self.latencies = deque(maxlen=window)
+        self.sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool, count: int = 1):
+        with self._lock:
+            self.latencies.append(seconds)
+            if ok:
+                self.sent += count
+            else:
+                self.failed += count
+
+    @classmethod
+    def merge(cls, stats_list):
+        """Combine several collectors into one, e.g. for a whole fleet"""
+        merged = cls(window=sum(stats.latencies.maxlen for stats in stats_list) or 1)
+        for stats in stats_list:
+            with stats._lock:
+                merged.latencies.extend(stats.latencies)
+                merged.sent += stats.sent
+                merged.failed += stats.failed
+        return merged
+
+    def summary(self) -> dict:
+        with self._lock:
+            values = sorted(self.latencies)
+            sent, failed = self.sent, self.failed
+        return {
+            "sent": sent,
+            "failed": failed,
+            "latency_ms_mean": sum(values) / len(values) * 1000 if values else 0.0,
+            "latency_ms_p50": percentile(values, 50) * 1000,
+            "latency_ms_p95": percentile(values, 95) * 1000,
+            "latency_ms_p99": percentile(values, 99) * 1000
+        }
+
+
+class ReadingBatcher:
+    """Buffers readings and posts them to /api/device-data/batch.
+
+    One batcher can be shared by many devices, mirroring a gateway that
+    aggregates its sensors. A batch is sent once ``batch_size`` readings are
+    buffered or the oldest buffered reading is ``max_delay`` seconds old;
+    device loops call ``flush_if_due`` every tick so a partial batch is
+    still sent when no further readings arrive. Those batches are posted by
+    a sender thread so a slow endpoint never stalls the calling loop.
+    """
+
+    def __init__(self, session: requests.Session, server_url: str = DEFAULT_SERVER_URL,
+                 batch_size: int = 100, max_delay: float = 5.0):
+        self.session = session
+        self.url = f"{server_url}/api/device-data/batch"
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.stats = SendStats()
+        self._buffer = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._sender = None
+
+    def add(self, data: dict) -> bool:
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(data)
+            due = (len(self._buffer) >= self.batch_size
+                   or time.monotonic() - self._oldest >= self.max_delay)
+            batch = self._take() if due else None
+        return self._post(batch) if batch else True
+
+    def flush(self) -> bool:
+        """Send everything buffered and wait for batches handed to the sender"""
+        with self._lock:
+            batch = self._take()
+            sender, self._sender = self._sender, None
+        if sender:
+            sender.shutdown(wait=True)
+        return self._post(batch) if batch else True
+
+    def flush_if_due(self) -> bool:
+        """Hand the buffered readings to the sender if the oldest is ``max_delay`` seconds old"""
+        with self._lock:
+            if not self._buffer or time.monotonic() - self._oldest < self.max_delay:
+                return False
+            batch = self._take()
+            if self._sender is None:
+                self._sender = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="batch_sender"
+                )
+            self._sender.submit(self._post, batch)
+        return True
+
+    def _take(self):
+        batch, self._buffer = self._buffer, []
+        return batch
+
+    def _post(self, batch) -> bool:
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.url, json=batch, timeout=30)
+            ok = response.status_code == 200
+            if not ok:
+                print(f"Failed to send batch of {len(batch)}: {response.status_code}")
+        except requests.RequestException as e:
+            ok = False
+            print(f"Error sending batch of {len(batch)}: {e}")
+        self.stats.record(time.perf_counter() - started, ok, len(batch))
+        return ok
 
 
 class VirtualDevice:
     """Virtual IoT device simulator"""
 
-    def __init__(self, device_id: str, server_url: str = "http://localhost:5001"):
+    def __init__(self, device_id: str, server_url: str = DEFAULT_SERVER_URL,
+                 session: requests.Session = None, batcher: ReadingBatcher = None,
+                 auth_url: str = DEFAULT_AUTH_URL):
         self.device_id = device_id
         self.server_url = server_url
+        self.auth_url = auth_url
+        self._session = session
+        self.batcher = batcher
+        self.stats = SendStats()
         self.sensor_generator = SensorDataGenerator()
         self.is_running = False
         self.auth_token = None
 
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session, created on first use unless one was shared in"""
+        if self._session is None:
+            self._session = create_session(pool_maxsize=1)
+        return self._session
+
     def register_device(self, username: str, password: str) -> bool:
         """Register device with authentication service"""
         try:
             # Login to get auth token
-            auth_response = requests.post(
-                "http://localhost:5000/api/auth/login",
+            auth_response = self.session.post(
+                f"{self.auth_url}/api/auth/login",
                 json={"username": username, "password": password}
             )
 
@@ -37,7 +190,7 @@ class VirtualDevice:
                     "device_metadata": {}
                 }
 
-                register_response = requests.post(
+                register_response = self.session.post(
                     f"{self.server_url}/api/devices",
                     json=device_data,
                     headers=headers
@@ -50,35 +203,53 @@ class VirtualDevice:
             print(f"Registration error for device {self.device_id}: {e}")
             return False
 
-    def send_data(self):
-        """Send generated sensor data"""
+    def build_payload(self) -> dict:
+        """Generate one reading in the format accepted by /api/device-data"""
+        sensor_data = self.sensor_generator.generate_data()
+        return {
+            "device_id": self.device_id,
+            "temperature": sensor_data["temperature"],
+            "humidity": sensor_data["humidity"],
+            "cpu_usage": sensor_data["cpu_usage"],
+            "memory_usage": sensor_data["memory_usage"],
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def send_payload(self, data: dict) -> bool:
+        """Send one reading, or hand it to the batcher when batching"""
+        if self.batcher:
+            return self.batcher.add(data)
+
+        started = time.perf_counter()
+        ok = False
         try:
-            sensor_data = self.sensor_generator.generate_data()
-            data = {
-                "device_id": self.device_id,
-                "temperature": sensor_data["temperature"],
-                "humidity": sensor_data["humidity"],
-                "cpu_usage": sensor_data["cpu_usage"],
-                "memory_usage": sensor_data["memory_usage"],
-                "timestamp": datetime.now().isoformat()
-            }
-        
-            print(f"Sending data for {self.device_id}: {data}")
-            response = requests.post(
-                "http://127.0.0.1:5001/api/device-data",
-                json=data
+            response = self.session.post(
+                f"{self.server_url}/api/device-data",
+                json=data,
+                timeout=10
             )
-        
-            if response.status_code == 200:
-                print(f"Data sent successfully for {self.device_id}")
-                return True
-            
-            print(f"Failed to send data: {response.status_code}")
-            return False
+            ok = response.status_code == 200
+            if not ok:
+                print(f"Failed to send data: {response.status_code}")
             
         except Exception as e:
             print(f"Error sending data: {e}")
+
+        self.stats.record(time.perf_counter() - started, ok)
+        return ok
+
+    def get_send_stats(self) -> dict:
+        """Send latency and outcome counters for this device"""
+        return (self.batcher or self).stats.summary()
+
+    def send_data(self):
+        """Send generated sensor data"""
+        try:
+            data = self.build_payload()
+        except Exception as e:
+            print(f"Error generating data: {e}")
             return False
+        return self.send_payload(data)
 
     def start(self, interval: int = 5):
         """Start sending data"""
@@ -88,6 +259,8 @@ class VirtualDevice:
         while self.is_running:
             try:
                 self.send_data()
+                if self.batcher:
+                    self.batcher.flush_if_due()
                 time.sleep(interval)
             except Exception as e:
                 print(f"Device error: {e}")
@@ -102,13 +275,23 @@ class VirtualDevice:
 class DeviceManager:
     """Manages multiple virtual devices"""
 
-    def __init__(self, num_devices: int = 3):
+    def __init__(self, num_devices: int = 3, server_url: str = DEFAULT_SERVER_URL,
+                 batch_size: int = 0, max_batch_delay: float = 5.0,
+                 pool_maxsize: int = 10):
+        # One keep-alive connection pool for the whole fleet
+        self.session = create_session(pool_maxsize=pool_maxsize)
+        self.batcher = ReadingBatcher(
+            self.session, server_url, batch_size, max_batch_delay
+        ) if batch_size > 1 else None
         self.devices = [
-            VirtualDevice(f"VIRTUAL_{i:03d}")
+            VirtualDevice(f"VIRTUAL_{i:03d}", server_url,
+                          session=self.session, batcher=self.batcher)
             for i in range(num_devices)
         ]
+        self.runtime = None
 
-    def start_all_devices(self, username: str, password: str, interval: int = 5):
+    def start_all_devices(self, username: str, password: str, interval: int = 5,
+                          workers: int = 8):
         """Start all virtual devices"""
         print(f"Starting {len(self.devices)} virtual devices...")
 
@@ -119,14 +302,27 @@ class DeviceManager:
             else:
                 print(f"Failed to register device {device.device_id}")
 
-        # Start all devices
-        for device in self.devices:
-            device.start(interval)
+        # Drive all devices from one scheduler; blocks until stopped
+        self.runtime = DeviceRuntime(
+            self.devices, interval=interval, workers=workers,
+            on_tick=self.batcher.flush_if_due if self.batcher else None
+        )
+        self.runtime.run()
 
     def stop_all_devices(self):
         """Stop all virtual devices"""
+        if self.runtime:
+            self.runtime.stop()
         for device in self.devices:
             device.stop()
+        if self.batcher:
+            self.batcher.flush()
+
+    def get_send_stats(self) -> dict:
+        """Fleet-wide send latency and outcome counters"""
+        if self.batcher:
+            return self.batcher.stats.summary()
+        return SendStats.merge([device.stats for device in self.devices]).summary()
 
 
 if __name__ == "__main__":
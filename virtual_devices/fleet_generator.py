@@ -0,0 +1,92 @@
+# File: virtual_devices/fleet_generator.py
+import numpy as np
+from datetime import datetime
+from virtual_devices.system_metrics import get_sampler
+
+
+class FleetSensorGenerator:
+    """Vectorized sensor data for a whole fleet of virtual devices.
+
+    Holds the same drift state as ``SensorDataGenerator`` and
+    ``WeatherSensorGenerator`` but as one NumPy array per quantity, so a
+    single ``step`` produces a reading for every device at once. Readings are
+    returned as a columnar batch: a dict of equal-length arrays plus the
+    device ids and a shared timestamp.
+    """
+
+    def __init__(self, device_ids, weather=False, seed=None):
+        self.device_ids = list(device_ids)
+        self.weather = weather
+        self.rng = np.random.default_rng(seed)
+        n = len(self.device_ids)
+
+        self.base_temperature = self.rng.uniform(20, 25, n)
+        self.base_humidity = self.rng.uniform(45, 55, n)
+        self.temp_drift = np.zeros(n)
+        self.humid_drift = np.zeros(n)
+
+        if weather:
+            self.base_pressure = self.rng.uniform(1000, 1020, n)
+            self.pressure_drift = np.zeros(n)
+            self.wind_speed = self.rng.uniform(0, 10, n)
+
+    @classmethod
+    def for_count(cls, num_devices, prefix="VIRTUAL", **kwargs):
+        """Build a generator for ``num_devices`` sequentially named devices"""
+        return cls([f"{prefix}_{i:03d}" for i in range(num_devices)], **kwargs)
+
+    def __len__(self):
+        return len(self.device_ids)
+
+    def _walk(self, drift, step, limit):
+        """Advance a bounded random walk in place"""
+        drift += self.rng.uniform(-step, step, drift.shape[0])
+        np.clip(drift, -limit, limit, out=drift)
+        return drift
+
+    def step(self) -> dict:
+        """Generate one reading for every device"""
+        n = len(self.device_ids)
+        metrics = get_sampler().get_snapshot()
+
+        temperature = self.base_temperature + self._walk(self.temp_drift, 0.1, 5)
+        humidity = self.base_humidity + self._walk(self.humid_drift, 0.2, 10)
+
+        columns = {
+            "temperature": np.round(np.clip(temperature, 15, 35), 2),
+            "humidity": np.round(np.clip(humidity, 20, 90), 2),
+            "cpu_usage": np.full(n, metrics["cpu_usage"]),
+            "memory_usage": np.full(n, metrics["memory_usage"]),
+            "disk_usage": np.full(n, metrics["disk_usage"]),
+            "battery_level": self.rng.uniform(50, 100, n),
+            "signal_strength": self.rng.integers(-90, -29, n)
+        }
+
+        if self.weather:
+            pressure = self.base_pressure + self._walk(self.pressure_drift, 0.1, 5)
+            self.wind_speed += self.rng.uniform(-0.5, 0.5, n)
+            np.clip(self.wind_speed, 0, 20, out=self.wind_speed)
+            columns.update({
+                "pressure": np.round(np.clip(pressure, 980, 1040), 2),
+                "wind_speed": np.round(self.wind_speed, 2),
+                "wind_direction": self.rng.integers(0, 360, n),
+                "wind_gust": np.round(self.wind_speed + self.rng.uniform(0, 5, n), 2),
+                "rain_rate": np.round(self.rng.uniform(0, 5, n), 2),
+                "uv_index": np.round(self.rng.uniform(0, 11, n), 1)
+            })
+
+        return {
+            "device_ids": self.device_ids,
+            "timestamp": datetime.now().isoformat(),
+            "columns": columns
+        }
+
+    @staticmethod
+    def to_records(batch) -> list:
+        """Expand a columnar batch into per-device reading dicts"""
+        names = list(batch["columns"])
+        values = zip(*(batch["columns"][name].tolist() for name in names))
+        return [
+            dict(zip(names, row), device_id=device_id, timestamp=batch["timestamp"])
+            for device_id, row in zip(batch["device_ids"], values)
+        ]
@@ -0,0 +1,193 @@
+# File: virtual_devices/runtime.py
+import heapq
+import random
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+
+def http_sink(device, payload):
+    """Default sink: POST the reading through the device itself"""
+    return device.send_payload(payload)
+
+
+class DeviceRuntime:
+    """Drives many virtual devices from a single scheduler thread.
+
+    Every device has its next due time in a heap; the scheduler sleeps until
+    the earliest one, produces that device's reading and reschedules it one
+    jittered interval later. Start times are spread over the first interval
+    so devices do not fire in lockstep.
+
+    ``sink(device, payload)`` receives each reading. With ``workers`` > 0
+    readings are generated and sent on a bounded thread pool so a slow sink
+    does not stall the schedule; ticks that find the pool saturated are
+    skipped and counted as overruns.
+
+    ``on_tick()`` is called from the scheduler at least every ``tick``
+    seconds, e.g. to hand off a partial batch whose delay has run out; it
+    must not block.
+    """
+
+    def __init__(self, devices, sink=None, interval=5, jitter=0.1, workers=0,
+                 on_tick=None, tick=1.0):
+        self.devices = list(devices)
+        self.sink = sink or http_sink
+        self.interval = interval
+        self.jitter = jitter
+        self.workers = workers
+        self.on_tick = on_tick
+        self.tick = tick
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._in_flight = None
+        self._stats_lock = threading.Lock()
+        self.stats = {'sent': 0, 'errors': 0, 'overruns': 0}
+
+    def _next_interval(self):
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _incr(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _tick(self, device):
+        try:
+            payload = device.build_payload()
+            if self.sink(device, payload) is False:
+                self._incr('errors')
+            else:
+                self._incr('sent')
+        except Exception as e:
+            self._incr('errors')
+            print(f"[ERROR] Device {device.device_id}: {e}")
+
+    def _tick_pooled(self, device):
+        try:
+            self._tick(device)
+        finally:
+            self._in_flight.release()
+
+    def _on_tick(self):
+        try:
+            self.on_tick()
+        except Exception as e:
+            print(f"[ERROR] Runtime tick: {e}")
+
+    def _dispatch(self, device):
+        if not self._executor:
+            self._tick(device)
+        elif self._in_flight.acquire(blocking=False):
+            self._executor.submit(self._tick_pooled, device)
+        else:
+            self._incr('overruns')
+
+    def run(self):
+        """Run the scheduler in the calling thread until ``stop`` is called"""
+        if self.workers:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="device_worker"
+            )
+            self._in_flight = threading.BoundedSemaphore(self.workers * 4)
+
+        now = time.monotonic()
+        schedule = [
+            (now + random.uniform(0, self.interval), index)
+            for index in range(len(self.devices))
+        ]
+        heapq.heapify(schedule)
+
+        try:
+            while schedule and not self._stop.is_set():
+                if self.on_tick:
+                    self._on_tick()
+                due, index = schedule[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(min(delay, self.tick) if self.on_tick else delay)
+                    continue
+
+                next_due = due + self._next_interval()
+                now = time.monotonic()
+                if next_due < now:
+                    # Fell behind by more than an interval: resume from now
+                    # instead of firing a burst of catch-up readings
+                    next_due = now + self._next_interval()
+                heapq.heapreplace(schedule, (next_due, index))
+                self._dispatch(self.devices[index])
+        finally:
+            if self._executor:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def start(self):
+        """Run the scheduler in a background thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run,
+            name="device_runtime",
+            daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(self.interval + 1)
+            self._thread = None
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['devices'] = len(self.devices)
+        return stats
+
+
+def _run_shard(device_ids, sink_factory, interval, jitter, workers):
+    from virtual_devices.device_simulator import VirtualDevice
+
+    devices = [VirtualDevice(device_id) for device_id in device_ids]
+    sink = sink_factory() if sink_factory else None
+    runtime = DeviceRuntime(devices, sink=sink, interval=interval,
+                            jitter=jitter, workers=workers)
+    try:
+        runtime.run()
+    except KeyboardInterrupt:
+        runtime.stop()
+
+
+def run_sharded(num_devices, processes=None, sink_factory=None, interval=5,
+                jitter=0.1, workers=0, prefix="VIRTUAL"):
+    """Spread ``num_devices`` simulated devices over a pool of processes.
+
+    Each process runs its own DeviceRuntime over a contiguous slice of
+    device ids. ``sink_factory`` is called once inside each process to build
+    its sink and must therefore be a picklable module-level callable.
+    Returns the started processes (none when there are no devices).
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if processes < 1:
+        raise ValueError("processes must be at least 1")
+    if num_devices <= 0:
+        return []
+    device_ids = [f"{prefix}_{i:03d}" for i in range(num_devices)]
+    shard_size = -(-num_devices // processes)
+
+    shards = []
+    for start in range(0, num_devices, shard_size):
+        process = multiprocessing.Process(
+            target=_run_shard,
+            args=(device_ids[start:start + shard_size], sink_factory,
+                  interval, jitter, workers),
+            name=f"device_shard_{start // shard_size}",
+            daemon=True
+        )
+        process.start()
+        shards.append(process)
+    return shards
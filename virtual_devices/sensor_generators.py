@@ -1,7 +1,7 @@
 # File: virtual_devices/sensor_generators.py
 import random
-import psutil
 from datetime import datetime
+from virtual_devices.system_metrics import get_sampler
 
 class SensorDataGenerator:
     """Generates realistic sensor data for virtual IoT devices"""
@@ -33,12 +33,8 @@ class SensorDataGenerator:
         return round(max(min(humidity, 90), 20), 2)
 
     def get_system_metrics(self) -> dict:
-        """Get real system metrics for simulation"""
-        return {
-            "cpu_usage": psutil.cpu_percent(interval=1),
-            "memory_usage": psutil.virtual_memory().percent,
-            "disk_usage": psutil.disk_usage('/').percent
-        }
+        """Get real system metrics for simulation from the shared sampler"""
+        return get_sampler().get_snapshot()
 
     def generate_data(self) -> dict:
         """Generate complete sensor data package"""
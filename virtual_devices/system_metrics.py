@@ -0,0 +1,71 @@
+# File: virtual_devices/system_metrics.py
+import threading
+import psutil
+from config.config import Config
+
+
+class SystemMetricsSampler:
+    """Samples host metrics in the background and serves the latest snapshot.
+
+    ``psutil.cpu_percent`` is called without an interval, so each sample
+    reports CPU usage since the previous one; ``refresh_interval`` therefore
+    sets both the refresh rate and the averaging window.
+    """
+
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = refresh_interval or Config.SYSTEM_METRICS_INTERVAL
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _sample(self):
+        self._snapshot = {
+            "cpu_usage": psutil.cpu_percent(interval=None),
+            "memory_usage": psutil.virtual_memory().percent,
+            "disk_usage": psutil.disk_usage('/').percent
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self._sample()
+            except Exception as e:
+                print(f"[ERROR] System metrics sampling failed: {e}")
+
+    def start(self):
+        """Take a first sample and start refreshing in the background"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            # The first cpu_percent call only primes psutil's counters
+            psutil.cpu_percent(interval=None)
+            self._sample()
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="system_metrics_sampler",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            if self._thread:
+                self._thread.join(self.refresh_interval + 1)
+            self._thread = None
+
+    def get_snapshot(self) -> dict:
+        """Latest host metrics; never blocks once the sampler is running"""
+        if self._thread is None:
+            self.start()
+        return self._snapshot
+
+
+_sampler = SystemMetricsSampler()
+
+
+def get_sampler() -> SystemMetricsSampler:
+    """Return the sampler shared by every generator in the process"""
+    return _sampler